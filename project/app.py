@@ -2,9 +2,9 @@ from ui.css import custom_css
 from ui.gradio_app import create_gradio_ui
 
 if __name__ == "__main__":
-    # 系统在这里默默加载模型，此时终端没有任何输出，你会觉得"卡住了"
+    # 连接数据库、组装 Agent (终端会打印每个阶段的耗时)；嵌入模型在后台继续加载，不阻塞界面启动
     demo = create_gradio_ui()
 
-    # 🟢 等上面全部加载完了，才会打印这一行
+    # 🟢 界面可以先启动，模型就绪前的提问会提示"正在预热"
     print("\n🚀 Launching RAG Assistant...")
     demo.launch(css=custom_css)
\ No newline at end of file
@@ -0,0 +1,168 @@
+# project/benchmarks/chunker_benchmark.py
+
+# ============================================================
+# 基准测试: 大量小标题文档的父块合并
+# ============================================================
+# 用法 (在 project/ 目录下运行)：
+#   python -m benchmarks.chunker_benchmark
+#   python -m benchmarks.chunker_benchmark --sections 1000 5000 20000 --repeat 3
+#   python -m benchmarks.chunker_benchmark --min-parent-size 50000 --max-parent-size 200000   # 每组合并更多章节
+#
+# 生成有成千上万个小标题章节的合成 Markdown (类似规格表、API 参考)，分别用
+# DocumentChuncker.create_chunks_single 和旧版逐次 += 拼接的实现处理同一个文件：
+# 先确认父块 / 子块逐字节一致，再比较耗时。
+
+# [Python标准库] argparse / copy / os / random / tempfile / time
+import argparse
+import copy
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+# [第三方库] langchain_text_splitters
+from langchain_text_splitters import MarkdownHeaderTextSplitter, RecursiveCharacterTextSplitter
+
+# [本项目] config / document_chunker
+import config
+from document_chunker import DocumentChuncker
+
+
+# ------------------------------------------------------------
+# 合成文档
+# ------------------------------------------------------------
+_WORDS = "voltage current rated input output range typical maximum minimum default value returns parameter".split()
+
+
+def synthetic_markdown(sections, seed=0):
+    """很多很短的章节 (一两行)，夹杂少量超过 MAX_PARENT_SIZE 的长章节，三级标题交替出现。"""
+    rng = random.Random(seed)
+    lines = [f"# Synthetic reference ({sections} sections)"]
+    for i in range(sections):
+        level = rng.choice(["##", "###", "###", "####"]) if i else "##"
+        lines.append(f"{level} Item {i}")
+        if rng.random() < 0.002:
+            paragraphs = rng.randint(150, 300)
+        else:
+            paragraphs = rng.randint(1, 2)
+        for _ in range(paragraphs):
+            lines.append(" ".join(rng.choice(_WORDS) for _ in range(rng.randint(4, 14))) + ".")
+    return "\n\n".join(lines) + "\n"
+
+
+# ------------------------------------------------------------
+# 旧版实现 (改动前的 DocumentChuncker，仅用于对照)
+# ------------------------------------------------------------
+def legacy_parents(chunks, min_size, max_size):
+    merged, current = [], None
+    for chunk in chunks:
+        if current is None:
+            current = chunk
+        else:
+            current.page_content += "\n\n" + chunk.page_content
+            for k, v in chunk.metadata.items():
+                if k in current.metadata:
+                    current.metadata[k] = f"{current.metadata[k]} -> {v}"
+                else:
+                    current.metadata[k] = v
+        if len(current.page_content) >= min_size:
+            merged.append(current)
+            current = None
+    if current:
+        if merged:
+            merged[-1].page_content += "\n\n" + current.page_content
+        else:
+            merged.append(current)
+
+    split = []
+    for chunk in merged:
+        if len(chunk.page_content) <= max_size:
+            split.append(chunk)
+        else:
+            splitter = RecursiveCharacterTextSplitter(chunk_size=max_size, chunk_overlap=config.CHILD_CHUNK_OVERLAP)
+            split.extend(splitter.split_documents([chunk]))
+
+    cleaned = []
+    for i, chunk in enumerate(split):
+        if len(chunk.page_content) < min_size:
+            if cleaned:
+                cleaned[-1].page_content += "\n\n" + chunk.page_content
+            elif i < len(split) - 1:
+                split[i + 1].page_content = chunk.page_content + "\n\n" + split[i + 1].page_content
+        else:
+            cleaned.append(chunk)
+    return cleaned
+
+
+def legacy_chunks(md_path):
+    doc_path = Path(md_path)
+    with open(doc_path, "r", encoding="utf-8") as f:
+        parents = MarkdownHeaderTextSplitter(headers_to_split_on=config.HEADERS_TO_SPLIT_ON,
+                                             strip_headers=False).split_text(f.read())
+    child_splitter = RecursiveCharacterTextSplitter(chunk_size=config.CHILD_CHUNK_SIZE,
+                                                    chunk_overlap=config.CHILD_CHUNK_OVERLAP)
+    parent_pairs, child_chunks = [], []
+    for i, p_chunk in enumerate(legacy_parents(parents, config.MIN_PARENT_SIZE, config.MAX_PARENT_SIZE)):
+        parent_id = f"{doc_path.stem}_parent_{i}"
+        p_chunk.metadata.update({"source": str(doc_path.stem) + ".pdf", "parent_id": parent_id})
+        parent_pairs.append((parent_id, p_chunk))
+        children = child_splitter.split_documents([p_chunk])
+        for child in children:
+            child.metadata.update({"parent_id": parent_id})
+        child_chunks.extend(children)
+    return parent_pairs, child_chunks
+
+
+# ------------------------------------------------------------
+# 对照与计时
+# ------------------------------------------------------------
+def fingerprint(parent_pairs, child_chunks):
+    return (
+        [(pid, p.page_content, copy.deepcopy(p.metadata)) for pid, p in parent_pairs],
+        [(c.page_content, copy.deepcopy(c.metadata)) for c in child_chunks],
+    )
+
+
+def best_of(repeat, func, *args):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parent chunk merging on many-header documents.")
+    parser.add_argument("--sections", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--min-parent-size", type=int, default=config.MIN_PARENT_SIZE)
+    parser.add_argument("--max-parent-size", type=int, default=config.MAX_PARENT_SIZE)
+    args = parser.parse_args()
+    # 两种实现都从 config 读取父块大小限制
+    config.MIN_PARENT_SIZE, config.MAX_PARENT_SIZE = args.min_parent_size, args.max_parent_size
+    # 旧版实现只有按字符切分子块：CHILD_SPLIT_MODE = "tokens" 时子块本来就不同，比较的是父块合并，统一按字符切
+    config.CHILD_SPLIT_MODE = "chars"
+
+    chunker = DocumentChuncker()
+    print(f"{'sections':>10}{'chars':>12}{'parents':>10}{'legacy s':>12}{'current s':>12}{'speedup':>10}")
+    with tempfile.TemporaryDirectory(prefix="chunker_bench_") as tmp:
+        for sections in args.sections:
+            path = os.path.join(tmp, f"synthetic_{sections}.md")
+            text = synthetic_markdown(sections)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+
+            legacy_s, legacy = best_of(args.repeat, legacy_chunks, path)
+            current_s, current = best_of(args.repeat, chunker.create_chunks_single, path)
+            if fingerprint(*legacy) != fingerprint(*current):
+                raise SystemExit(f"❌ Output differs from the legacy implementation for {sections} sections")
+
+            print(f"{sections:>10}{len(text):>12}{len(current[0]):>10}{legacy_s:>12.3f}{current_s:>12.3f}"
+                  f"{legacy_s / current_s:>9.1f}x")
+    print("✓ Parent and child chunks are identical to the legacy implementation")
+
+
+if __name__ == "__main__":
+    main()
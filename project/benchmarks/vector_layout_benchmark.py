@@ -0,0 +1,179 @@
+# project/benchmarks/vector_layout_benchmark.py
+
+# ============================================================
+# 基准测试: 不同集合存储布局的召回率与延迟
+# ============================================================
+# 用法 (在 project/ 目录下运行)：
+#   python -m benchmarks.vector_layout_benchmark --url http://localhost:6333            # 复制现有子块集合的稠密向量
+#   python -m benchmarks.vector_layout_benchmark --url http://localhost:6333 --synthetic 200000
+#
+# 对每种布局：建一个临时集合 -> 写入同一批向量 -> 用同一批查询检索，
+# 以 float32 暴力搜索 (exact) 的结果为标准答案，统计 recall@k、p50 / p95 延迟和写入耗时，
+# 并估算稠密向量常驻内存的大小。
+# 注意：不传 --url 时使用本地文件模式，它是暴力搜索、会忽略量化和 HNSW 设置，结果只用来验证脚本能跑通。
+
+# [Python标准库] argparse / tempfile / time
+import argparse
+import tempfile
+import time
+
+# [第三方库] numpy
+# 来源：qdrant-client 的依赖
+# 用法：生成合成向量、给查询加噪声、统计延迟分位数。
+import numpy as np
+
+# [第三方库] qdrant_client
+from qdrant_client import QdrantClient
+from qdrant_client.http import models as qmodels
+
+# [本项目] config / db.collection_layout / db.qdrant_client_factory
+import config
+from db.collection_layout import collection_params, search_params
+from db.qdrant_client_factory import create_qdrant_client
+
+
+# ------------------------------------------------------------
+# 参与比较的布局 (在 config 默认值之上覆盖)
+# ------------------------------------------------------------
+LAYOUTS = {
+    "float32 (current)": {"quantization": None, "vectors_on_disk": False, "payload_on_disk": False},
+    "scalar int8": {"quantization": "scalar", "vectors_on_disk": False},
+    "scalar int8 + on-disk": {"quantization": "scalar", "vectors_on_disk": True, "payload_on_disk": True},
+    "binary": {"quantization": "binary", "vectors_on_disk": False, "oversampling": 3.0},
+    "binary + on-disk": {"quantization": "binary", "vectors_on_disk": True, "payload_on_disk": True,
+                         "oversampling": 3.0},
+}
+
+
+def load_source_vectors(limit):
+    """从现有的子块集合 (按 config.QDRANT_MODE 连接) 读出稠密向量。"""
+    client = create_qdrant_client()
+    vectors, offset = [], None
+    while len(vectors) < limit:
+        records, offset = client.scroll(
+            collection_name=config.CHILD_COLLECTION, limit=1024, offset=offset, with_payload=False, with_vectors=True
+        )
+        for record in records:
+            # 未命名的稠密向量在 "" 下，稀疏向量在 SPARSE_VECTOR_NAME 下
+            vector = record.vector.get("") if isinstance(record.vector, dict) else record.vector
+            if vector is not None:
+                vectors.append(vector)
+        if offset is None:
+            break
+    client.close()
+    return np.asarray(vectors[:limit], dtype=np.float32)
+
+
+def synthetic_vectors(count, dim, seed=0):
+    """带簇结构的合成向量 (比纯随机向量更接近真实文本嵌入的分布)。"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(1, count // 500), dim))
+    vectors = centers[rng.integers(0, len(centers), size=count)] + 0.3 * rng.normal(size=(count, dim))
+    return vectors.astype(np.float32)
+
+
+def make_queries(vectors, count, seed=1):
+    """从数据里抽样并加一点噪声，模拟"和某些子块很相近、但不完全相同"的查询。"""
+    rng = np.random.default_rng(seed)
+    picks = vectors[rng.choice(len(vectors), size=min(count, len(vectors)), replace=False)]
+    queries = picks + 0.05 * rng.normal(size=picks.shape).astype(np.float32) * np.abs(picks).mean()
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def resident_bytes(count, dim, layout):
+    """估算稠密向量常驻内存的字节数 (不含 HNSW 图和 payload)。"""
+    raw = 0 if layout.get("vectors_on_disk") else count * dim * 4
+    quantized = {"scalar": count * dim, "binary": count * dim // 8}.get(layout.get("quantization"), 0)
+    return raw + quantized
+
+
+def wait_until_indexed(client, name, timeout=600):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if client.get_collection(name).status == qmodels.CollectionStatus.GREEN:
+            return
+        time.sleep(0.5)
+
+
+def run_layout(client, name, layout, vectors, queries, k, truth):
+    client.create_collection(collection_name=name, **collection_params(vectors.shape[1], layout))
+    try:
+        start = time.monotonic()
+        for i in range(0, len(vectors), 1024):
+            batch = vectors[i:i + 1024]
+            client.upsert(
+                collection_name=name,
+                points=qmodels.Batch(ids=list(range(i, i + len(batch))), vectors=batch.tolist()),
+                wait=True
+            )
+        wait_until_indexed(client, name)
+        load_seconds = time.monotonic() - start
+
+        params = search_params(layout)
+        latencies, recalls = [], []
+        for query, expected in zip(queries, truth):
+            t0 = time.perf_counter()
+            points = client.query_points(
+                collection_name=name, query=query.tolist(), limit=k, search_params=params, with_payload=False
+            ).points
+            latencies.append(time.perf_counter() - t0)
+            recalls.append(len({p.id for p in points} & expected) / k)
+
+        return {
+            "recall": float(np.mean(recalls)),
+            "p50_ms": 1000 * float(np.percentile(latencies, 50)),
+            "p95_ms": 1000 * float(np.percentile(latencies, 95)),
+            "load_s": load_seconds,
+            "ram_mb": resident_bytes(len(vectors), vectors.shape[1], layout) / 2 ** 20,
+        }
+    finally:
+        client.delete_collection(name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare recall and latency of Qdrant collection layouts.")
+    parser.add_argument("--url", default=None, help="Qdrant server URL (omit to use a temporary local store)")
+    parser.add_argument("--synthetic", type=int, default=0, help="use N synthetic vectors instead of the child collection")
+    parser.add_argument("--dim", type=int, default=768, help="dimension of synthetic vectors")
+    parser.add_argument("--limit", type=int, default=200_000, help="max vectors copied from the child collection")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    vectors = synthetic_vectors(args.synthetic, args.dim) if args.synthetic else load_source_vectors(args.limit)
+    if len(vectors) == 0:
+        raise SystemExit("No vectors to benchmark (ingest documents first or pass --synthetic N)")
+    queries = make_queries(vectors, args.queries)
+
+    if args.url:
+        client = QdrantClient(url=args.url)
+    else:
+        print("⚠️ Local mode ignores quantization and HNSW settings; pass --url for meaningful numbers")
+        client = QdrantClient(path=tempfile.mkdtemp(prefix="qdrant_bench_"))
+
+    # 标准答案：float32 集合上的暴力搜索
+    print(f"Benchmarking {len(vectors)} vectors × {vectors.shape[1]} dims, {len(queries)} queries, k={args.k}")
+    truth_name = "bench_ground_truth"
+    client.create_collection(collection_name=truth_name, **collection_params(vectors.shape[1], LAYOUTS["float32 (current)"]))
+    try:
+        for i in range(0, len(vectors), 1024):
+            batch = vectors[i:i + 1024]
+            client.upsert(collection_name=truth_name,
+                          points=qmodels.Batch(ids=list(range(i, i + len(batch))), vectors=batch.tolist()), wait=True)
+        truth = [
+            {p.id for p in client.query_points(collection_name=truth_name, query=q.tolist(), limit=args.k,
+                                               search_params=search_params(exact=True), with_payload=False).points}
+            for q in queries
+        ]
+    finally:
+        client.delete_collection(truth_name)
+
+    print(f"\n{'layout':<24}{'recall@k':>10}{'p50 ms':>10}{'p95 ms':>10}{'load s':>10}{'RAM MB':>10}")
+    for i, (label, layout) in enumerate(LAYOUTS.items()):
+        result = run_layout(client, f"bench_layout_{i}", layout, vectors, queries, args.k, truth)
+        print(f"{label:<24}{result['recall']:>10.3f}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}"
+              f"{result['load_s']:>10.1f}{result['ram_mb']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -21,16 +21,64 @@ load_dotenv()
 # --- 目录配置 (Directory Configuration) ---
 # [配置] Markdown 文件存放路径
 MARKDOWN_DIR = "markdown_docs"
-# [配置] 父文档存储路径 (JSON文件)
+# [配置] 父文档存储路径 (段文件 + 偏移索引)
 PARENT_STORE_PATH = "parent_store"
+# [配置] 单个父文档段文件的大小上限 (256MB)，写满后滚动到下一个段
+PARENT_SEGMENT_MAX_BYTES = 256 * 1024 * 1024
+# [配置] 父文档存储的压缩阈值：被覆盖 / 删除的死字节同时超过 PARENT_COMPACT_MIN_BYTES 和
+# 数据总量的 PARENT_COMPACT_DEAD_RATIO 时，自动把有效记录重写进新段并替换索引
+PARENT_COMPACT_DEAD_RATIO = 0.5
+PARENT_COMPACT_MIN_BYTES = 16 * 1024 * 1024
+# [配置] 父文档 LRU 缓存上限：条目数和字节数，任一超限即淘汰最久未用的条目
+PARENT_CACHE_MAX_ENTRIES = 2048
+PARENT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+# [配置] 入库清单 (记录每个源文档和父文档的内容指纹，用于增量入库)
+INGESTION_MANIFEST_PATH = "ingestion_manifest.json"
+# [配置] 清单每记录这么多个文档落盘一次 (每次都重写整个文件)；一批入库结束时总会落盘
+INGESTION_MANIFEST_FLUSH_EVERY = 64
 # [配置] 向量数据库路径 (Qdrant本地文件)
 QDRANT_DB_PATH = "qdrant_db"
 
+# --- Qdrant 连接配置 (Qdrant Connection) ---
+# [配置] 连接模式: "local" (本地文件，单进程独占) / "remote" (连接 Qdrant 服务，多个进程可共用一个索引)
+QDRANT_MODE = os.getenv("QDRANT_MODE", "local")
+# [配置] remote 模式下的服务地址和 API Key (本地启动: docker run -p 6333:6333 -p 6334:6334 qdrant/qdrant)
+QDRANT_URL = os.getenv("QDRANT_URL", "http://localhost:6333")
+QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
+# [配置] 优先使用 gRPC (批量写入和检索比 REST 更快)
+QDRANT_PREFER_GRPC = True
+QDRANT_GRPC_PORT = 6334
+# [配置] 单次请求超时 (秒)
+QDRANT_TIMEOUT = 10
+# [配置] REST 连接池大小 (每个进程)
+QDRANT_POOL_SIZE = 32
+# [配置] 暂时性错误 (网络抖动、超时、429/5xx) 的重试次数和首次退避 (秒，之后每次翻倍)
+QDRANT_MAX_RETRIES = 3
+QDRANT_RETRY_BACKOFF = 0.5
+
 # --- Qdrant 集合配置 ---
 # [配置] 子文档集合名称
 CHILD_COLLECTION = "document_child_chunks"
 # [配置] 稀疏向量字段名 (用于关键词搜索)
 SPARSE_VECTOR_NAME = "sparse"
+# [配置] 集合存储布局 (只在创建集合时生效；已有集合需要清空后重新入库)
+# 注意：本地文件模式 (QdrantClient(path=...)) 是暴力搜索，会忽略量化和 HNSW 设置，这些选项面向 Qdrant 服务端
+# 稠密向量量化: None (float32 原样) / "scalar" (int8，内存约 1/4) / "binary" (1 bit，内存约 1/32)
+VECTOR_QUANTIZATION = None
+# 量化后的向量常驻内存 (原始向量可以放磁盘)
+QUANTIZATION_ALWAYS_RAM = True
+# 原始向量 / payload 放在磁盘 (mmap)，降低内存占用和加载时间
+VECTORS_ON_DISK = False
+PAYLOAD_ON_DISK = False
+# HNSW 图参数 (None = Qdrant 默认值，m=16、ef_construct=100)
+HNSW_M = None
+HNSW_EF_CONSTRUCT = None
+HNSW_ON_DISK = False
+# 查询时的 HNSW ef (None = Qdrant 默认)
+SEARCH_HNSW_EF = None
+# 量化集合的查询：先用量化向量多取 oversampling 倍候选，再用原始向量重打分
+QUANTIZATION_RESCORE = True
+QUANTIZATION_OVERSAMPLING = 2.0
 
 # --- 嵌入模型配置 (Embedding Configuration) ---
 # [配置] 密集向量模型 (语义搜索)
@@ -39,6 +87,39 @@ SPARSE_VECTOR_NAME = "sparse"
 DENSE_MODEL = "sentence-transformers/all-mpnet-base-v2"
 # [配置] 稀疏向量模型 (关键词搜索)
 SPARSE_MODEL = "Qdrant/bm25"
+# [配置] 查询向量缓存：内存 LRU 条目数，以及可选的磁盘缓存 (SQLite 文件，设为 None 则只用内存)
+EMBEDDING_CACHE_MAX_ENTRIES = 4096
+EMBEDDING_CACHE_PATH = "embedding_cache.sqlite"
+# [配置] 磁盘缓存最多保留的条目数 (稠密 + 稀疏合计，超出时淘汰最久没访问的)；None 表示不限
+EMBEDDING_CACHE_MAX_DISK_ENTRIES = 100000
+# [配置] 稠密向量维度。None 表示从模型仓库的配置文件读取 (不加载模型)；换成非 sentence-transformers 模型时可以手动指定
+DENSE_DIMENSION = None
+# [配置] 启动时在后台线程加载嵌入模型 (界面先起来，模型就绪前的提问会提示"正在预热")；False 则启动时同步加载
+WARM_UP_MODELS_IN_BACKGROUND = True
+
+# --- 检索模式配置 (Retrieval Mode Configuration) ---
+# [配置] 默认检索模式: "hybrid" (语义 + 关键词) / "dense" (只用语义) / "sparse" (只用 BM25 关键词)
+DEFAULT_RETRIEVAL_MODE = "hybrid"
+# [配置] 混合检索的融合方式: "rrf" (倒数排名融合，Qdrant 服务端完成) / "weighted" (按权重融合归一化分数)
+HYBRID_FUSION = "rrf"
+# [配置] weighted 融合时稠密分数的权重 (稀疏分数权重 = 1 - 该值)
+HYBRID_DENSE_WEIGHT = 0.7
+# [配置] 路由器：不超过这么多个词、且包含编号 (如 ERR-1042) 的查询走 sparse 快速通道
+SPARSE_ROUTE_MAX_WORDS = 4
+
+# --- 重排序配置 (Rerank Configuration) ---
+# [配置] 是否在检索后用交叉编码器重排序 (第一次使用时下载并加载模型)
+RERANK_ENABLED = False
+# [配置] 交叉编码器模型 (小模型，CPU 即可运行)
+RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+# [配置] 过采样倍数：先取 limit × 倍数 个候选，重排序后保留前 limit 个
+RERANK_OVERFETCH = 4
+# [配置] 每批送进模型的 (查询, 子块) 对数
+RERANK_BATCH_SIZE = 16
+# [配置] 单次重排序的耗时预算 (秒)，超出后剩余候选保持检索顺序
+RERANK_LATENCY_BUDGET = 1.0
+# [配置] (查询, 子块) 打分缓存的条目数
+RERANK_CACHE_MAX_ENTRIES = 8192
 
 # --- LLM 配置 (SiliconFlow) ---
 
@@ -46,10 +127,8 @@ SPARSE_MODEL = "Qdrant/bm25"
 LLM_MODEL = "deepseek-ai/DeepSeek-V3"
 
 # [配置] 从环境变量中读取 API Key
-# 如果 .env 没配置好，第二个参数是报错提示
+# 缺失时不在导入阶段报错 (benchmarks 等脚本不需要 LLM)，由 RAGSystem.initialize 检查并提示
 SILICONFLOW_API_KEY = os.getenv("SILICONFLOW_API_KEY")
-if not SILICONFLOW_API_KEY:
-    raise ValueError("❌ 未找到 SILICONFLOW_API_KEY，请检查你的 .env 文件！")
 
 # [配置] 硅基流动的 Base URL (OpenAI 兼容接口地址)
 SILICONFLOW_BASE_URL = "https://api.siliconflow.cn/v1"
@@ -57,11 +136,85 @@ SILICONFLOW_BASE_URL = "https://api.siliconflow.cn/v1"
 # [配置] 温度设为 0 (让回答最严谨、不发散)
 LLM_TEMPERATURE = 0
 
+# --- Agent 上下文配置 (Agent Context Configuration) ---
+# [配置] 每次调用 Agent LLM 时，系统提示词 + 消息历史的 token 预算 (估算值)
+AGENT_CONTEXT_TOKEN_BUDGET = 12000
+# [配置] 保留全文的最近工具输出条数，更早的截断
+AGENT_CONTEXT_KEEP_RECENT_TOOL_MESSAGES = 2
+# [配置] 旧工具输出截断后保留的字符数
+AGENT_CONTEXT_STALE_TOOL_CHARS = 800
+
+# --- 对话摘要配置 (Conversation Summary Configuration) ---
+# [配置] 增量总结时每条消息最多发给 LLM 的字数 (上次总结之后的新增对话会全部合并进摘要)
+SUMMARY_MESSAGE_MAX_CHARS = 2000
+
+# --- 语义答案缓存配置 (Answer Cache Configuration) ---
+# [配置] 是否启用：换个说法问同一个问题时直接返回之前的答案 (文档入库后自动失效)
+ANSWER_CACHE_ENABLED = True
+# [配置] 判定为"同一个问题"的最低余弦相似度 (另外要求两个问题里的型号 / 年份 / ID 等含数字的词完全一致)
+ANSWER_CACHE_THRESHOLD = 0.95
+# [配置] 缓存的问题数上限 (LRU)
+ANSWER_CACHE_MAX_ENTRIES = 1024
+
+# --- 会话配置 (Session Configuration) ---
+# [配置] 同时保留记忆的会话数上限，超出后淘汰最久未活动的会话
+MAX_SESSIONS = 1000
+
+# --- 对话记忆配置 (Checkpointer Configuration) ---
+# [配置] 记忆后端: "sqlite" (持久化、有界) 或 "memory" (纯内存，仅供调试)
+CHECKPOINTER_BACKEND = "sqlite"
+# [配置] SQLite 记忆文件路径
+CHECKPOINT_DB_PATH = "checkpoints.sqlite"
+# [配置] 空闲线程的存活时间 (秒)，超过后整个线程被删除
+CHECKPOINT_THREAD_TTL = 24 * 3600
+# [配置] 两次 TTL 清理之间的最小间隔 (秒)
+CHECKPOINT_EVICT_INTERVAL = 600
+# [配置] 单个线程保留全文的最近工具输出条数，更早的压缩成占位符
+CHECKPOINT_KEEP_TOOL_MESSAGES = 4
+# [配置] 单个线程消息历史的总字数上限，超出后丢弃最早的对话
+CHECKPOINT_MAX_THREAD_CHARS = 100_000
+
+# --- PDF 转换配置 (PDF Conversion Configuration) ---
+# [配置] 并行转换的进程数 (默认用满 CPU 核数；设为 1 则命令行转换在当前进程内顺序进行，入库时仍在 1 个子进程里转换)
+PDF_CONVERSION_WORKERS = os.cpu_count() or 1
+# [配置] 单个 PDF 的转换超时 (秒)，超时的文件会被跳过并记为失败；None 表示不限时
+PDF_CONVERSION_TIMEOUT = 600
+# [配置] 流式转换的页窗口大小：每转换这么多页就写一次盘，控制超大文档的内存峰值 (0 = 整本一次转换)
+PDF_STREAM_PAGE_WINDOW = 20
+
+# --- 入库流水线配置 (Ingestion Pipeline Configuration) ---
+# [配置] 每批编码 + 写入 Qdrant 的子块数量 (跨文档累积)
+INGEST_BATCH_SIZE = 128
+# [配置] 流式入库时相邻两级 (PDF 转换 -> 切分 -> 编码写入) 之间最多积压的文档数
+INGEST_QUEUE_SIZE = 4
+
+# --- 后台入库任务配置 (Ingestion Job Configuration) ---
+# [配置] 任务目录：任务队列 (jobs.sqlite) 和上传文件的暂存副本
+INGEST_JOB_DIR = "ingest_jobs"
+# [配置] 后台入库的 PDF 转换 / 切分进程数：一批文件里同时处理的文件数
+INGEST_JOB_WORKERS = 2
+# [配置] 后台调度线程每批最多取这么多个排队中的文件，作为一次入库处理 (共用进程池和批量编码写入流水线)；
+# 批次越大吞吐越高，但已经取进批次的文件不能再取消
+INGEST_JOB_BATCH_FILES = 16
+# [配置] 单个文件失败后自动重试，最多尝试这么多次 (之后需要在页面上手动重试)
+INGEST_JOB_MAX_ATTEMPTS = 2
+# [配置] 清空知识库前最多等正在处理的这一批文件这么多秒；还没处理完就不清空，提示稍后再试
+INGEST_JOB_CLEAR_TIMEOUT = 30
+
 # --- 文本切分配置 (Text Splitter Configuration) ---
 # [配置] 子文档大小 (500字符)，用于检索
 CHILD_CHUNK_SIZE = 500
 # [配置] 子文档重叠 (100字符)，防止上下文切断
 CHILD_CHUNK_OVERLAP = 100
+# [配置] 子文档的长度单位: "chars" (按字符，上面两项) / "tokens" (按稠密模型分词器的 token 数，下面两项)
+# 同样 500 个字符，中文约 500 个 token (超过模型窗口、编码时被截断)，英文只有约 120 个 (浪费窗口)；
+# tokens 模式保证每个子块都不超过模型窗口。切换后需要重新入库。
+CHILD_SPLIT_MODE = "chars"
+# [配置] tokens 模式下子文档的 token 数与重叠 token 数 (会自动压到模型窗口以内，all-mpnet-base-v2 为 384)
+CHILD_CHUNK_TOKENS = 256
+CHILD_CHUNK_OVERLAP_TOKENS = 48
+# [配置] tokens 模式下文本片段 -> token 数的缓存条目数
+TOKEN_LENGTH_CACHE_MAX_ENTRIES = 65536
 # [配置] 父文档最小/最大字符数，用于给 AI 提供上下文
 MIN_PARENT_SIZE = 2000
 MAX_PARENT_SIZE = 10000
@@ -70,4 +223,6 @@ HEADERS_TO_SPLIT_ON = [
     ("#", "H1"),
     ("##", "H2"),
     ("###", "H3")
-]
\ No newline at end of file
+]
+# [配置] DocumentChuncker.create_chunks / iter_chunks 并行切分的进程数 (设为 1 则在当前进程内顺序切分)
+CHUNKING_WORKERS = os.cpu_count() or 1
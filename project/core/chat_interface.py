@@ -1,4 +1,4 @@
-from langchain_core.messages import HumanMessage
+from langchain_core.messages import AIMessageChunk, HumanMessage
 
 class ChatInterface:
     """
@@ -21,13 +21,14 @@ class ChatInterface:
         """
         self.rag_system = rag_system
 
-    def chat(self, message, history):
+    def chat(self, message, history, session_id=None):
         """
         核心聊天方法（UI 每发一句话，就会调用一次这个方法）
 
         参数：
         - message: 当前用户输入的一句话（字符串）
         - history: 历史对话（这里没有直接用，但 UI 框架会传进来）
+        - session_id: 会话 ID（Gradio 的 session_hash），每个会话有独立的对话记忆
 
         返回：
         - 一个字符串（最终要显示给用户的回答）
@@ -50,7 +51,7 @@ class ChatInterface:
                         )
                     ]
                 },
-                self.rag_system.get_config()  # graph 运行时配置（memory / thread / callbacks 等）
+                self.rag_system.get_config(session_id)  # graph 运行时配置（memory / thread / callbacks 等）
             )
 
             # ---------- 3️⃣ 取出最终回答 ----------
@@ -64,7 +65,157 @@ class ChatInterface:
             # 防止 UI 因为异常直接崩掉
             return f"❌ Error: {str(e)}"
 
-    def clear_session(self):
+    def chat_stream(self, message, history, session_id=None):
+        """
+        流式聊天方法（生成器版本的 chat）
+
+        - 检索阶段：每当 Agent 发起搜索 / 取父文档，先推送一行进度提示
+        - 汇总阶段：aggregate 节点的 LLM 每生成一个 token，就推送一次
+
+        每次 yield 的都是"到目前为止的完整文本"（Gradio 的流式约定），
+        所以用户在汇总开始的那一刻就能看到第一个字，而不是等整个图跑完。
+        """
+
+        if not self.rag_system.agent_graph:
+            yield "⚠️ System not initialized!"
+            return
+
+        # 嵌入模型还在后台加载：先告诉用户，检索会等模型加载完再开始
+        if not self.rag_system.is_ready():
+            yield "⏳ Warming up models, the first answer may take a little longer..."
+
+        graph = self.rag_system.agent_graph
+        config = self.rag_system.get_config(session_id)
+        progress = []
+        answer = ""
+
+        try:
+            # ---------- 1️⃣ 同时订阅两种流 ----------
+            # - "messages": LLM 的逐 token 输出（metadata 里带着产生它的节点名）
+            # - "updates":  每个节点执行完后的状态增量，用来生成进度提示
+            # subgraphs=True：process_question 子图里的 agent / tools 节点也会上报
+            for _, mode, chunk in graph.stream(
+                {"messages": [HumanMessage(content=message.strip())]},
+                config,
+                stream_mode=["messages", "updates"],
+                subgraphs=True
+            ):
+                answer, text = self._consume_stream_chunk(mode, chunk, answer, progress)
+                if text is not None:
+                    yield text
+
+            # ---------- 2️⃣ 兜底 ----------
+            # 汇总节点没有调用 LLM（例如没有任何答案），或者图在 human_input 前暂停了：
+            # 直接取最终状态里的最后一条消息
+            if not answer:
+                messages = graph.get_state(config).values.get("messages", [])
+                yield messages[-1].content if messages else "No answers were generated."
+
+        except Exception as e:
+            yield f"❌ Error: {str(e)}"
+
+    async def achat(self, message, history, session_id=None):
+        """
+        异步版本的 chat：走 graph.ainvoke
+
+        并行分发的多个子问题在同一个事件循环里等待各自的 LLM 响应，
+        不再各占一个线程。
+        """
+        if not self.rag_system.agent_graph:
+            return "⚠️ System not initialized!"
+
+        try:
+            result = await self.rag_system.agent_graph.ainvoke(
+                {"messages": [HumanMessage(content=message.strip())]},
+                await self.rag_system.aget_config(session_id)
+            )
+            return result["messages"][-1].content
+
+        except Exception as e:
+            return f"❌ Error: {str(e)}"
+
+    async def achat_stream(self, message, history, session_id=None):
+        """
+        异步版本的 chat_stream：走 graph.astream，输出格式完全相同
+        """
+        if not self.rag_system.agent_graph:
+            yield "⚠️ System not initialized!"
+            return
+
+        # 嵌入模型还在后台加载：先告诉用户，检索会等模型加载完再开始
+        if not self.rag_system.is_ready():
+            yield "⏳ Warming up models, the first answer may take a little longer..."
+
+        graph = self.rag_system.agent_graph
+        config = await self.rag_system.aget_config(session_id)
+        progress = []
+        answer = ""
+
+        try:
+            async for _, mode, chunk in graph.astream(
+                {"messages": [HumanMessage(content=message.strip())]},
+                config,
+                stream_mode=["messages", "updates"],
+                subgraphs=True
+            ):
+                answer, text = self._consume_stream_chunk(mode, chunk, answer, progress)
+                if text is not None:
+                    yield text
+
+            if not answer:
+                state = await graph.aget_state(config)
+                messages = state.values.get("messages", [])
+                yield messages[-1].content if messages else "No answers were generated."
+
+        except Exception as e:
+            yield f"❌ Error: {str(e)}"
+
+    def _consume_stream_chunk(self, mode, chunk, answer, progress):
+        """
+        处理流里的一个事件，返回 (更新后的 answer, 要推送给 UI 的文本或 None)
+
+        chat_stream / achat_stream 共用；progress 列表会被原地追加。
+        """
+        if mode == "messages":
+            token, metadata = chunk
+            # 只转发最终汇总节点的 token，总结 / 检索阶段的 LLM 输出不给用户看。
+            # 节点结束时 LangGraph 还会把它返回的完整消息再发一次 (AIMessage 而不是 AIMessageChunk)，跳过，否则答案会重复
+            if (metadata.get("langgraph_node") == "aggregate" and isinstance(token, AIMessageChunk)
+                    and token.content):
+                answer += token.content
+                return answer, answer
+
+        elif mode == "updates" and not answer:
+            # 并行的多个子问题会各自上报一次 "Composing"，去重
+            events = [e for e in self._progress_events(chunk) if e not in progress]
+            if events:
+                progress.extend(events)
+                return answer, "\n".join(progress)
+
+        return answer, None
+
+    @staticmethod
+    def _progress_events(update):
+        """
+        把一个节点的状态增量翻译成给用户看的进度提示（检索 / 取父文档 / 汇总）
+        """
+        events = []
+        for node, values in update.items():
+            if node == "agent":
+                for msg in (values or {}).get("messages", []):
+                    for call in getattr(msg, "tool_calls", None) or []:
+                        args = call.get("args", {})
+                        if call["name"] == "search_child_chunks":
+                            events.append(f"🔍 Searching: {args.get('query', '')}")
+                        elif call["name"] == "retrieve_parent_chunks":
+                            events.append(f"📄 Reading: {args.get('parent_id', '')}")
+                        elif call["name"] == "retrieve_many_parent_chunks":
+                            events.append(f"📄 Reading: {', '.join(args.get('parent_ids', []))}")
+            elif node == "process_question":
+                events.append("✍️ Composing answer...")
+        return events
+
+    def clear_session(self, session_id=None):
         """
         清空当前对话会话（memory / thread）
 
@@ -72,4 +223,4 @@ class ChatInterface:
         - UI 里点“Clear / New Chat”
         - 重置 Agent 的对话上下文
         """
-        self.rag_system.reset_thread()
+        self.rag_system.reset_thread(session_id)
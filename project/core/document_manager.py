@@ -1,6 +1,8 @@
 from pathlib import Path
 import shutil
 import config
+from db.ingestion_manifest import hash_file, hash_parent
+from core.ingestion_pipeline import IngestionPipeline, bounded_stage
 from util import pdfs_to_markdowns
 
 class DocumentManager:
@@ -9,8 +11,17 @@ class DocumentManager:
         self.rag_system = rag_system
         self.markdown_dir = Path(config.MARKDOWN_DIR)
         self.markdown_dir.mkdir(parents=True, exist_ok=True)
+        # Shared with the RAG system, whose answer cache is scoped by the manifest's version
+        self.manifest = rag_system.manifest
         
-    def add_documents(self, document_paths, progress_callback=None):
+    def add_documents(self, document_paths, progress_callback=None, failures=None, result_callback=None,
+                      workers=None):
+        # failures: optional dict that receives {document path: error message} for documents that failed
+        # (they are also counted as skipped)
+        # result_callback: optional, called as result_callback(document path, "added" / "skipped" / "failed", error)
+        # as soon as each document's outcome is known (from the writer thread for documents that reach the index)
+        # workers: conversion / chunking processes (defaults to config.PDF_CONVERSION_WORKERS / CHUNKING_WORKERS)
+        failures = {} if failures is None else failures
         if not document_paths:
             return 0, 0
             
@@ -19,43 +30,151 @@ class DocumentManager:
         
         if not document_paths:
             return 0, 0
-            
-        added = 0
-        skipped = 0
-            
-        for i, doc_path in enumerate(document_paths):
-            if progress_callback:
-                progress_callback((i + 1) / len(document_paths), f"Processing {Path(doc_path).name}")
-                
-            doc_name = Path(doc_path).stem
-            md_path = self.markdown_dir / f"{doc_name}.md"
-            
-            if md_path.exists():
-                skipped += 1
-                continue
-                
-            try:            
-                if Path(doc_path).suffix.lower() == ".md":
-                    shutil.copy(doc_path, md_path)
-                else:
-                    pdfs_to_markdowns(str(doc_path), overwrite=False)            
-                parent_chunks, child_chunks = self.rag_system.chunker.create_chunks_single(md_path)
-                
-                if not child_chunks:
-                    skipped += 1
+
+        outcomes = {}
+
+        def report(doc_path, status, error=None):
+            if doc_path in outcomes:
+                return
+            outcomes[doc_path] = status
+            if error:
+                failures[doc_path] = error
+            if result_callback:
+                result_callback(doc_path, status, error)
+
+        # Markdown files, parent IDs and the manifest are all keyed by file stem, so two files with the same stem
+        # (a/report.pdf and b/report.pdf, or report.pdf and report.md) would overwrite each other: keep the first
+        first_by_stem = {}
+        for p in document_paths:
+            first = first_by_stem.setdefault(Path(p).stem, p)
+            if first != p:
+                report(p, "failed", f"Duplicate document name: {Path(p).name} has the same name as {first}")
+        document_paths = list(dict.fromkeys(first_by_stem.values()))
+
+        # A document is unchanged only if its content hash matches the manifest, not just its name
+        source_hashes = {p: hash_file(p) for p in document_paths}
+        unchanged = [
+            p for p in document_paths
+            if self.manifest.source_hash(Path(p).stem) == source_hashes[p]
+            and (self.markdown_dir / f"{Path(p).stem}.md").exists()
+        ]
+        for p in unchanged:
+            report(p, "skipped")
+        todo = [p for p in document_paths if p not in outcomes]
+
+        # Streaming ingestion: conversion -> chunking -> embed + upsert, each stage on its own thread with a
+        # bounded queue in between, so at most a few documents' chunks are in memory whatever the corpus size
+        # PDFs are always converted in worker processes (timeout + crash isolation, and PyMuPDF never runs on
+        # several threads of this process); chunking runs in a process pool whose queue of futures also bounds
+        # the documents in flight
+        chunk_workers = min(config.CHUNKING_WORKERS if workers is None else workers, len(todo))
+        markdown = bounded_stage(lambda emit: self.__convert(todo, emit, workers), name="ingest-convert")
+        chunked = bounded_stage(lambda emit: self.__chunk(markdown, emit, chunk_workers),
+                                maxsize=max(config.INGEST_QUEUE_SIZE, 2 * chunk_workers), name="ingest-chunk")
+
+        # Child chunks from all documents share one batched, pipelined embed + upsert stream
+        pipeline = IngestionPipeline(self.rag_system.vector_db, self.rag_system.collection_name)
+
+        try:
+            for i, (doc_path, future, error) in enumerate(chunked):
+                if progress_callback:
+                    progress_callback((len(unchanged) + i + 1) / len(document_paths),
+                                      f"Processing {Path(doc_path).name}")
+
+                chunks = None
+                if future is not None:
+                    try:
+                        chunks = future.result()
+                    except Exception as e:
+                        print(f"Error processing {doc_path}: {e}")
+                        error = f"{type(e).__name__}: {e}"
+
+                if chunks is None:
+                    report(doc_path, "failed" if error else "skipped", error)
                     continue
+
+                doc_name = Path(doc_path).stem
+                parent_chunks, child_chunks = chunks
+                try:
+                    # Only rewrite parents whose content changed; they must exist before their children are searchable
+                    old_parents = self.manifest.parent_hashes(doc_name)
+                    new_parents = {pid: hash_parent(doc.page_content, doc.metadata) for pid, doc in parent_chunks}
+                    self.rag_system.parent_store.save_many(
+                        [(pid, doc) for pid, doc in parent_chunks if old_parents.get(pid) != new_parents[pid]]
+                    )
+
+                    # Once all new children are written and the old ones deleted, drop stale parents and record
+                    # the hashes
+                    def on_complete(doc_name=doc_name, old_parents=old_parents, new_parents=new_parents,
+                                    source_hash=source_hashes[doc_path], doc_path=doc_path,
+                                    status="added" if child_chunks else "skipped"):
+                        self.rag_system.parent_store.delete_many([pid for pid in old_parents if pid not in new_parents])
+                        self.manifest.record(doc_name, source_hash, new_parents)
+                        report(doc_path, status)
+
+                    def on_error(error, doc_path=doc_path):
+                        report(doc_path, "failed", error)
+
+                    # Children whose text is unchanged keep their old vectors
+                    pipeline.add_document(f"{doc_name}.pdf", child_chunks, on_complete=on_complete, on_error=on_error)
                 
-                collection = self.rag_system.vector_db.get_collection(self.rag_system.collection_name)
-                collection.add_documents(child_chunks)
-                self.rag_system.parent_store.save_many(parent_chunks)
-                
-                added += 1
-                
+                except Exception as e:
+                    print(f"Error processing {doc_path}: {e}")
+                    report(doc_path, "failed", f"{type(e).__name__}: {e}")
+        finally:
+            # Also on an unexpected stage error: documents already queued are still written and reported
+            try:
+                # Failed batches are reported per document through on_error; this only raises on unexpected errors
+                pipeline.close()
             except Exception as e:
-                print(f"Error processing {doc_path}: {e}")
-                skipped += 1
-            
-        return added, skipped
+                print(f"Error writing chunks to the vector store: {e}")
+                for doc_path in todo:
+                    report(doc_path, "failed", f"{type(e).__name__}: {e}")
+            # The manifest is only written every few documents; persist the rest of this batch
+            self.manifest.flush()
+
+        added = sum(1 for status in outcomes.values() if status == "added")
+        return added, len(outcomes) - added
+
+    def ingest_directory(self, path_dir, progress_callback=None, failures=None):
+        """
+        Stream every PDF / Markdown file under path_dir (recursively) into the index.
+        Documents are identified by file name, so a file whose stem repeats one seen earlier (in sorted path order)
+        is reported in failures instead of overwriting it.
+        """
+        paths = sorted(str(p) for p in Path(path_dir).rglob("*") if p.suffix.lower() in (".pdf", ".md"))
+        return self.add_documents(paths, progress_callback=progress_callback, failures=failures)
+
+    def __convert(self, document_paths, emit, workers):
+        # Stage 1: emits (source path, Markdown path or None, conversion error or None) as each file is ready
+        pdf_paths = []
+        for doc_path in document_paths:
+            if Path(doc_path).suffix.lower() == ".md":
+                md_path = self.markdown_dir / Path(doc_path).name
+                try:
+                    if Path(doc_path).resolve() != md_path.resolve():
+                        shutil.copy(doc_path, md_path)
+                except OSError as e:
+                    emit((doc_path, None, f"{type(e).__name__}: {e}"))
+                    continue
+                emit((doc_path, md_path, None))
+            else:
+                pdf_paths.append(doc_path)
+
+        if pdf_paths:
+            sources = {Path(p): p for p in pdf_paths}
+
+            def on_result(pdf_path, error):
+                emit((sources[pdf_path], None if error else self.markdown_dir / f"{pdf_path.stem}.md", error))
+
+            pdfs_to_markdowns(pdf_paths, overwrite=True, workers=workers, isolate=True, result_callback=on_result)
+
+    def __chunk(self, converted, emit, workers):
+        # Stage 2: submits each converted file to the chunking pool as soon as it arrives and emits
+        # (source path, future of (parent_chunks, child_chunks) or None, error or None), in conversion order
+        with self.rag_system.chunker.chunk_submitter(workers) as submit:
+            for doc_path, md_path, error in converted:
+                emit((doc_path, submit(md_path) if md_path is not None else None, error))
     
     def get_markdown_files(self):
         if not self.markdown_dir.exists():
@@ -67,6 +186,24 @@ class DocumentManager:
             shutil.rmtree(self.markdown_dir)
             self.markdown_dir.mkdir(parents=True, exist_ok=True)
         
+        self.manifest.clear()
         self.rag_system.parent_store.clear_store()
         self.rag_system.vector_db.delete_collection(self.rag_system.collection_name)
-        self.rag_system.vector_db.create_collection(self.rag_system.collection_name)
\ No newline at end of file
+        self.rag_system.vector_db.create_collection(self.rag_system.collection_name)
+
+if __name__ == "__main__":
+    # Whole-corpus build, streamed end to end (run from project/): python -m core.document_manager docs/
+    import argparse
+    from core.rag_system import RAGSystem
+
+    parser = argparse.ArgumentParser(description="Ingest every PDF / Markdown file under a directory.")
+    parser.add_argument("path_dir", help="directory to scan recursively for .pdf and .md files")
+    args = parser.parse_args()
+
+    rag_system = RAGSystem()
+    rag_system.vector_db.create_collection(rag_system.collection_name)
+    failures = {}
+    added, skipped = DocumentManager(rag_system).ingest_directory(args.path_dir, failures=failures)
+    for path, error in failures.items():
+        print(f"❌ {path}: {error}")
+    print(f"✅ Added {added} documents, skipped {skipped}")
@@ -0,0 +1,319 @@
+# project/core/ingestion_jobs.py
+
+# ============================================================
+# 导入部分
+# ============================================================
+
+# [Python标准库] shutil / sqlite3 / threading / time / uuid
+# 用法：
+# - shutil: 上传的文件先复制到任务目录 (Gradio 的临时文件可能被清理)，处理完再删除。
+# - sqlite3: 任务队列落盘，页面刷新、进程重启后进度都不会丢。
+# - threading: 后台调度线程；队列状态的读写加锁。
+# - time: 记录每个文件的耗时，估算剩余时间 (ETA)。
+# - uuid: 任务 ID。
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+
+# [Python标准库] pathlib / typing
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# [本项目] config
+# 用法：读取任务目录、转换 / 切分进程数、每批文件数、失败自动重试次数。
+import config
+
+
+# ============================================================
+# 类定义: IngestionJobQueue (后台入库任务队列)
+# ============================================================
+class IngestionJobQueue:
+    """
+    [类功能] 持久化的入库任务队列：上传只负责 enqueue，立即返回任务 ID；后台调度线程把排队的文件
+    成批交给 DocumentManager.add_documents，页面定时轮询 status() 显示进度。
+
+    - 队列存在本地 SQLite 文件里；进程重启时，上次没做完的文件 (包括正在处理的) 自动重新排队；
+      正在处理时进程退出、且已经用完重试次数的文件标记为失败，不会每次重启都再把进程搞崩。
+    - 调度线程只有一个：每次取出最多 batch_files 个排队中的文件 (可以跨任务)，作为一批调用一次
+      add_documents。这样一批文件共用 PDF 转换进程池 (超时 + 崩溃隔离，PyMuPDF 不会在主进程的多个线程里
+      并发运行)、切分进程池和同一条批量编码写入流水线；转换 / 切分的进程数 (config.INGEST_JOB_WORKERS)
+      决定吞吐量。
+    - 每个文件的状态：pending -> running -> added / skipped / failed / cancelled，批内每个文件一有结果就更新。
+      失败的文件自动重试，直到 config.INGEST_JOB_MAX_ATTEMPTS 次；之后可以手动 retry()。
+    - cancel() 取消还没被取进批次的文件；已经在处理的这一批会处理完 (中途打断会留下写了一半的索引)。
+    - 同名文档 (同一个 stem) 不会进同一批，避免互相覆盖；排在后面的那个留到下一批。
+    """
+
+    def __init__(self, doc_manager, job_dir=config.INGEST_JOB_DIR, workers=config.INGEST_JOB_WORKERS,
+                 batch_files=config.INGEST_JOB_BATCH_FILES, max_attempts=config.INGEST_JOB_MAX_ATTEMPTS):
+        self.__doc_manager = doc_manager
+        self.__upload_dir = Path(job_dir) / "uploads"
+        self.__upload_dir.mkdir(parents=True, exist_ok=True)
+        self.__max_attempts = max_attempts
+        self.__workers = workers
+        self.__batch_files = max(1, batch_files)
+
+        # check_same_thread=False: 调度线程、入库的写入线程和 Gradio 的回调线程共用这个连接，由 self.__lock 串行化
+        self.__lock = threading.Lock()
+        self.__wakeup = threading.Condition(self.__lock)
+        self.__db = sqlite3.connect(str(Path(job_dir) / "jobs.sqlite"), check_same_thread=False)
+        self.__db.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY, created REAL NOT NULL, cancelled INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS job_files (
+                job_id TEXT NOT NULL, idx INTEGER NOT NULL, name TEXT NOT NULL, path TEXT NOT NULL,
+                status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, error TEXT,
+                started REAL, finished REAL,
+                PRIMARY KEY (job_id, idx)
+            );
+        """)
+        # 上次进程退出时正在处理的文件：重试次数用完的 (很可能就是它让进程崩溃的) 标记为失败，其余的重新排队
+        self.__db.execute(
+            "UPDATE job_files SET status = 'failed', finished = ?, error = ? WHERE status = 'running' AND attempts >= ?",
+            (time.time(), "Interrupted: the process exited while ingesting this file", self.__max_attempts)
+        )
+        self.__db.execute("UPDATE job_files SET status = 'pending', started = NULL WHERE status = 'running'")
+        self.__db.commit()
+
+        self.__active = 0
+        self.__closed = False
+        self.__thread = threading.Thread(target=self.__worker, name="ingest-job", daemon=True)
+        self.__thread.start()
+
+    # ------------------------------------------------------------
+    # 公开方法：提交 / 取消 / 重试
+    # ------------------------------------------------------------
+    def enqueue(self, file_paths: List[str]) -> str:
+        """复制文件到任务目录并排队，立即返回任务 ID。"""
+        job_id = uuid.uuid4().hex[:12]
+        rows = []
+        for idx, file_path in enumerate(file_paths):
+            # 每个文件一个子目录：保留原文件名 (文档名取自文件名)，同一批里同名文件也不会冲突
+            staged = self.__upload_dir / job_id / str(idx) / Path(file_path).name
+            staged.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy(file_path, staged)
+            rows.append((job_id, idx, Path(file_path).name, str(staged), "pending"))
+
+        with self.__wakeup:
+            self.__db.execute("INSERT INTO jobs (id, created) VALUES (?, ?)", (job_id, time.time()))
+            self.__db.executemany(
+                "INSERT INTO job_files (job_id, idx, name, path, status) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            self.__db.commit()
+            self.__wakeup.notify_all()
+        print(f"📥 Queued ingestion job {job_id} ({len(rows)} files)")
+        return job_id
+
+    def cancel(self, job_id: str) -> int:
+        """取消任务里还没被取进批次的文件，返回取消的文件数。"""
+        with self.__lock:
+            self.__db.execute("UPDATE jobs SET cancelled = 1 WHERE id = ?", (job_id,))
+            count = self.__db.execute(
+                "UPDATE job_files SET status = 'cancelled', finished = ? WHERE job_id = ? AND status = 'pending'",
+                (time.time(), job_id)
+            ).rowcount
+            self.__db.commit()
+        return count
+
+    def cancel_all(self, wait: bool = False, timeout: Optional[float] = None) -> int:
+        """
+        取消所有任务里还没被取进批次的文件，返回取消的文件数。
+        wait=True 时等正在处理的这一批结束 (清空知识库前用)，最多等 timeout 秒；等完后用 active() 判断是否真的结束了。
+        """
+        with self.__lock:
+            job_ids = [row[0] for row in self.__db.execute(
+                "SELECT DISTINCT job_id FROM job_files WHERE status = 'pending'"
+            )]
+        count = sum(self.cancel(job_id) for job_id in job_ids)
+        if wait:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            with self.__wakeup:
+                while self.__active:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        break
+                    self.__wakeup.wait(remaining)
+        return count
+
+    def retry(self, job_id: Optional[str] = None) -> int:
+        """把失败 / 已取消的文件重新排队 (job_id 为 None 时处理所有任务)，返回重新排队的文件数。"""
+        where, params = ("job_id = ? AND ", (job_id,)) if job_id else ("", ())
+        with self.__wakeup:
+            if job_id:
+                self.__db.execute("UPDATE jobs SET cancelled = 0 WHERE id = ?", (job_id,))
+            else:
+                self.__db.execute("UPDATE jobs SET cancelled = 0")
+            count = self.__db.execute(
+                "UPDATE job_files SET status = 'pending', attempts = 0, error = NULL, started = NULL, "
+                f"finished = NULL WHERE {where}status IN ('failed', 'cancelled')", params
+            ).rowcount
+            self.__db.commit()
+            self.__wakeup.notify_all()
+        return count
+
+    # ------------------------------------------------------------
+    # 公开方法：进度
+    # ------------------------------------------------------------
+    def status(self, job_id: str) -> Optional[Dict]:
+        """
+        单个任务的进度：state (queued / running / done / failed / cancelled)、各状态文件数、
+        progress (0~1)、已用时间、预计剩余秒数 eta (还估不出来时为 None)、失败文件的错误信息。
+        """
+        with self.__lock:
+            job = self.__db.execute("SELECT created, cancelled FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if job is None:
+                return None
+            files = self.__db.execute(
+                "SELECT name, status, error, started, finished FROM job_files WHERE job_id = ? ORDER BY idx",
+                (job_id,)
+            ).fetchall()
+
+        counts = {s: 0 for s in ("pending", "running", "added", "skipped", "failed", "cancelled")}
+        for _, file_status, _, _, _ in files:
+            counts[file_status] += 1
+        finished = counts["added"] + counts["skipped"] + counts["failed"] + counts["cancelled"]
+        remaining = counts["pending"] + counts["running"]
+
+        if remaining:
+            state = "running" if counts["running"] or finished else "queued"
+        elif counts["failed"]:
+            state = "failed"
+        elif job[1] and counts["cancelled"]:
+            state = "cancelled"
+        else:
+            state = "done"
+
+        started = [s for _, _, _, s, _ in files if s]
+        ended = [f for _, _, _, _, f in files if f]
+        elapsed = ((max(ended) if not remaining and ended else time.time()) - min(started)) if started else 0.0
+
+        # ETA：按本任务的实际吞吐量 (已用时间 ÷ 已处理文件数) 估算剩余文件的耗时。
+        # 一批里的文件同时开始、陆续完成，所以不能用单个文件的耗时来算
+        done = counts["added"] + counts["skipped"] + counts["failed"]
+        eta = elapsed / done * remaining if remaining and done and elapsed > 0 else None
+
+        return {
+            "id": job_id,
+            "state": state,
+            "total": len(files),
+            **counts,
+            "progress": finished / len(files) if files else 1.0,
+            "current": [name for name, st, _, _, _ in files if st == "running"],
+            "elapsed": elapsed,
+            "eta": eta,
+            "errors": {name: error for name, st, error, _, _ in files if st == "failed"},
+        }
+
+    def active(self) -> int:
+        """正在处理 (已取进批次、还没有结果) 的文件数。"""
+        with self.__lock:
+            return self.__active
+
+    def list_jobs(self, limit: int = 10) -> List[Dict]:
+        """最近 limit 个任务的进度 (最新的在前)。"""
+        with self.__lock:
+            job_ids = [row[0] for row in self.__db.execute(
+                "SELECT id FROM jobs ORDER BY created DESC LIMIT ?", (limit,)
+            )]
+        return [status for status in map(self.status, job_ids) if status]
+
+    def close(self):
+        """停止调度线程 (正在处理的这一批会处理完)。"""
+        with self.__wakeup:
+            self.__closed = True
+            self.__wakeup.notify_all()
+        self.__thread.join()
+        self.__db.close()
+
+    # ------------------------------------------------------------
+    # 内部方法：调度
+    # ------------------------------------------------------------
+    def __claim_batch(self):
+        # 调用方持有 self.__lock。按任务提交顺序取最多 batch_files 个待处理文件，同一个 stem 每批只取一个
+        batch, stems = [], set()
+        now = time.time()
+        for job_id, idx, name, path, attempts in self.__db.execute(
+            "SELECT f.job_id, f.idx, f.name, f.path, f.attempts FROM job_files f JOIN jobs j ON j.id = f.job_id "
+            "WHERE f.status = 'pending' ORDER BY j.created, f.idx"
+        ).fetchall():
+            if len(batch) >= self.__batch_files:
+                break
+            if Path(name).stem in stems:
+                continue
+            stems.add(Path(name).stem)
+            batch.append((job_id, idx, name, path, attempts + 1))
+
+        self.__db.executemany(
+            "UPDATE job_files SET status = 'running', attempts = ?, started = ? WHERE job_id = ? AND idx = ?",
+            [(attempts, now, job_id, idx) for job_id, idx, _, _, attempts in batch]
+        )
+        self.__db.commit()
+        self.__active += len(batch)
+        return batch
+
+    def __worker(self):
+        while True:
+            with self.__wakeup:
+                batch = []
+                while not self.__closed and not batch:
+                    batch = self.__claim_batch()
+                    if not batch:
+                        self.__wakeup.wait(timeout=5)
+                if not batch:
+                    return
+            self.__process(batch)
+
+    def __process(self, batch):
+        tasks = {task[3]: task for task in batch}
+        finished = set()
+
+        # 每个文件一有结果就更新状态 (可能在入库的写入线程里回调)
+        def on_result(path, status, error):
+            if path in tasks and path not in finished:
+                finished.add(path)
+                self.__finish(tasks[path], status, error)
+
+        error = "No result was reported for this file"
+        try:
+            self.__doc_manager.add_documents(
+                list(tasks), failures={}, result_callback=on_result, workers=self.__workers
+            )
+        except Exception as e:
+            print(f"❌ Ingestion batch failed: {e}")
+            error = f"{type(e).__name__}: {e}"
+
+        # 批次中途出错时还没有结果的文件
+        for path in tasks:
+            if path not in finished:
+                finished.add(path)
+                self.__finish(tasks[path], "failed", error)
+
+    def __finish(self, task, status, error):
+        job_id, idx, name, path, attempts = task
+
+        # 失败且还有重试次数：重新排队 (下一批再处理)
+        if status == "failed" and attempts < self.__max_attempts:
+            print(f"⚠️ Ingestion of {name} failed ({error}); retrying ({attempts}/{self.__max_attempts})")
+            status = "pending"
+        elif status == "failed":
+            print(f"❌ Ingestion of {name} failed: {error}")
+
+        with self.__wakeup:
+            self.__db.execute(
+                "UPDATE job_files SET status = ?, error = ?, finished = ? WHERE job_id = ? AND idx = ?",
+                (status, error, None if status == "pending" else time.time(), job_id, idx)
+            )
+            self.__db.commit()
+            self.__active -= 1
+            self.__wakeup.notify_all()
+
+        # 处理完的文件不再需要暂存副本 (失败的留着，方便重试)
+        if status in ("added", "skipped"):
+            shutil.rmtree(Path(path).parent, ignore_errors=True)
+            try:
+                Path(path).parent.parent.rmdir()  # 任务的最后一个文件处理完后，删掉空的任务目录
+            except OSError:
+                pass
@@ -0,0 +1,267 @@
+# project/core/ingestion_pipeline.py
+
+# ============================================================
+# 导入部分
+# ============================================================
+
+# [Python标准库] time
+# 用法：统计入库吞吐量 (chunks/sec)。
+import time
+
+# [Python标准库] queue / threading
+# 用法：流式入库的各级 (PDF 转换 -> 切分 -> 编码写入) 各跑在自己的线程里，级与级之间用有界队列衔接。
+import queue
+import threading
+
+# [Python标准库] concurrent.futures.ThreadPoolExecutor
+# 用法：
+# - 编码线程池 (2 个线程)：稠密模型 (torch) 和稀疏模型 (onnxruntime) 计算时都会释放 GIL，可以真正并发。
+# - 写入线程池 (1 个线程)：Qdrant 写入按顺序执行，同时与下一批的编码重叠。
+from concurrent.futures import ThreadPoolExecutor
+
+# [本项目] config
+# 用法：读取批大小 INGEST_BATCH_SIZE、级间队列容量 INGEST_QUEUE_SIZE。
+import config
+
+
+# ============================================================
+# 工具函数: 有界队列衔接的流水线级
+# ============================================================
+class StageCancelled(Exception):
+    """下游已经停止消费 (提前结束或出错)，上游的 emit 抛出它让生产者退出。"""
+
+
+def bounded_stage(producer, maxsize=config.INGEST_QUEUE_SIZE, name="ingest-stage"):
+    """
+    [生成器] 在后台线程里运行 producer(emit)：producer 每 emit 一项，就放进容量为 maxsize 的队列，
+    由这个生成器按顺序交给调用方。队列满时 emit 会阻塞 (背压)，所以两级之间最多积压 maxsize 项，
+    内存占用与语料总量无关。
+
+    producer 抛出的异常会在调用方这边重新抛出；调用方提前结束时，emit 抛出 StageCancelled 让 producer 退出。
+    """
+    items = queue.Queue(maxsize=maxsize)
+    cancelled = threading.Event()
+
+    def emit(item):
+        while True:
+            if cancelled.is_set():
+                raise StageCancelled()
+            try:
+                items.put((False, item), timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def run():
+        error = None
+        try:
+            producer(emit)
+        except StageCancelled:
+            return
+        except BaseException as e:
+            error = e
+        # 结束标记 (带上 producer 的异常)
+        while not cancelled.is_set():
+            try:
+                items.put((True, error), timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    thread = threading.Thread(target=run, name=name, daemon=True)
+    thread.start()
+    try:
+        while True:
+            done, item = items.get()
+            if done:
+                if item is not None:
+                    raise item
+                return
+            yield item
+    finally:
+        cancelled.set()
+
+
+# ============================================================
+# 类定义: IngestionPipeline (批量 + 流水线入库)
+# ============================================================
+class IngestionPipeline:
+    """
+    [类功能] 跨文档累积子块，按批编码和写入 Qdrant。
+
+    流水线：
+        编码第 N+1 批 (稠密 ‖ 稀疏 并发)  ──┐
+                                          ├─ 同时进行
+        写入第 N 批 (后台线程)          ──┘
+    同一时刻最多只有一批在写入、一批在编码，内存占用有上限。
+
+    每个文档的全部新子块写入之后，才删除它的旧点，然后回调 on_complete；
+    调用方在回调里更新清单，保证"清单里记录的文档"一定已经完整入库。
+
+    某一批编码或写入失败时，只有这一批里涉及的文档算失败 (保留旧点、不回调 on_complete，改为回调 on_error)，
+    其余文档照常写入；失败不会从之后的 add_document / close 里再抛出来。
+    """
+
+    def __init__(self, vector_db, collection_name, batch_size=config.INGEST_BATCH_SIZE):
+        self.__vector_db = vector_db
+        self.__collection_name = collection_name
+        self.__batch_size = batch_size
+
+        self.__embed_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="ingest-embed")
+        self.__upsert_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest-upsert")
+        self.__inflight = None
+        self.__finalizer_futures = []
+        # 编码或写入失败的文档序号 -> 错误信息。失败的文档不删除旧点，避免"新的没写进去、旧的又被删了"
+        self.__failed = {}
+        self.__failed_lock = threading.Lock()
+
+        # 待处理的 (子块, 向量或 None, 所属文档序号)
+        self.__pending = []
+        # 已入队 / 已出队 (编码并提交写入，或失败) 的子块总数，
+        # 以及等待"出队到这个位置之后"才能执行的收尾任务 [(位置, 文档序号, 旧点 ID, 回调, 出错回调)]
+        self.__enqueued = 0
+        self.__flushed = 0
+        self.__finalizers = []
+
+        self.__start = time.monotonic()
+        self.stats = {"documents": 0, "chunks": 0, "embedded": 0, "reused": 0, "batches": 0, "failed_documents": 0}
+
+    # ------------------------------------------------------------
+    # 公开方法：加入一个文档
+    # ------------------------------------------------------------
+    def add_document(self, source, child_chunks, on_complete=None, on_error=None):
+        """
+        规划该文档的替换 (复用未变化子块的旧向量)，并把子块放进待处理队列。
+        队列攒够一批就立即编码 + 提交写入。
+
+        写入完成后在写入线程里回调 on_complete()；这个文档的某一批失败时改为回调 on_error(错误信息)。
+        规划阶段 (读取旧点) 出错时直接抛出，此时这个文档还没有入队。
+        """
+        old_ids, vectors = self.__vector_db.plan_document_replacement(
+            self.__collection_name, source, child_chunks
+        )
+        doc = self.stats["documents"]
+        self.__pending.extend((chunk, vector, doc) for chunk, vector in zip(child_chunks, vectors))
+        self.__enqueued += len(child_chunks)
+        self.__finalizers.append((self.__enqueued, doc, old_ids, on_complete, on_error))
+        self.stats["documents"] += 1
+
+        while len(self.__pending) >= self.__batch_size:
+            self.__flush(self.__batch_size)
+
+    # ------------------------------------------------------------
+    # 公开方法：收尾
+    # ------------------------------------------------------------
+    def close(self):
+        """写完剩余的子块，等待所有后台任务结束，返回吞吐量统计。"""
+        try:
+            while self.__pending:
+                self.__flush(self.__batch_size)
+            # 没有子块的文档 (或者最后一批之后) 的收尾任务
+            self.__submit_finalizers()
+            self.__wait_inflight()
+            for future in self.__finalizer_futures:
+                future.result()
+        finally:
+            self.__embed_pool.shutdown(wait=True)
+            self.__upsert_pool.shutdown(wait=True)
+
+        elapsed = time.monotonic() - self.__start
+        self.stats["elapsed"] = elapsed
+        self.stats["chunks_per_sec"] = self.stats["chunks"] / elapsed if elapsed > 0 else 0.0
+        print(
+            f"📦 Ingested {self.stats['chunks']} chunks from {self.stats['documents']} documents "
+            f"in {elapsed:.1f}s ({self.stats['chunks_per_sec']:.1f} chunks/sec, "
+            f"{self.stats['embedded']} embedded, {self.stats['reused']} reused, "
+            f"{self.stats['failed_documents']} documents failed)"
+        )
+        return self.stats
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            # 出错时不再写入剩余数据，只等后台线程退出
+            self.__embed_pool.shutdown(wait=True)
+            self.__upsert_pool.shutdown(wait=True)
+
+    # ------------------------------------------------------------
+    # 内部方法：编码一批并提交写入
+    # ------------------------------------------------------------
+    def __flush(self, size):
+        batch, self.__pending = self.__pending[:size], self.__pending[size:]
+        chunks = [chunk for chunk, _, _ in batch]
+        vectors = [vector for _, vector, _ in batch]
+        docs = {doc for _, _, doc in batch}
+        self.__flushed += len(batch)
+
+        # 1. 稠密与稀疏编码并发执行 (此时上一批正在后台写入)
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        try:
+            if missing:
+                texts = [chunks[i].page_content for i in missing]
+                dense_future = self.__embed_pool.submit(self.__vector_db.embed_dense, texts)
+                sparse_future = self.__embed_pool.submit(self.__vector_db.embed_sparse, texts)
+                for i, dense, sparse in zip(missing, dense_future.result(), sparse_future.result()):
+                    vectors[i] = {"": dense, config.SPARSE_VECTOR_NAME: sparse}
+        except Exception as e:
+            # 这一批不写入，批内涉及的文档全部记为失败，它们的收尾任务会回调 on_error
+            self.__fail(docs, e)
+            self.__submit_finalizers()
+            return
+
+        self.stats["chunks"] += len(batch)
+        self.stats["batches"] += 1
+        self.stats["embedded"] += len(missing)
+        self.stats["reused"] += len(batch) - len(missing)
+
+        # 2. 等上一批写完 (背压)，再提交这一批
+        self.__wait_inflight()
+        self.__inflight = self.__upsert_pool.submit(self.__upsert, chunks, vectors, docs)
+        self.__submit_finalizers()
+
+    def __submit_finalizers(self):
+        # 写入线程是单线程、按提交顺序执行的，所以排在某批后面的收尾任务一定在那批写完之后才运行
+        while self.__finalizers and self.__finalizers[0][0] <= self.__flushed:
+            _, doc, old_ids, on_complete, on_error = self.__finalizers.pop(0)
+            self.__finalizer_futures.append(
+                self.__upsert_pool.submit(self.__finalize, doc, old_ids, on_complete, on_error)
+            )
+
+    def __fail(self, docs, error):
+        print(f"Error writing chunks to the vector store: {error}")
+        with self.__failed_lock:
+            for doc in docs:
+                self.__failed.setdefault(doc, f"{type(error).__name__}: {error}")
+
+    def __upsert(self, chunks, vectors, docs):
+        try:
+            self.__vector_db.upsert_chunks(self.__collection_name, chunks, vectors)
+        except Exception as e:
+            self.__fail(docs, e)
+
+    def __finalize(self, doc, old_ids, on_complete, on_error):
+        with self.__failed_lock:
+            error = self.__failed.get(doc)
+        if error is None:
+            try:
+                self.__vector_db.delete_points(self.__collection_name, old_ids)
+                if on_complete:
+                    on_complete()
+                return
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+        self.stats["failed_documents"] += 1
+        if on_error:
+            on_error(error)
+
+    def __wait_inflight(self):
+        if self.__inflight is not None:
+            try:
+                # 写入失败已经在 __upsert 里按文档记录，这里只会抛出意料之外的错误
+                self.__inflight.result()
+            finally:
+                self.__inflight = None
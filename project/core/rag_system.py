@@ -2,6 +2,15 @@
 
 # [Python标准库] 用于生成唯一的会话 ID
 import uuid
+# [Python标准库] 异步聊天路径里把会话表的 SQLite 读写放到线程里，不阻塞事件循环
+import asyncio
+# [Python标准库] 会话表：按最近使用排序 (LRU)，并发访问时加锁
+import threading
+from collections import OrderedDict
+# [Python标准库] 启动耗时统计：按阶段计时；会话表落盘 (与对话记忆同一个 SQLite 文件)
+import time
+import sqlite3
+from contextlib import contextmanager
 # [本项目] 导入刚才写好的配置文件
 import config
 
@@ -12,77 +21,251 @@ from langchain_openai import ChatOpenAI
 # [本项目] 导入其他核心模块 (保持原样)
 from db.vector_db_manager import VectorDbManager
 from db.parent_store_manager import ParentStoreManager
+from db.ingestion_manifest import IngestionManifest
+from db.answer_cache import SemanticAnswerCache
+from db.reranker import CrossEncoderReranker
 from document_chunker import DocumentChuncker
 from rag_agent.tools import ToolFactory
 from rag_agent.graph import create_agent_graph
 
 
 class RAGSystem:
+    # 会话表的 last_seen 只用于按 CHECKPOINT_THREAD_TTL 清理过期会话，几分钟的精度足够
+    _SESSION_TOUCH_INTERVAL = 300
 
     def __init__(self, collection_name=config.CHILD_COLLECTION):
+        # [本项目] 启动各阶段耗时 (秒)，按执行顺序记录
+        self.startup_timings = {}
+
         # [本项目] 初始化各项资源管理器
         self.collection_name = collection_name
-        self.vector_db = VectorDbManager()  # 向量库管理
-        self.parent_store = ParentStoreManager()  # 父文档存储管理
+        with self.__phase("connect vector db"):
+            self.vector_db = VectorDbManager()  # 向量库管理 (嵌入模型在 initialize 里后台预热)
+        with self.__phase("open parent store"):
+            self.parent_store = ParentStoreManager()  # 父文档存储管理
         self.chunker = DocumentChuncker()  # 文档切分器
+        self.manifest = IngestionManifest()  # 入库清单 (DocumentManager 写入，这里用它的版本号)
+
+        # [本项目] 语义答案缓存：语料版本取自入库清单，任何文档入库 / 清空都会让旧答案失效
+        self.answer_cache = SemanticAnswerCache(
+            embed_query=self.vector_db.embed_query,
+            corpus_version=self.manifest.version
+        ) if config.ANSWER_CACHE_ENABLED else None
+
+        # [本项目] 可选的交叉编码器重排序 (模型在第一次检索时才加载)
+        self.reranker = CrossEncoderReranker() if config.RERANK_ENABLED else None
 
         # 这个变量稍后会存储编译好的 LangGraph 图
         self.agent_graph = None
+        # 检索器 (initialize 时创建)
+        self.searcher = None
 
-        # [Python标准库] 生成一个随机的 UUID 作为默认的"线程ID"
-        # LangGraph 用这个 ID 来区分不同的用户对话历史
-        self.thread_id = str(uuid.uuid4())
+        # [本项目] 会话表: session_id -> thread_id
+        # LangGraph 用 thread_id 来区分不同的用户对话历史，每个浏览器会话 (Gradio session_hash) 各用一个，
+        # 并发用户之间互不干扰。session_id 为 None 时使用默认会话 (命令行 / 单用户场景)。
+        # 会话数超过 config.MAX_SESSIONS 时，淘汰最久未活动的会话并删除它的记忆。
+        # 记忆落盘 (sqlite 后端) 时会话表也落盘：重启后同一个浏览器标签页 / 命令行默认会话还能接上原来的对话。
+        self.__sessions = OrderedDict()
+        # session_id -> 上次写入会话表的时间：映射没变时最多每 _SESSION_TOUCH_INTERVAL 秒写一次 last_seen
+        self.__session_touched = {}
+        self.__sessions_lock = threading.Lock()
+        self.__session_db = self.__open_session_db()
 
     def initialize(self):
         """
         [本项目] 系统初始化核心函数
         负责建立数据库连接、连接 LLM API、并组装 Agent
+        嵌入模型默认在后台加载，这个函数不等模型就返回；用 is_ready() 查询是否就绪
         """
-        # 1. 确保向量数据库集合已创建
-        self.vector_db.create_collection(self.collection_name)
-        # 获取集合对象，准备传给搜索工具
-        collection = self.vector_db.get_collection(self.collection_name)
+        if not config.SILICONFLOW_API_KEY:
+            raise ValueError("❌ 未找到 SILICONFLOW_API_KEY，请检查你的 .env 文件！")
+
+        # 0. 开始加载嵌入模型 (后台线程，与下面的步骤并行)
+        with self.__phase("load embedding models"):
+            self.vector_db.warm_up(background=config.WARM_UP_MODELS_IN_BACKGROUND)
+
+        # 1. 确保向量数据库集合已创建 (维度从模型元数据读取，不必等模型加载)
+        with self.__phase("prepare collection"):
+            self.vector_db.create_collection(self.collection_name)
+            # 获取检索器 (每次查询可选稠密 / 稀疏 / 混合模式)，准备传给搜索工具
+            collection = self.vector_db.get_searcher(self.collection_name)
+            self.searcher = collection
 
         # 2. 初始化 LLM (连接硅基流动)
         # [第三方库] 使用 config 中的配置实例化 ChatOpenAI
-        llm = ChatOpenAI(
-            model=config.LLM_MODEL,  # 模型: deepseek-ai/DeepSeek-V3
-            temperature=config.LLM_TEMPERATURE,  # 温度: 0
-            openai_api_key=config.SILICONFLOW_API_KEY,  # 从 .env 读到的 Key
-            openai_api_base=config.SILICONFLOW_BASE_URL  # 硅基流动的地址
-        )
+        with self.__phase("connect llm"):
+            llm = ChatOpenAI(
+                model=config.LLM_MODEL,  # 模型: deepseek-ai/DeepSeek-V3
+                temperature=config.LLM_TEMPERATURE,  # 温度: 0
+                openai_api_key=config.SILICONFLOW_API_KEY,  # 从 .env 读到的 Key
+                openai_api_base=config.SILICONFLOW_BASE_URL  # 硅基流动的地址
+            )
 
         # 3. 创建工具 (Tools)
         # [本项目] ToolFactory 会把向量库的搜索功能封装成 LLM 可以调用的函数
         # 比如: search_child_chunks(query="...")
-        tools = ToolFactory(collection).create_tools()
-
         # 4. 创建并编译 Agent 图 (Graph)
         # [本项目] 这是最关键的一步！
         # 它把 LLM (大脑) 和 Tools (手) 组装进 graph.py 定义的流程图中
-        self.agent_graph = create_agent_graph(llm, tools)
+        with self.__phase("build agent graph"):
+            tools = ToolFactory(collection, self.parent_store, reranker=self.reranker).create_tools()
+            self.agent_graph = create_agent_graph(llm, tools, answer_cache=self.answer_cache)
 
         print(f"✅ 系统初始化完成，已连接模型: {config.LLM_MODEL}")
+        if not self.is_ready():
+            print("⏳ Embedding models are still loading in the background")
+
+    def is_ready(self):
+        """
+        [本项目] 就绪信号：Agent 图已创建，且嵌入模型已加载 (在此之前的提问会先等模型加载完)
+        """
+        return self.agent_graph is not None and self.vector_db.models_ready()
+
+    def status(self):
+        """
+        [本项目] 启动状态：是否就绪、各模型的加载情况、各启动阶段耗时 (秒)
+        """
+        return {
+            "ready": self.is_ready(),
+            "models": self.vector_db.model_status(),
+            "startup_timings": dict(self.startup_timings),
+        }
+
+    @contextmanager
+    def __phase(self, name):
+        """[本项目] 给一个启动阶段计时，打印并记录到 startup_timings"""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.startup_timings[name] = time.monotonic() - start
+            print(f"⏱️ {name}: {self.startup_timings[name]:.2f}s")
+
+    def answer_cache_stats(self):
+        """
+        [本项目] 语义答案缓存的命中率等指标 (未启用时返回 None)
+        """
+        return self.answer_cache.stats() if self.answer_cache else None
+
+    def search_latency_stats(self):
+        """
+        [本项目] 每种检索模式 (dense / sparse / hybrid:融合方式) 的查询次数与延迟
+        """
+        return self.searcher.latency_stats() if self.searcher else {}
 
-    def get_config(self):
+    def rerank_stats(self):
+        """
+        [本项目] 重排序打分缓存的命中率、超出耗时预算的次数 (未启用时返回 None)
+        """
+        return self.reranker.stats() if self.reranker else None
+
+    def get_thread_id(self, session_id=None):
+        """
+        [本项目] 取出 (或新建) 某个会话对应的 LangGraph 线程 ID
+        """
+        evicted = []
+        with self.__sessions_lock:
+            thread_id = self.__sessions.get(session_id)
+            if thread_id is None:
+                thread_id = self.__stored_thread_id(session_id) or str(uuid.uuid4())
+            self.__sessions[session_id] = thread_id
+            self.__sessions.move_to_end(session_id)
+
+            # 每轮对话都会走到这里：只在映射新建 / 上次写入已经过去一段时间时才写盘
+            now = time.time()
+            if now - self.__session_touched.get(session_id, 0.0) > self._SESSION_TOUCH_INTERVAL:
+                self.__store_session(session_id, thread_id)
+                self.__session_touched[session_id] = now
+
+            while len(self.__sessions) > config.MAX_SESSIONS:
+                old_session_id, old_thread_id = self.__sessions.popitem(last=False)
+                self.__forget_session(old_session_id)
+                evicted.append(old_thread_id)
+
+        for old_thread_id in evicted:
+            self.__delete_thread(old_thread_id)
+        return thread_id
+
+    def get_config(self, session_id=None):
         """
         [LangGraph] 获取运行配置
         每次调用 graph.invoke 时，都需要传入这个配置，
-        LangGraph 会根据里面的 thread_id 找到之前的聊天记录 (Memory)
+        LangGraph 会根据里面的 thread_id 找到该会话之前的聊天记录 (Memory)
         """
-        return {"configurable": {"thread_id": self.thread_id}}
+        return {"configurable": {"thread_id": self.get_thread_id(session_id)}}
 
-    def reset_thread(self):
+    async def aget_config(self, session_id=None):
+        """
+        [LangGraph] get_config 的异步版本：会话表可能要读写 SQLite，放到线程里执行，不阻塞事件循环
+        """
+        return await asyncio.to_thread(self.get_config, session_id)
+
+    def reset_thread(self, session_id=None):
         """
         [本项目] 重置对话
-        当用户点击页面上的"清除聊天"按钮时调用
+        当用户点击页面上的"清除聊天"按钮时调用，只影响该用户自己的会话
         """
+        with self.__sessions_lock:
+            thread_id = self.__sessions.pop(session_id, None) or self.__stored_thread_id(session_id)
+            self.__forget_session(session_id)
+
+        # 下次访问时会生成一个新的 ID，对于 LangGraph 来说这就是一个全新的用户
+        if thread_id:
+            self.__delete_thread(thread_id)
+
+    # ------------------------------------------------------------
+    # 会话表落盘 (调用方持有 self.__sessions_lock)
+    # ------------------------------------------------------------
+    @staticmethod
+    def __open_session_db():
+        if config.CHECKPOINTER_BACKEND != "sqlite":
+            # 内存记忆重启即丢失，会话表落盘没有意义
+            return None
+        # timeout: 和 SqliteSaver 的连接共用一个文件，对方正在写时等一会儿，而不是报 "database is locked"
+        conn = sqlite3.connect(config.CHECKPOINT_DB_PATH, check_same_thread=False, timeout=30)
+        # WAL (SqliteSaver 自己也会打开)：读写互不阻塞
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS session_threads "
+            "(session_id TEXT PRIMARY KEY, thread_id TEXT NOT NULL, last_seen REAL NOT NULL)"
+        )
+        # 超过 TTL 的线程已被 checkpointer 淘汰，对应的会话记录也不再需要
+        conn.execute("DELETE FROM session_threads WHERE last_seen < ?", (time.time() - config.CHECKPOINT_THREAD_TTL,))
+        conn.commit()
+        return conn
+
+    @staticmethod
+    def __session_key(session_id):
+        return "" if session_id is None else str(session_id)
+
+    def __stored_thread_id(self, session_id):
+        if self.__session_db is None:
+            return None
+        row = self.__session_db.execute(
+            "SELECT thread_id FROM session_threads WHERE session_id = ?", (self.__session_key(session_id),)
+        ).fetchone()
+        return row[0] if row else None
+
+    def __store_session(self, session_id, thread_id):
+        if self.__session_db is not None:
+            self.__session_db.execute(
+                "INSERT OR REPLACE INTO session_threads (session_id, thread_id, last_seen) VALUES (?, ?, ?)",
+                (self.__session_key(session_id), thread_id, time.time())
+            )
+            self.__session_db.commit()
+
+    def __forget_session(self, session_id):
+        self.__session_touched.pop(session_id, None)
+        if self.__session_db is not None:
+            self.__session_db.execute(
+                "DELETE FROM session_threads WHERE session_id = ?", (self.__session_key(session_id),)
+            )
+            self.__session_db.commit()
+
+    def __delete_thread(self, thread_id):
         try:
-            # [第三方库] 尝试物理删除当前线程的记忆数据
+            # [第三方库] 尝试物理删除该线程的记忆数据
             if self.agent_graph:
-                self.agent_graph.checkpointer.delete_thread(self.thread_id)
+                self.agent_graph.checkpointer.delete_thread(thread_id)
         except Exception as e:
-            print(f"Warning: Could not delete thread {self.thread_id}: {e}")
-
-        # 生成一个新的 ID，对于 LangGraph 来说这就是一个全新的用户
-        self.thread_id = str(uuid.uuid4())
\ No newline at end of file
+            print(f"Warning: Could not delete thread {thread_id}: {e}")
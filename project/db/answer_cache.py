@@ -0,0 +1,178 @@
+# project/db/answer_cache.py
+
+# ============================================================
+# 导入部分
+# ============================================================
+
+# [Python标准库] threading
+# 用法：多个会话并发查询 / 写入缓存，需要加锁。
+import threading
+
+# [Python标准库] collections.OrderedDict
+# 用法：按最近使用排序的条目表 (LRU)。
+from collections import OrderedDict
+
+# [Python标准库] typing
+from typing import Any, Callable, Dict, List, Optional
+
+# [第三方库] numpy
+# 来源：sentence-transformers / qdrant-client 的依赖，已随之安装
+# 用法：把所有缓存问题的向量堆成一个矩阵，一次矩阵乘法算出全部余弦相似度。
+import numpy as np
+
+# [本项目] config
+# 用法：读取相似度阈值和条目数上限。
+import config
+
+# [本项目] db.embedding_cache.normalize_query
+# 用法：规范化后完全相同的问题直接命中，不需要算相似度。
+from db.embedding_cache import normalize_query
+
+# [本项目] db.hybrid_search.identifier_tokens
+# 用法：相似度命中时，两个问题里的编号 / 数值 (型号、年份、ID) 必须完全一致。
+from db.hybrid_search import identifier_tokens
+
+
+# ============================================================
+# 类定义: SemanticAnswerCache (语义答案缓存)
+# ============================================================
+class SemanticAnswerCache:
+    """
+    [类功能] 缓存"问题 → 最终汇总答案"，换个说法问同一个问题时直接返回旧答案，
+    跳过 process_question 子图和 aggregate 节点的全部 LLM 调用。
+
+    - 查找：先按规范化文本精确匹配，再按向量余弦相似度 (>= threshold) 找最接近的问题。
+      相似度命中还要求两个问题里含数字的词 (型号、年份、ID 等) 完全一致：
+      "X100 max voltage" 和 "X200 max voltage" 的向量几乎一样，答案却不能互相替代。
+    - 作用域：每个条目都绑定写入时的语料版本 (corpus_version())。
+      一旦有文档入库 / 删除，版本变化，旧答案全部作废。
+    - 容量：按条目数限界的 LRU。
+    """
+
+    def __init__(self, embed_query: Callable[[str], List[float]], corpus_version: Callable[[], str],
+                 threshold=config.ANSWER_CACHE_THRESHOLD, max_entries=config.ANSWER_CACHE_MAX_ENTRIES):
+        self.__embed_query = embed_query
+        self.__corpus_version = corpus_version
+        self.__threshold = threshold
+        self.__max_entries = max_entries
+        self.__lock = threading.Lock()
+
+        # 规范化问题 -> (单位化后的向量, 答案, 含数字的词)，只保存当前语料版本的条目
+        self.__entries: "OrderedDict[str, Any]" = OrderedDict()
+        self.__version = None
+        # 相似度矩阵 (条目数 × 维度)，条目变化后延迟重建
+        self.__matrix = None
+        self.__keys: List[str] = []
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    # ------------------------------------------------------------
+    # 查找
+    # ------------------------------------------------------------
+    def lookup(self, query: str) -> Optional[str]:
+        """返回缓存的答案，未命中返回 None。"""
+        key = normalize_query(query)
+        with self.__lock:
+            self.__check_version()
+            entry = self.__entries.get(key)
+            if entry is not None:
+                self.__entries.move_to_end(key)
+                self.hits += 1
+                print(f"⚡ Answer cache hit (exact): {query}")
+                return entry[1]
+            if not self.__entries:
+                self.misses += 1
+                return None
+
+        # 编码放在锁外面：它是整个查找里最慢的一步
+        vector = self.__unit_vector(query)
+
+        with self.__lock:
+            self.__check_version()
+            if not self.__entries:
+                self.misses += 1
+                return None
+            if self.__matrix is None:
+                self.__keys = list(self.__entries)
+                self.__matrix = np.stack([self.__entries[k][0] for k in self.__keys])
+
+            scores = self.__matrix @ vector
+            tokens = identifier_tokens(key)
+            # 超过阈值的候选按相似度从高到低，取第一个编号 / 数值完全一致的
+            candidates = np.flatnonzero(scores >= self.__threshold)
+            for best in candidates[np.argsort(-scores[candidates])]:
+                best_key = self.__keys[best]
+                if self.__entries[best_key][2] != tokens:
+                    continue
+                self.__entries.move_to_end(best_key)
+                self.hits += 1
+                print(f"⚡ Answer cache hit (similarity {scores[best]:.3f}): {query}")
+                return self.__entries[best_key][1]
+
+            self.misses += 1
+            return None
+
+    # ------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------
+    def store(self, query: str, answer: str, version: Optional[str] = None) -> None:
+        """
+        登记一个答案。version 传入回答开始时的语料版本：
+        如果回答期间有文档入库 (版本已变化)，这个答案可能基于旧语料，不写入。
+        """
+        if self.__max_entries <= 0:
+            return
+        key = normalize_query(query)
+        vector = self.__unit_vector(query)
+        with self.__lock:
+            self.__check_version()
+            if version is not None and version != self.__version:
+                return
+            self.__entries[key] = (vector, answer, identifier_tokens(key))
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.__max_entries:
+                self.__entries.popitem(last=False)
+            self.__matrix = None
+
+    def corpus_version(self) -> str:
+        return self.__corpus_version()
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__entries.clear()
+            self.__matrix = None
+
+    # ------------------------------------------------------------
+    # 指标
+    # ------------------------------------------------------------
+    def stats(self) -> Dict[str, Any]:
+        with self.__lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.__entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "corpus_version": self.__version,
+            }
+
+    # ------------------------------------------------------------
+    # 内部方法
+    # ------------------------------------------------------------
+    def __check_version(self) -> None:
+        # 调用方已持有锁
+        version = self.__corpus_version()
+        if version != self.__version:
+            if self.__entries:
+                self.invalidations += 1
+            self.__entries.clear()
+            self.__matrix = None
+            self.__version = version
+
+    def __unit_vector(self, text: str):
+        vector = np.asarray(self.__embed_query(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
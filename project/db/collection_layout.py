@@ -0,0 +1,120 @@
+# project/db/collection_layout.py
+
+# ============================================================
+# 导入部分
+# ============================================================
+
+# [Python标准库] typing
+from typing import Any, Dict, Optional
+
+# [第三方库] qdrant_client.http.models
+# 用法：集合的存储布局 (量化、磁盘存储、HNSW) 和查询参数 (重打分)。
+from qdrant_client.http import models as qmodels
+
+# [本项目] config
+# 用法：默认布局全部来自 config.py 的 "Qdrant 集合配置" 一节。
+import config
+
+
+# ============================================================
+# 布局选项
+# ============================================================
+# 一个"布局"就是一个普通字典，键与下面 default_layout() 返回的一致。
+# 集合创建 (VectorDbManager.create_collection) 和基准测试 (benchmarks/vector_layout_benchmark.py) 共用。
+QUANTIZATION_TYPES = (None, "scalar", "binary")
+
+
+def default_layout() -> Dict[str, Any]:
+    """按 config.py 组装默认布局。"""
+    return {
+        "quantization": config.VECTOR_QUANTIZATION,
+        "quantization_always_ram": config.QUANTIZATION_ALWAYS_RAM,
+        "vectors_on_disk": config.VECTORS_ON_DISK,
+        "payload_on_disk": config.PAYLOAD_ON_DISK,
+        "hnsw_m": config.HNSW_M,
+        "hnsw_ef_construct": config.HNSW_EF_CONSTRUCT,
+        "hnsw_on_disk": config.HNSW_ON_DISK,
+        "search_hnsw_ef": config.SEARCH_HNSW_EF,
+        "rescore": config.QUANTIZATION_RESCORE,
+        "oversampling": config.QUANTIZATION_OVERSAMPLING,
+    }
+
+
+# ============================================================
+# 工具函数: 布局 -> Qdrant 参数
+# ============================================================
+def collection_params(dense_size: int, layout: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    [函数功能] 返回 client.create_collection(...) 需要的关键字参数 (不含 collection_name)。
+    未设置的选项 (None) 不传给 Qdrant，沿用服务端默认值 —— 全部为默认时与原来的集合完全相同。
+    """
+    layout = {**default_layout(), **(layout or {})}
+    if layout["quantization"] not in QUANTIZATION_TYPES:
+        raise ValueError(f"Unsupported quantization: {layout['quantization']}")
+
+    params = {
+        # 稠密向量：余弦相似度；on_disk=True 时原始 float32 向量放在磁盘 (mmap)，内存里只留量化后的副本
+        "vectors_config": qmodels.VectorParams(
+            size=dense_size,
+            distance=qmodels.Distance.COSINE,
+            on_disk=layout["vectors_on_disk"] or None
+        ),
+        # 稀疏向量 (BM25)：混合检索的关键词部分
+        "sparse_vectors_config": {
+            config.SPARSE_VECTOR_NAME: qmodels.SparseVectorParams(
+                index=qmodels.SparseIndexParams(on_disk=True) if layout["vectors_on_disk"] else None
+            )
+        },
+    }
+
+    if layout["payload_on_disk"]:
+        # payload (子块正文 + 元数据) 只在返回结果时读取，放磁盘对检索速度影响很小
+        params["on_disk_payload"] = True
+
+    hnsw = {
+        key: value for key, value in (
+            ("m", layout["hnsw_m"]),
+            ("ef_construct", layout["hnsw_ef_construct"]),
+            ("on_disk", layout["hnsw_on_disk"] or None),
+        ) if value is not None
+    }
+    if hnsw:
+        params["hnsw_config"] = qmodels.HnswConfigDiff(**hnsw)
+
+    if layout["quantization"] == "scalar":
+        # int8 标量量化：内存降到 1/4，召回损失通常很小
+        params["quantization_config"] = qmodels.ScalarQuantization(
+            scalar=qmodels.ScalarQuantizationConfig(
+                type=qmodels.ScalarType.INT8,
+                quantile=0.99,
+                always_ram=layout["quantization_always_ram"]
+            )
+        )
+    elif layout["quantization"] == "binary":
+        # 二值量化：内存降到 1/32，需要配合重打分 (rescore + oversampling) 保证召回
+        params["quantization_config"] = qmodels.BinaryQuantization(
+            binary=qmodels.BinaryQuantizationConfig(always_ram=layout["quantization_always_ram"])
+        )
+
+    return params
+
+
+def search_params(layout: Optional[Dict[str, Any]] = None, exact: bool = False) -> Optional[qmodels.SearchParams]:
+    """
+    [函数功能] 返回稠密查询使用的 SearchParams；全部为默认时返回 None (与原来的查询完全相同)。
+    - 量化集合：先用量化向量取 limit × oversampling 个候选，再用原始向量重打分 (rescore)。
+    - exact=True：暴力搜索，基准测试用它计算"标准答案"。
+    """
+    layout = {**default_layout(), **(layout or {})}
+    if exact:
+        return qmodels.SearchParams(exact=True)
+
+    kwargs = {}
+    if layout["search_hnsw_ef"] is not None:
+        kwargs["hnsw_ef"] = layout["search_hnsw_ef"]
+    if layout["quantization"]:
+        kwargs["quantization"] = qmodels.QuantizationSearchParams(
+            rescore=layout["rescore"],
+            oversampling=layout["oversampling"]
+        )
+    return qmodels.SearchParams(**kwargs) if kwargs else None
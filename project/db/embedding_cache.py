@@ -0,0 +1,275 @@
+# project/db/embedding_cache.py
+
+# ============================================================
+# 导入部分
+# ============================================================
+
+# [Python标准库] hashlib / json / sqlite3 / threading / time / unicodedata
+# 用法：
+# - hashlib: 把 "模型名 + 规范化文本" 做成定长的缓存键。
+# - json: 向量序列化后存入磁盘缓存。
+# - os: 同一个缓存文件按绝对路径共用一个连接。
+# - sqlite3: 可选的持久化缓存层，单文件、无需额外依赖。
+# - threading: 并行子图会同时搜索，缓存读写需要加锁。
+# - time: 记录磁盘缓存条目的最近访问时间，超过上限时先删最久没用的。
+# - unicodedata: NFKC 规范化 (全角/半角等差异视为同一个查询)。
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+# [Python标准库] collections.OrderedDict
+# 用法：内存 LRU 层。
+from collections import OrderedDict
+
+# [Python标准库] typing
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# [第三方库] langchain_core.embeddings.Embeddings
+# 用法：LangChain 的稠密向量接口，QdrantVectorStore 只依赖 embed_query / embed_documents。
+from langchain_core.embeddings import Embeddings
+
+# [第三方库] langchain_qdrant
+# 用法：稀疏向量的接口与返回类型 (FastEmbedSparse 也实现了这个接口)。
+from langchain_qdrant import SparseEmbeddings, SparseVector
+
+
+# ============================================================
+# 工具函数: 查询文本规范化
+# ============================================================
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """
+    [规范化] NFKC + 去首尾空白 + 连续空白合并为一个空格。
+    只做不改变语义的处理，保证"几乎一样"的重试查询命中同一个缓存键。
+    """
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+# ============================================================
+# 工具函数: 共用的 SQLite 连接
+# ============================================================
+# 绝对路径 -> (连接, 锁)。稠密 / 稀疏两个缓存写同一个文件：各开一个连接会互相抢写锁 ("database is locked")，
+# 所以同一个文件在进程里只开一个连接，所有读写都在同一把锁下串行
+_SHARED_DBS: Dict[str, Tuple[sqlite3.Connection, threading.Lock]] = {}
+_SHARED_DBS_LOCK = threading.Lock()
+
+
+def _shared_db(db_path: str) -> Tuple[sqlite3.Connection, threading.Lock]:
+    path = os.path.abspath(db_path)
+    with _SHARED_DBS_LOCK:
+        if path not in _SHARED_DBS:
+            # check_same_thread=False: Gradio 的回调线程会共用这个连接，由返回的锁串行化
+            # timeout: 别的进程 (比如命令行入库) 正在写时等一会儿，而不是立即报 "database is locked"
+            db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+            # WAL: 读不阻塞写，写只追加日志，commit 的代价更小
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            # 旧版本的缓存文件没有 accessed 列，补上 (旧条目记为 0，最先被淘汰)
+            columns = {row[1] for row in db.execute("PRAGMA table_info(embeddings)")}
+            if "accessed" not in columns:
+                db.execute("ALTER TABLE embeddings ADD COLUMN accessed REAL NOT NULL DEFAULT 0")
+            db.execute("CREATE INDEX IF NOT EXISTS embeddings_accessed ON embeddings (accessed)")
+            db.commit()
+            _SHARED_DBS[path] = (db, threading.Lock())
+        return _SHARED_DBS[path]
+
+
+# ============================================================
+# 类定义: EmbeddingCache (两级缓存：内存 LRU + 可选 SQLite)
+# ============================================================
+class EmbeddingCache:
+    """
+    [类功能] 以 "模型名 + 规范化文本" 为键缓存查询向量。
+
+    - 第一级：内存 LRU，按条目数限界。
+    - 第二级：可选的 SQLite 文件 (db_path 为 None 时关闭)，重启后依然有效。同一个文件的所有缓存共用一个连接。
+      max_disk_entries 限制文件里的总行数 (同一个文件里的所有模型合计)，超出时按最近访问时间淘汰；None 表示不限。
+      磁盘命中时只有记录的访问时间已经过去 _TOUCH_INTERVAL 秒以上才更新它，读不会每次都变成一次写事务。
+    """
+
+    # 每写入这么多条才检查一次磁盘行数，避免每次 put 都 COUNT(*)
+    _PRUNE_EVERY = 64
+    # 访问时间的精度 (秒)：淘汰只需要知道"大概多久没用"
+    _TOUCH_INTERVAL = 300
+
+    def __init__(self, model_name: str, max_entries: int, db_path: Optional[str] = None,
+                 encode: Callable[[Any], str] = json.dumps, decode: Callable[[str], Any] = json.loads,
+                 max_disk_entries: Optional[int] = None):
+        self.__model_name = model_name
+        self.__max_entries = max_entries
+        self.__max_disk_entries = max_disk_entries
+        self.__puts_since_prune = 0
+        self.__encode = encode
+        self.__decode = decode
+        self.__lock = threading.Lock()
+        self.__items: "OrderedDict[str, Any]" = OrderedDict()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+
+        # self.__lock 只保护内存层和计数；磁盘层用共用连接自己的锁 (两把锁不会嵌套持有)
+        self.__db = None
+        self.__db_lock = None
+        if db_path:
+            self.__db, self.__db_lock = _shared_db(db_path)
+            with self.__db_lock:
+                self.__prune_disk()
+
+    def key(self, text: str) -> str:
+        raw = f"{self.__model_name}\x00{normalize_query(text)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    # ------------------------------------------------------------
+    # 读取
+    # ------------------------------------------------------------
+    def get(self, key: str) -> Optional[Any]:
+        with self.__lock:
+            value = self.__items.get(key)
+            if value is not None:
+                self.__items.move_to_end(key)
+                self.memory_hits += 1
+                return value
+
+        row = None
+        if self.__db is not None:
+            with self.__db_lock:
+                row = self.__db.execute("SELECT value, accessed FROM embeddings WHERE key = ?", (key,)).fetchone()
+                now = time.time()
+                if row is not None and now - row[1] > self._TOUCH_INTERVAL:
+                    self.__db.execute("UPDATE embeddings SET accessed = ? WHERE key = ?", (now, key))
+                    self.__db.commit()
+
+        with self.__lock:
+            if row is None:
+                self.misses += 1
+                return None
+            value = self.__decode(row[0])
+            self.__remember(key, value)
+            self.disk_hits += 1
+            return value
+
+    # ------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------
+    def put(self, key: str, value: Any) -> None:
+        with self.__lock:
+            self.__remember(key, value)
+        if self.__db is not None:
+            encoded = self.__encode(value)
+            with self.__db_lock:
+                self.__db.execute(
+                    "INSERT OR REPLACE INTO embeddings (key, value, accessed) VALUES (?, ?, ?)",
+                    (key, encoded, time.time())
+                )
+                self.__db.commit()
+                self.__puts_since_prune += 1
+                if self.__puts_since_prune >= self._PRUNE_EVERY:
+                    self.__prune_disk()
+
+    def __prune_disk(self) -> None:
+        """磁盘行数超过 max_disk_entries 时删掉最久没访问的条目 (调用方持有 self.__db_lock)。"""
+        self.__puts_since_prune = 0
+        if self.__db is None or self.__max_disk_entries is None:
+            return
+        excess = self.__db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] - self.__max_disk_entries
+        if excess > 0:
+            self.__db.execute(
+                "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY accessed LIMIT ?)", (excess,)
+            )
+            self.__db.commit()
+            self.disk_evictions += excess
+
+    def __remember(self, key: str, value: Any) -> None:
+        if self.__max_entries <= 0:
+            return
+        self.__items[key] = value
+        self.__items.move_to_end(key)
+        while len(self.__items) > self.__max_entries:
+            self.__items.popitem(last=False)
+            self.evictions += 1
+
+    # ------------------------------------------------------------
+    # 指标
+    # ------------------------------------------------------------
+    def stats(self) -> Dict[str, Any]:
+        with self.__lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "model": self.__model_name,
+                "entries": len(self.__items),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "disk_evictions": self.disk_evictions,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+
+# ============================================================
+# 类定义: CachedDenseEmbeddings (稠密向量缓存包装)
+# ============================================================
+class CachedDenseEmbeddings(Embeddings):
+    """
+    [类功能] 包装 HuggingFaceEmbeddings：embed_query 走缓存，embed_documents (入库) 原样透传。
+    编码的是规范化后的查询文本，和缓存键一致：同一个键下的所有写法得到同一个向量，与谁先被查询无关。
+    """
+
+    def __init__(self, embeddings: Embeddings, model_name: str, max_entries: int, db_path: Optional[str] = None,
+                 max_disk_entries: Optional[int] = None):
+        self.embeddings = embeddings
+        self.cache = EmbeddingCache(f"dense:{model_name}", max_entries, db_path, max_disk_entries=max_disk_entries)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        text = normalize_query(text)
+        key = self.cache.key(text)
+        vector = self.cache.get(key)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.cache.put(key, vector)
+        return vector
+
+
+# ============================================================
+# 类定义: CachedSparseEmbeddings (稀疏向量缓存包装)
+# ============================================================
+class CachedSparseEmbeddings(SparseEmbeddings):
+    """
+    [类功能] 包装 FastEmbedSparse (BM25)：embed_query 走缓存，embed_documents 原样透传。
+    """
+
+    def __init__(self, embeddings: SparseEmbeddings, model_name: str, max_entries: int,
+                 db_path: Optional[str] = None, max_disk_entries: Optional[int] = None):
+        self.embeddings = embeddings
+        self.cache = EmbeddingCache(
+            f"sparse:{model_name}", max_entries, db_path,
+            encode=lambda v: json.dumps({"indices": v.indices, "values": v.values}),
+            decode=lambda s: SparseVector(**json.loads(s)),
+            max_disk_entries=max_disk_entries,
+        )
+
+    def embed_documents(self, texts: List[str]) -> List[SparseVector]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> SparseVector:
+        text = normalize_query(text)
+        key = self.cache.key(text)
+        vector = self.cache.get(key)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.cache.put(key, vector)
+        return vector
@@ -0,0 +1,223 @@
+# project/db/hybrid_search.py
+
+# ============================================================
+# 导入部分
+# ============================================================
+
+# [Python标准库] re / threading / time
+# 用法：
+# - re: 路由器识别"编号类"查询 (零件号、错误码等)。
+# - threading: 并行子图同时搜索，延迟统计需要加锁。
+# - time: 统计每种检索模式的耗时。
+import re
+import threading
+import time
+
+# [Python标准库] collections.deque
+# 用法：每种模式只保留最近 N 次的耗时，用来算 p50 / p95。
+from collections import deque
+
+# [Python标准库] typing
+from typing import Dict, List, Optional
+
+# [第三方库] langchain_core.documents.Document
+# 用法：返回值与 QdrantVectorStore.similarity_search 一致，tools.py 不需要改格式化逻辑。
+from langchain_core.documents import Document
+
+# [第三方库] qdrant_client
+# 用法：直接调用 query_points 执行稠密 / 稀疏 / 融合查询。
+from qdrant_client import QdrantClient
+from qdrant_client.http import models as qmodels
+
+# [本项目] config
+# 用法：读取默认检索模式、融合方式、权重、各模式的分数阈值。
+import config
+
+
+# ============================================================
+# 工具函数: 检索模式路由
+# ============================================================
+# 含数字的"编号"：ERR-1042、0x80070005、AB12-345、v2.3.1、E1234 ...
+_IDENTIFIER = re.compile(r"^(?=.*\d)[A-Za-z0-9][A-Za-z0-9_.:/#-]{2,}$")
+
+# 从任意文本里抽出编号 / 数值 (中日韩文本里夹着的 "X100的最大电压" 也能抽出 x100)
+_IDENTIFIER_TOKEN = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.:/#-]*")
+
+
+def identifier_tokens(text: str) -> frozenset:
+    """
+    [工具] 文本里所有含数字的词 (型号、年份、编号、数值)，小写、去掉末尾标点。
+    语义相似的两个问题，这个集合不同就说明问的是不同的对象 ("X100 max voltage" vs "X200 max voltage")。
+    """
+    return frozenset(
+        token.rstrip("_.:/#-").lower() for token in _IDENTIFIER_TOKEN.findall(text)
+        if any(c.isdigit() for c in token)
+    )
+
+
+RETRIEVAL_MODES = ("dense", "sparse", "hybrid")
+FUSION_METHODS = ("rrf", "weighted")
+
+
+def route_retrieval_mode(query: str) -> str:
+    """
+    [路由] 启发式选择检索模式：
+    很短、且包含编号类词的查询 (例如 "E1234 错误")，BM25 关键词匹配就足够了，
+    走 sparse 快速通道，省掉一次 transformer 编码；其余查询走默认模式。
+    """
+    words = query.split()
+    if 0 < len(words) <= config.SPARSE_ROUTE_MAX_WORDS and any(_IDENTIFIER.match(w.strip("\"'()[],;?!")) for w in words):
+        return "sparse"
+    return config.DEFAULT_RETRIEVAL_MODE
+
+
+# ============================================================
+# 类定义: HybridSearcher (按查询选择检索模式)
+# ============================================================
+class HybridSearcher:
+    """
+    [类功能] 一个集合上的检索器，每次查询可以单独选择：
+    - mode:   "dense" (只算语义向量) / "sparse" (只算 BM25) / "hybrid" (两者融合) / "auto" (由路由器决定)
+    - fusion: "rrf" (Qdrant 服务端倒数排名融合) / "weighted" (客户端按权重融合归一化后的分数)
+
+    接口与 QdrantVectorStore.similarity_search 兼容 (多了 mode / fusion 两个可选参数)。
+    """
+
+    def __init__(self, client: QdrantClient, collection_name: str, dense_embeddings, sparse_embeddings,
+                 fusion=config.HYBRID_FUSION, dense_weight=config.HYBRID_DENSE_WEIGHT, latency_window=1000,
+                 dense_search_params=None):
+        self.__client = client
+        self.__collection_name = collection_name
+        self.__dense_embeddings = dense_embeddings
+        self.__sparse_embeddings = sparse_embeddings
+        self.__fusion = fusion
+        self.__dense_weight = dense_weight
+        # 稠密查询的 SearchParams (量化重打分、hnsw_ef)，None 表示 Qdrant 默认
+        self.__dense_params = dense_search_params
+
+        self.__lock = threading.Lock()
+        self.__latency_window = latency_window
+        self.__latencies: Dict[str, deque] = {}
+        self.__counts: Dict[str, int] = {}
+
+    # ------------------------------------------------------------
+    # 公开方法：检索
+    # ------------------------------------------------------------
+    def similarity_search(self, query: str, k: int = 4, score_threshold: Optional[float] = None,
+                          mode: str = "auto", fusion: Optional[str] = None) -> List[Document]:
+        routed = mode == "auto"
+        if routed:
+            mode = route_retrieval_mode(query)
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode: {mode}")
+        fusion = fusion or self.__fusion
+        if fusion not in FUSION_METHODS:
+            raise ValueError(f"Unknown fusion method: {fusion}")
+
+        results = self.__timed(mode if mode != "hybrid" else f"hybrid:{fusion}",
+                               self.__search, query, k, score_threshold, mode, fusion)
+
+        # 路由器选了 sparse 却一条都没找到 (比如编号拼错了)：退回默认模式再查一次
+        if routed and mode == "sparse" and not results and config.DEFAULT_RETRIEVAL_MODE != "sparse":
+            mode = config.DEFAULT_RETRIEVAL_MODE
+            results = self.__timed(mode if mode != "hybrid" else f"hybrid:{fusion}",
+                                   self.__search, query, k, score_threshold, mode, fusion)
+        return results
+
+    # ------------------------------------------------------------
+    # 指标
+    # ------------------------------------------------------------
+    def latency_stats(self) -> Dict[str, Dict]:
+        """每种模式的查询次数与耗时 (毫秒，p50 / p95 基于最近的 latency_window 次)。"""
+        with self.__lock:
+            stats = {}
+            for key, window in self.__latencies.items():
+                ordered = sorted(window)
+                stats[key] = {
+                    "count": self.__counts[key],
+                    "mean_ms": 1000 * sum(ordered) / len(ordered),
+                    "p50_ms": 1000 * ordered[len(ordered) // 2],
+                    "p95_ms": 1000 * ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+                }
+            return stats
+
+    # ------------------------------------------------------------
+    # 内部方法：各模式的查询
+    # ------------------------------------------------------------
+    def __search(self, query, k, score_threshold, mode, fusion):
+        # BM25 分数没有上界，固定的相似度阈值对它没有意义
+        if mode == "sparse":
+            return self.__to_documents(self.__query(self.__sparse_query(query), k, using=config.SPARSE_VECTOR_NAME))
+        if mode == "dense":
+            return self.__to_documents(self.__query(self.__dense_embeddings.embed_query(query), k,
+                                                    score_threshold=score_threshold, params=self.__dense_params))
+        if fusion == "rrf":
+            points = self.__client.query_points(
+                collection_name=self.__collection_name,
+                prefetch=[
+                    qmodels.Prefetch(query=self.__dense_embeddings.embed_query(query), limit=k, params=self.__dense_params),
+                    qmodels.Prefetch(query=self.__sparse_query(query), using=config.SPARSE_VECTOR_NAME, limit=k),
+                ],
+                query=qmodels.FusionQuery(fusion=qmodels.Fusion.RRF),
+                limit=k,
+                score_threshold=score_threshold,
+                with_payload=True
+            ).points
+            return self.__to_documents(points)
+        return self.__weighted(query, k, score_threshold)
+
+    def __weighted(self, query, k, score_threshold):
+        """
+        加权融合：稠密 (余弦，本身在 0~1 附近) 与稀疏 (除以本次最高分归一化到 0~1) 各取 2k 个候选，
+        按 dense_weight : (1 - dense_weight) 加权求和。只出现在一路结果里的点，另一路按 0 分计。
+        """
+        dense = self.__query(self.__dense_embeddings.embed_query(query), 2 * k, params=self.__dense_params)
+        sparse = self.__query(self.__sparse_query(query), 2 * k, using=config.SPARSE_VECTOR_NAME)
+        top_sparse = max((p.score for p in sparse), default=0.0) or 1.0
+
+        fused, points = {}, {}
+        for p in dense:
+            fused[p.id] = self.__dense_weight * p.score
+            points[p.id] = p
+        for p in sparse:
+            fused[p.id] = fused.get(p.id, 0.0) + (1 - self.__dense_weight) * p.score / top_sparse
+            points.setdefault(p.id, p)
+
+        ranked = sorted(fused, key=fused.get, reverse=True)
+        if score_threshold is not None:
+            ranked = [pid for pid in ranked if fused[pid] >= score_threshold]
+        return self.__to_documents([points[pid] for pid in ranked[:k]])
+
+    def __query(self, vector, limit, using=None, score_threshold=None, params=None):
+        return self.__client.query_points(
+            collection_name=self.__collection_name,
+            query=vector,
+            using=using,
+            limit=limit,
+            score_threshold=score_threshold,
+            search_params=params,
+            with_payload=True
+        ).points
+
+    def __sparse_query(self, query):
+        sparse = self.__sparse_embeddings.embed_query(query)
+        return qmodels.SparseVector(indices=sparse.indices, values=sparse.values)
+
+    @staticmethod
+    def __to_documents(points) -> List[Document]:
+        # payload 结构与 QdrantVectorStore 一致：{"page_content": ..., "metadata": {...}}
+        return [
+            Document(page_content=(p.payload or {}).get("page_content", ""),
+                     metadata=(p.payload or {}).get("metadata", {}))
+            for p in points
+        ]
+
+    def __timed(self, key, func, *args):
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.__lock:
+                self.__latencies.setdefault(key, deque(maxlen=self.__latency_window)).append(elapsed)
+                self.__counts[key] = self.__counts.get(key, 0) + 1
@@ -0,0 +1,129 @@
+# project/db/ingestion_manifest.py
+
+# ============================================================
+# 导入部分
+# ============================================================
+
+# [Python标准库] hashlib / json / threading
+# 用法：
+# - hashlib: 计算源文件和父文档内容的 SHA-256 指纹。
+# - json: 清单本身是一个小 JSON 文件。
+# - threading: 上传回调可能并发，读写清单时加锁。
+import hashlib
+import json
+import threading
+
+# [本项目] config
+# 用法：读取清单文件路径 INGESTION_MANIFEST_PATH、批量落盘的间隔 INGESTION_MANIFEST_FLUSH_EVERY。
+import config
+
+# [Python标准库] pathlib.Path / typing
+from pathlib import Path
+from typing import Dict, Optional
+
+
+# ============================================================
+# 工具函数: 内容指纹
+# ============================================================
+def hash_file(path) -> str:
+    """按 1MB 分块计算文件的 SHA-256，避免把大 PDF 整个读进内存。"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def hash_parent(content: str, metadata: Dict) -> str:
+    """父文档指纹 = 正文 + 元数据 (排序后的 JSON)，任何一个变化都视为修改。"""
+    digest = hashlib.sha256(content.encode("utf-8"))
+    digest.update(json.dumps(metadata, ensure_ascii=False, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+# ============================================================
+# 类定义: IngestionManifest (入库清单)
+# ============================================================
+class IngestionManifest:
+    """
+    [类功能] 记录每个源文档"上次入库时"的内容指纹，用于增量入库。
+
+    结构 (JSON)：
+    {
+        "report": {
+            "source_hash": "<源文件 SHA-256>",
+            "parents": {"report_parent_0": "<父文档 SHA-256>", ...}
+        },
+        ...
+    }
+    键是文档名 (不含后缀)，与 markdown_docs/{name}.md 一一对应。
+
+    每次落盘都要重写整个文件 (包括所有文档的父文档指纹)，整库入库时逐个文档落盘是 O(N²) 的 I/O，
+    所以 record 只标记有改动，每 flush_every 个文档落盘一次，入库结束时由调用方 flush()。
+    没来得及落盘的文档下次会被当成"有变化"重新入库 (未变化的子块复用旧向量)，不会丢数据。
+    """
+
+    def __init__(self, manifest_path=config.INGESTION_MANIFEST_PATH,
+                 flush_every=config.INGESTION_MANIFEST_FLUSH_EVERY):
+        self.__path = Path(manifest_path)
+        self.__flush_every = max(1, flush_every)
+        self.__unsaved = 0
+        self.__lock = threading.Lock()
+        self.__entries: Dict[str, Dict] = {}
+        # version() 的缓存，清单变化时置空
+        self.__version: Optional[str] = None
+        if self.__path.exists():
+            self.__entries = json.loads(self.__path.read_text(encoding="utf-8"))
+
+    # ------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------
+    def source_hash(self, doc_name: str) -> Optional[str]:
+        entry = self.__entries.get(doc_name)
+        return entry["source_hash"] if entry else None
+
+    def parent_hashes(self, doc_name: str) -> Dict[str, str]:
+        entry = self.__entries.get(doc_name)
+        return dict(entry["parents"]) if entry else {}
+
+    def version(self) -> str:
+        """
+        语料版本 = 所有文档源文件指纹的摘要。任何文档入库、更新或清空都会改变它，
+        语义答案缓存用它判断旧答案是否还有效。
+        """
+        with self.__lock:
+            if self.__version is None:
+                sources = sorted((name, entry["source_hash"]) for name, entry in self.__entries.items())
+                self.__version = hashlib.sha256(json.dumps(sources).encode("utf-8")).hexdigest()[:16]
+            return self.__version
+
+    # ------------------------------------------------------------
+    # 更新
+    # ------------------------------------------------------------
+    def record(self, doc_name: str, source_hash: str, parent_hashes: Dict[str, str]) -> None:
+        """登记一个文档的最新指纹；攒够 flush_every 个文档才落盘一次。"""
+        with self.__lock:
+            self.__entries[doc_name] = {"source_hash": source_hash, "parents": parent_hashes}
+            self.__version = None
+            self.__unsaved += 1
+            if self.__unsaved >= self.__flush_every:
+                self.__save()
+
+    def flush(self) -> None:
+        """把还没落盘的改动写入文件 (一批入库结束时调用)。"""
+        with self.__lock:
+            if self.__unsaved:
+                self.__save()
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__entries = {}
+            self.__version = None
+            self.__save()
+
+    def __save(self) -> None:
+        # 先写临时文件再替换，进程中途退出也不会留下损坏的清单
+        tmp_path = self.__path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self.__entries, ensure_ascii=False), encoding="utf-8")
+        tmp_path.replace(self.__path)
+        self.__unsaved = 0
@@ -0,0 +1,142 @@
+# project/db/lazy_embeddings.py
+
+# ============================================================
+# 导入部分
+# ============================================================
+
+# [Python标准库] json / os / threading / time
+# 用法：
+# - json / os: 读取 sentence-transformers 模型仓库 (或本地模型目录) 里的小配置文件 (modules.json 等)，不加载模型就能拿到维度。
+# - threading: 后台预热线程；加载过程加锁，保证模型只加载一次。
+# - time: 记录模型加载耗时。
+import json
+import os
+import threading
+import time
+
+# [Python标准库] typing
+from typing import Callable, Optional
+
+
+# ============================================================
+# 类定义: LazyEmbeddings (懒加载 + 后台预热的嵌入模型)
+# ============================================================
+class LazyEmbeddings:
+    """
+    [类功能] 包装一个"创建嵌入模型的函数"，直到第一次使用 (或调用 warm_up) 时才真正加载模型。
+
+    对外提供和 LangChain 嵌入模型相同的 embed_query / embed_documents，
+    可以直接放进 CachedDenseEmbeddings / CachedSparseEmbeddings 里。
+
+    - warm_up(): 在后台线程里加载，应用可以先启动、先响应健康检查。
+    - ready: threading.Event，模型加载完成后被置位 (就绪信号)。
+    - 后台加载失败时只记录错误；下一次真正使用时会在前台重试并抛出异常。
+    """
+
+    def __init__(self, name: str, factory: Callable[[], object]):
+        self.name = name
+        self.__factory = factory
+        self.__model = None
+        self.__lock = threading.Lock()
+        self.ready = threading.Event()
+        self.load_seconds: Optional[float] = None
+        self.error: Optional[str] = None
+
+    @property
+    def model(self):
+        if self.__model is None:
+            self.load()
+        return self.__model
+
+    @property
+    def loaded(self) -> bool:
+        return self.__model is not None
+
+    def load(self):
+        with self.__lock:
+            if self.__model is None:
+                start = time.monotonic()
+                self.__model = self.__factory()
+                self.load_seconds = time.monotonic() - start
+                self.error = None
+                self.ready.set()
+                print(f"✓ {self.name} model loaded in {self.load_seconds:.1f}s")
+        return self.__model
+
+    def warm_up(self) -> threading.Thread:
+        """在后台线程里加载模型，立即返回线程对象。"""
+        thread = threading.Thread(target=self.__background_load, name=f"warmup-{self.name}", daemon=True)
+        thread.start()
+        return thread
+
+    def __background_load(self):
+        try:
+            self.load()
+        except Exception as e:
+            self.error = str(e)
+            print(f"⚠️ Background loading of the {self.name} model failed: {e}")
+
+    # ------------------------------------------------------------
+    # 嵌入接口 (转发给真正的模型)
+    # ------------------------------------------------------------
+    def embed_query(self, text):
+        return self.model.embed_query(text)
+
+    def embed_documents(self, texts):
+        return self.model.embed_documents(texts)
+
+    def status(self):
+        return {"ready": self.ready.is_set(), "load_seconds": self.load_seconds, "error": self.error}
+
+
+# ============================================================
+# 工具函数: 从模型元数据读取稠密向量维度
+# ============================================================
+def sentence_transformer_dimension(model_name: str) -> Optional[int]:
+    """
+    [函数功能] 只下载 (或从本地缓存读取) sentence-transformers 仓库里几 KB 的配置文件，推算输出维度：
+    modules.json 列出各层 -> 最后一个 Dense 层的 out_features，否则 Pooling 层的
+    word_embedding_dimension × 启用的池化方式数量。
+    读不到 (离线、不是 sentence-transformers 格式等) 时返回 None，由调用方回退到加载模型。
+    """
+    try:
+        dimension = None
+        for module in _read_model_json(model_name, "modules.json"):
+            module_type = module.get("type", "")
+            prefix = f"{module['path']}/" if module.get("path") else ""
+            if module_type.endswith("Pooling"):
+                pooling = _read_model_json(model_name, f"{prefix}config.json")
+                modes = sum(1 for key, value in pooling.items() if key.startswith("pooling_mode_") and value is True)
+                dimension = pooling["word_embedding_dimension"] * max(1, modes)
+            elif module_type.endswith("Dense"):
+                dimension = _read_model_json(model_name, f"{prefix}config.json")["out_features"]
+        return dimension
+    except Exception as e:
+        print(f"Could not read embedding dimension from model metadata ({e}); will load the model instead")
+        return None
+
+
+def sentence_transformer_max_seq_length(model_name: str) -> Optional[int]:
+    """
+    [函数功能] 读取 sentence_bert_config.json 里的 max_seq_length：编码时超过这个 token 数的文本会被截断
+    (all-mpnet-base-v2 是 384，比分词器自己的 model_max_length 512 小)。读不到时返回 None。
+    """
+    try:
+        return _read_model_json(model_name, "sentence_bert_config.json").get("max_seq_length")
+    except Exception as e:
+        print(f"Could not read max_seq_length from model metadata ({e})")
+        return None
+
+
+def _read_model_json(model_name: str, path: str):
+    """model_name 是本地目录时直接读文件，否则从 Hub (或本地缓存) 下载。"""
+    if os.path.isdir(model_name):
+        full_path = os.path.join(model_name, path)
+    else:
+        # [第三方库] huggingface_hub.hf_hub_download
+        # 来源：huggingface-hub (sentence-transformers 的依赖)
+        # 用法：下载单个文件，会使用 HF_ENDPOINT 镜像和本地缓存。
+        from huggingface_hub import hf_hub_download
+        full_path = hf_hub_download(model_name, path)
+    with open(full_path, encoding="utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,121 @@
+# project/db/parent_cache.py
+
+# ============================================================
+# 导入部分
+# ============================================================
+
+# [Python标准库] threading
+# 用法：并行的 process_question 子图会同时读缓存，需要加锁。
+import threading
+
+# [Python标准库] collections.OrderedDict
+# 用法：天然的 LRU 结构，move_to_end 标记最近使用，popitem(last=False) 淘汰最久未用。
+from collections import OrderedDict
+
+# [Python标准库] typing
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+
+# ============================================================
+# 类定义: ParentChunkCache (父文档 LRU 缓存)
+# ============================================================
+class ParentChunkCache:
+    """
+    [类功能] 放在 ParentStoreManager 前面的有界 LRU 缓存。
+
+    - 同时按条目数和字节数限界，任何一个超限都会从最久未用的一端开始淘汰。
+    - 记录命中 / 未命中 / 淘汰次数，以及命中时"省下"的字节数，方便压测时调参。
+    - 每次 invalidate / clear 都让代数 (generation) 加一。调用方在未命中时先记下代数，读完存储再 put 时带上它；
+      期间如果有写入让缓存失效过，这次 put 就跳过，不会把按旧位置读到的旧内容写回缓存。
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.__max_entries = max_entries
+        self.__max_bytes = max_bytes
+        self.__lock = threading.Lock()
+        # key -> (value, 字节数)
+        self.__items: "OrderedDict[str, Tuple[Any, int]]" = OrderedDict()
+        self.__current_bytes = 0
+        self.__generation = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes_served = 0
+
+    # ------------------------------------------------------------
+    # 读取
+    # ------------------------------------------------------------
+    def get(self, key: str) -> Optional[Any]:
+        with self.__lock:
+            item = self.__items.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self.__items.move_to_end(key)
+            self.hits += 1
+            self.bytes_served += item[1]
+            return item[0]
+
+    # ------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------
+    @property
+    def generation(self) -> int:
+        return self.__generation
+
+    def put(self, key: str, value: Any, size: int, generation: Optional[int] = None) -> None:
+        # 单条就超过字节上限的不缓存，否则会把整个缓存挤空
+        if self.__max_entries <= 0 or size > self.__max_bytes:
+            return
+
+        with self.__lock:
+            if generation is not None and generation != self.__generation:
+                # 读取期间有写入让缓存失效过，value 可能是旧内容
+                return
+            old = self.__items.pop(key, None)
+            if old is not None:
+                self.__current_bytes -= old[1]
+
+            self.__items[key] = (value, size)
+            self.__current_bytes += size
+
+            while len(self.__items) > self.__max_entries or self.__current_bytes > self.__max_bytes:
+                _, (_, evicted_size) = self.__items.popitem(last=False)
+                self.__current_bytes -= evicted_size
+                self.evictions += 1
+
+    # ------------------------------------------------------------
+    # 失效
+    # ------------------------------------------------------------
+    def invalidate(self, keys: Iterable[str]) -> None:
+        with self.__lock:
+            self.__generation += 1
+            for key in keys:
+                old = self.__items.pop(key, None)
+                if old is not None:
+                    self.__current_bytes -= old[1]
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__generation += 1
+            self.__items.clear()
+            self.__current_bytes = 0
+
+    # ------------------------------------------------------------
+    # 指标
+    # ------------------------------------------------------------
+    def stats(self) -> Dict[str, Any]:
+        with self.__lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.__items),
+                "bytes": self.__current_bytes,
+                "max_entries": self.__max_entries,
+                "max_bytes": self.__max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "bytes_served": self.bytes_served,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -5,25 +5,55 @@
 # ============================================================
 
 # [Python标准库] json
-# 用法：用于读写 JSON 格式的文件。我们将父文档的内容以 JSON 格式存在硬盘上。
+# 用法：父文档仍以 JSON 序列化 (page_content + metadata)，只是不再一文件一文档，而是紧凑地追加进段文件。
 import json
 
+# [Python标准库] mmap
+# 用法：把段文件映射进内存，读取时直接按偏移切片，不再 open/read/close。
+import mmap
+
+# [Python标准库] os / struct / threading
+# 用法：
+# - os: fsync、文件大小检查、截掉写了一半的索引尾部、压缩后原子替换索引文件。
+# - struct: 编码定长的索引记录头。
+# - threading: 写入与重新映射时加锁 (Gradio 的回调和后台入库跑在不同线程里)。
+import os
+import struct
+import threading
+
 # [Python标准库] shutil
-# 用法：虽然这里导入了，但本代码中似乎暂时未用到。通常用于文件复制/移动操作。
+# 用法：clear_store 时整体删除存储目录。
 import shutil
 
 # [本项目] config
 # 来源：project/config.py.
-# 用法：读取配置中的 PARENT_STORE_PATH (父文档存储文件夹路径)。
+# 用法：读取配置中的 PARENT_STORE_PATH (父文档存储文件夹路径)、段文件大小上限和压缩阈值。
 import config
 
+# [本项目] db.parent_cache
+# 用法：热点父文档的有界 LRU 缓存，ReAct 循环和并行子图反复读取同一批父文档时直接命中内存。
+from db.parent_cache import ParentChunkCache
+
 # [Python标准库] pathlib.Path
 # 用法：现代化的文件路径操作库。
 from pathlib import Path
 
 # [Python标准库] typing
 # 用法：类型提示，告诉 IDE 参数是字典 (Dict) 还是列表 (List)。
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
+
+
+# ============================================================
+# 存储格式常量
+# ============================================================
+# 索引文件: 由一条条 "记录头 + parent_id(utf-8)" 顺序拼接而成，只追加、不修改。
+# 记录头 = (parent_id 字节长度 H, 段号 I, 段内偏移 Q, 数据长度 I)，共 18 字节。
+# 同一个 parent_id 出现多次时，以最后一条为准 (覆盖写)；段号为 _TOMBSTONE 的记录表示删除。
+# 被覆盖 / 删除的旧数据 ("死字节") 超过阈值后，compact() 把仍然有效的记录重写进新段，再原子替换索引。
+_INDEX_FILE = "index.bin"
+_INDEX_HEADER = struct.Struct("<HIQI")
+_TOMBSTONE = 0xFFFFFFFF
+_SEGMENT_PATTERN = "segment_{:05d}.dat"
 
 
 # ============================================================
@@ -31,76 +61,501 @@ from typing import Dict, List
 # ============================================================
 class ParentStoreManager:
     """
-    [类功能] 简单的键值对存储 (Key-Value Store)，基于本地文件系统。
+    [类功能] 键值对存储 (Key-Value Store)，基于本地的"段文件 + 偏移索引"。
     用于存储"父文档"(Parent Chunks) 的完整内容。
 
     结构：
     - 文件夹: project/parent_store/
-    - 文件名: {parent_id}.json
-    - 内容: 包含文本内容和元数据的 JSON 对象。
+    - segment_00000.dat ...: 父文档 JSON 依次追加在大文件里，超过上限后滚动到下一个段。
+    - index.bin: parent_id -> (段号, 偏移, 长度) 的紧凑索引，启动时一次性读入内存。
+
+    读取时通过 mmap 直接切片，一次查找 = 一次字典查询 + 一次内存拷贝，没有任何文件系统调用。
+    被替换掉的 mmap 不主动 close (别的线程可能正在切片)，丢掉引用后由引用计数回收。
+    旧版本留下的 {parent_id}.json 文件仍然可以被 load 读到 (兼容)。
     """
 
-    def __init__(self, store_path=config.PARENT_STORE_PATH):
+    def __init__(self, store_path=config.PARENT_STORE_PATH, segment_max_bytes=config.PARENT_SEGMENT_MAX_BYTES,
+                 cache_max_entries=config.PARENT_CACHE_MAX_ENTRIES, cache_max_bytes=config.PARENT_CACHE_MAX_BYTES,
+                 compact_dead_ratio=config.PARENT_COMPACT_DEAD_RATIO,
+                 compact_min_bytes=config.PARENT_COMPACT_MIN_BYTES):
         # [逻辑] 初始化存储目录
         # 如果目录不存在，自动创建 (parents=True 允许创建多级目录)
         self.__store_path = Path(store_path)
         self.__store_path.mkdir(parents=True, exist_ok=True)
+        self.__segment_max_bytes = segment_max_bytes
+        self.__compact_dead_ratio = compact_dead_ratio
+        self.__compact_min_bytes = compact_min_bytes
+
+        self.__lock = threading.RLock()
+        # 热点父文档缓存 (写入 / 清空时失效)
+        self.__cache = ParentChunkCache(cache_max_entries, cache_max_bytes)
+        # 索引文件的 inode：压缩会整体替换索引文件，inode 变了就要从头重新读
+        self.__index_ino = None
+        self.__reset_index()
+
+        self.__load_index()
+
+    # ------------------------------------------------------------
+    # 内部方法：路径
+    # ------------------------------------------------------------
+    def __segment_path(self, segment: int) -> Path:
+        return self.__store_path / _SEGMENT_PATTERN.format(segment)
+
+    def __index_path(self) -> Path:
+        return self.__store_path / _INDEX_FILE
+
+    # ------------------------------------------------------------
+    # 内部方法：内存里的索引状态
+    # ------------------------------------------------------------
+    def __reset_index(self) -> None:
+        # parent_id -> (段号, 偏移, 长度)
+        self.__index: Dict[str, Tuple[int, int, int]] = {}
+        # 段号 -> mmap 对象 (懒加载，段文件变长后重新映射)。
+        # 换成新字典而不 close 旧的映射：别的线程可能正拿着它切片，最后一个引用释放时自动关闭
+        self.__maps: Dict[int, mmap.mmap] = {}
+        # 已经读入内存的索引文件字节数 (别的实例追加后可以增量刷新)
+        self.__index_offset = 0
+        # 段文件里被索引引用过的数据总字节数 / 仍然有效的字节数，两者之差是压缩可以回收的死字节
+        self.__data_bytes = 0
+        self.__live_bytes = 0
+        # 当前可写的段号 (记在内存里，追加时只往后确认，不再每次从 0 开始探测)
+        self.__segment = 0
+
+    def __set_location(self, parent_id: str, location: Tuple[int, int, int]) -> None:
+        old = self.__index.get(parent_id)
+        self.__index[parent_id] = location
+        self.__live_bytes += location[2] - (old[2] if old else 0)
+
+    def __drop_location(self, parent_id: str) -> None:
+        old = self.__index.pop(parent_id, None)
+        if old:
+            self.__live_bytes -= old[2]
+
+    # ------------------------------------------------------------
+    # 内部方法：读入 (或增量刷新) 偏移索引
+    # ------------------------------------------------------------
+    def __load_index(self) -> None:
+        with self.__lock:
+            index_path = self.__index_path()
+            if not index_path.exists():
+                return
+
+            with open(index_path, "rb") as f:
+                ino = os.fstat(f.fileno()).st_ino
+                if ino != self.__index_ino:
+                    # 第一次读入，或者索引文件已经被 (别的实例) 压缩替换：从头读
+                    if self.__index_ino is not None:
+                        self.__cache.clear()
+                    self.__reset_index()
+                    self.__index_ino = ino
+                # 只读上次之后追加的部分
+                f.seek(self.__index_offset)
+                data = f.read()
+
+            pos = 0
+            header_size = _INDEX_HEADER.size
+            segment_sizes: Dict[int, int] = {}
+            seen: List[str] = []
+
+            while pos + header_size <= len(data):
+                id_len, segment, offset, length = _INDEX_HEADER.unpack_from(data, pos)
+                if pos + header_size + id_len > len(data):
+                    # 写了一半的尾部记录 (进程在写索引时崩溃，或者别的实例正在写)，先不读
+                    break
+                parent_id = data[pos + header_size:pos + header_size + id_len].decode("utf-8")
+                pos += header_size + id_len
+                seen.append(parent_id)
+
+                if segment == _TOMBSTONE:
+                    self.__drop_location(parent_id)
+                    continue
+
+                # [逻辑] 崩溃保护：只接受数据已经完整落盘的记录
+                if segment not in segment_sizes:
+                    seg_path = self.__segment_path(segment)
+                    segment_sizes[segment] = seg_path.stat().st_size if seg_path.exists() else 0
+                if offset + length <= segment_sizes[segment]:
+                    self.__set_location(parent_id, (segment, offset, length))
+                    self.__data_bytes += length
+                    self.__segment = max(self.__segment, segment)
+
+            self.__index_offset += pos
+            if seen:
+                # 别的实例覆盖 / 删除过的 ID，本实例缓存里的内容已经过时
+                self.__cache.invalidate(seen)
+
+    def __refresh_index(self) -> None:
+        """别的实例追加过 (或压缩过) 索引时，增量刷新一次。"""
+        with self.__lock:
+            index_path = self.__index_path()
+            if not index_path.exists():
+                return
+            st = index_path.stat()
+            if st.st_ino != self.__index_ino or st.st_size > self.__index_offset:
+                self.__load_index()
+
+    def __open_index_for_append(self):
+        # 调用方持有 self.__lock。先读入别的实例追加的记录；剩下的如果是写了一半的尾部 (崩溃残留)，
+        # 截掉它，否则新记录会接在半条记录后面，整个索引从这里开始都解析错位
+        self.__refresh_index()
+        index_path = self.__index_path()
+        if index_path.exists() and index_path.stat().st_size > self.__index_offset:
+            os.truncate(index_path, self.__index_offset)
+        f = open(index_path, "ab")
+        self.__index_ino = os.fstat(f.fileno()).st_ino
+        return f
+
+    # ------------------------------------------------------------
+    # 内部方法：当前可写的段
+    # ------------------------------------------------------------
+    def __active_segment(self) -> Tuple[int, int]:
+        """返回 (段号, 当前大小)；当前段已满时滚动到新段。"""
+        # 只需要确认后面没有别的实例新建的段
+        while self.__segment_path(self.__segment + 1).exists():
+            self.__segment += 1
+
+        seg_path = self.__segment_path(self.__segment)
+        size = seg_path.stat().st_size if seg_path.exists() else 0
+        if size >= self.__segment_max_bytes:
+            self.__segment, size = self.__segment + 1, 0
+        return self.__segment, size
+
+    # ------------------------------------------------------------
+    # 内部方法：按 mmap 读取一条记录
+    # ------------------------------------------------------------
+    def __read(self, segment: int, offset: int, length: int) -> bytes:
+        maps = self.__maps
+        mm = maps.get(segment)
+        if mm is None or offset + length > len(mm):
+            with self.__lock:
+                maps = self.__maps
+                mm = maps.get(segment)
+                if mm is None or offset + length > len(mm):
+                    # 段文件在映射之后又被追加过，重新映射到最新大小 (旧映射不 close，见 __reset_index)
+                    with open(self.__segment_path(segment), "rb") as f:
+                        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    maps[segment] = mm
+        return mm[offset:offset + length]
+
+    def __read_parent(self, parent_id: str, location: Tuple[int, int, int]) -> Optional[Dict]:
+        try:
+            return json.loads(self.__read(*location))
+        except (OSError, ValueError):
+            # 查到位置之后、读取之前，段文件被压缩替换掉了：按最新的索引再读一次
+            self.__refresh_index()
+            location = self.__index.get(parent_id)
+            return json.loads(self.__read(*location)) if location else None
+
+    # ------------------------------------------------------------
+    # 内部方法：把记录顺序写进段文件
+    # ------------------------------------------------------------
+    def __write_segments(self, records, segment: int, size: int):
+        """
+        从 (segment, size) 开始写入 [(parent_id, payload)]，写满就滚动到下一个段，最后 fsync。
+        返回 ({parent_id: 位置}, 索引记录字节, 最后写入的段号)。
+        """
+        locations: Dict[str, Tuple[int, int, int]] = {}
+        index_buf = bytearray()
+        seg_file = open(self.__segment_path(segment), "ab")
+        try:
+            for parent_id, payload in records:
+                if size and size + len(payload) > self.__segment_max_bytes:
+                    seg_file.flush()
+                    os.fsync(seg_file.fileno())
+                    seg_file.close()
+                    segment, size = segment + 1, 0
+                    seg_file = open(self.__segment_path(segment), "ab")
+
+                seg_file.write(payload)
+                locations[parent_id] = (segment, size, len(payload))
+
+                id_bytes = parent_id.encode("utf-8")
+                index_buf += _INDEX_HEADER.pack(len(id_bytes), segment, size, len(payload))
+                index_buf += id_bytes
+                size += len(payload)
+
+            seg_file.flush()
+            os.fsync(seg_file.fileno())
+        finally:
+            seg_file.close()
+        return locations, index_buf, segment
+
+    # ------------------------------------------------------------
+    # 内部方法：批量追加 (一次写段文件 + 一次写索引)
+    # ------------------------------------------------------------
+    def __append(self, records: List[Tuple[str, bytes]]) -> None:
+        if not records:
+            return
+
+        with self.__lock:
+            # 先把数据写进段文件，再写索引；这样索引里出现的记录，数据一定已经在盘上
+            segment, size = self.__active_segment()
+            pending, index_buf, self.__segment = self.__write_segments(records, segment, size)
+
+            with self.__open_index_for_append() as f:
+                f.write(index_buf)
+
+            for parent_id, location in pending.items():
+                self.__set_location(parent_id, location)
+                self.__data_bytes += location[2]
+            self.__index_offset += len(index_buf)
+            self.__cache.invalidate(pending)
+            self.__maybe_compact()
+
+    @staticmethod
+    def __encode(content: str, metadata: Dict) -> bytes:
+        # ensure_ascii=False: 中文按 UTF-8 原样存储，比 \uXXXX 更省空间
+        # separators: 去掉多余空格，不再使用 indent=2 的"好看"格式
+        return json.dumps(
+            {"page_content": content, "metadata": metadata}, ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8")
 
     # ------------------------------------------------------------
     # 保存单个父文档
     # ------------------------------------------------------------
     def save(self, parent_id: str, content: str, metadata: Dict) -> None:
         """
-        将一个父文档保存为 JSON 文件。
+        将一个父文档追加写入段文件，并登记到索引。
         """
-        # 构造文件路径: store_path/parent_id.json
-        file_path = self.__store_path / f"{parent_id}.json"
-
-        # [Python逻辑] 写入文件
-        # ensure_ascii=False: 保证中文能正常显示，而不是变成 \uXXXX 乱码
-        # indent=2: 格式化 JSON，让人类稍微容易读一点
-        file_path.write_text(
-            json.dumps({"page_content": content, "metadata": metadata}, ensure_ascii=False, indent=2),
-            encoding="utf-8"
-        )
+        self.__append([(parent_id, self.__encode(content, metadata))])
 
     # ------------------------------------------------------------
     # 批量保存
     # ------------------------------------------------------------
     def save_many(self, parents: List) -> None:
         """
-        [辅助方法] 循环调用 save 保存多个文档。
+        [批量写入] 整批父文档只打开一次段文件、写一次索引。
         Args:
             parents: 一个包含 (parent_id, document_object) 元组的列表
         """
-        for parent_id, doc in parents:
-            self.save(parent_id, doc.page_content, doc.metadata)
+        self.__append([
+            (parent_id, self.__encode(doc.page_content, doc.metadata))
+            for parent_id, doc in parents
+        ])
+
+    # ------------------------------------------------------------
+    # 批量删除
+    # ------------------------------------------------------------
+    def delete_many(self, parent_ids: List[str]) -> None:
+        """
+        [删除] 往索引里追加删除标记 (墓碑)；段文件中的旧数据不再被引用，由压缩回收。
+        用于增量入库时清理已经不存在的父文档。
+        """
+        parent_ids = list(dict.fromkeys(parent_ids))
+        if not parent_ids:
+            return
+
+        with self.__lock:
+            index_buf = bytearray()
+            for parent_id in parent_ids:
+                id_bytes = parent_id.encode("utf-8")
+                index_buf += _INDEX_HEADER.pack(len(id_bytes), _TOMBSTONE, 0, 0)
+                index_buf += id_bytes
+                # 旧格式的单文件也一并删除
+                (self.__store_path / f"{parent_id}.json").unlink(missing_ok=True)
+
+            with self.__open_index_for_append() as f:
+                f.write(index_buf)
+
+            for parent_id in parent_ids:
+                self.__drop_location(parent_id)
+            self.__index_offset += len(index_buf)
+            self.__cache.invalidate(parent_ids)
+            self.__maybe_compact()
+
+    # ------------------------------------------------------------
+    # 压缩：回收被覆盖 / 删除的旧数据
+    # ------------------------------------------------------------
+    def __maybe_compact(self) -> None:
+        dead = self.__data_bytes - self.__live_bytes
+        if dead >= self.__compact_min_bytes and dead >= self.__compact_dead_ratio * self.__data_bytes:
+            self.compact()
+
+    def compact(self) -> None:
+        """
+        [压缩] 把仍然有效的记录按 (段号, 偏移) 顺序重写进新的段文件，写一份只含这些记录的新索引
+        (墓碑也一并丢掉)，用 os.replace 原子替换 index.bin，最后删除旧段。
+        替换之前崩溃，旧索引和旧段都完好；替换之后崩溃，只会留下没人引用的旧段，下次压缩时删掉。
+        写入量超过阈值时由 save_many / delete_many 自动触发 (见 config.PARENT_COMPACT_*)。
+        """
+        with self.__lock:
+            self.__refresh_index()
+            old_segments = sorted(self.__store_path.glob("segment_*.dat"))
+            # 新段从现有最大段号之后开始编号，和旧段不冲突，读线程拿着的旧位置在删除之前都还能读
+            start = max((int(p.stem.split("_")[1]) for p in old_segments), default=-1) + 1
+            reclaimed = self.__data_bytes - self.__live_bytes
+
+            live = sorted((location, parent_id) for parent_id, location in self.__index.items())
+            locations, index_buf, segment = self.__write_segments(
+                ((parent_id, self.__read(*location)) for location, parent_id in live), start, 0
+            )
+
+            tmp_path = self.__index_path().with_suffix(".tmp")
+            with open(tmp_path, "wb") as f:
+                f.write(index_buf)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.__index_path())
+
+            # 整体换成新索引：读线程拿到的要么是旧位置 (旧段删除前仍可读，删除后按新索引重读)，要么是新位置
+            self.__reset_index()
+            self.__index = locations
+            self.__index_offset = len(index_buf)
+            self.__index_ino = self.__index_path().stat().st_ino
+            self.__data_bytes = self.__live_bytes = sum(location[2] for location in locations.values())
+            self.__segment = segment
+
+            for seg_path in old_segments:
+                try:
+                    seg_path.unlink()
+                except OSError:
+                    # (Windows) 还有读线程映射着这个文件，留给下次压缩
+                    pass
+            print(f"🗜️ Compacted parent store: {len(locations)} parents kept, {reclaimed} bytes reclaimed")
 
     # ------------------------------------------------------------
     # 读取单个父文档
     # ------------------------------------------------------------
-    def load(self, parent_id: str) -> Dict:
+    def load(self, parent_id: str) -> Optional[Dict]:
         """
-        根据 ID 读取 JSON 文件内容。
+        根据 ID 读取父文档内容。
         """
-        # [逻辑] 兼容性处理
-        # 有时候 ID 可能会带有文件后缀，或者大小写不一致，这里尝试做一点容错
-        # 优先尝试直接拼接 .json
-        file_path = self.__store_path / f"{parent_id}.json"
+        cached = self.__cache.get(parent_id)
+        if cached is not None:
+            return cached
 
-        # 如果找不到，且 ID 本身已经有后缀了 (虽然在我们的逻辑里 ID 不带后缀)，可以加额外的判断逻辑
-        # 这里简化处理：直接读取
+        # 先记下缓存代数，再查位置：读取期间如果有写入覆盖了这个 ID，put 会被跳过
+        generation = self.__cache.generation
+        location = self.__index.get(parent_id)
 
-        if not file_path.exists():
+        if location is None:
+            # [逻辑] 可能是其他实例刚追加的记录，增量刷新一次索引再查
+            self.__refresh_index()
+            location = self.__index.get(parent_id)
+
+        if location is None:
+            # [兼容] 旧版本一文件一文档的格式
+            legacy_path = self.__store_path / f"{parent_id}.json"
+            if legacy_path.exists():
+                raw = legacy_path.read_bytes()
+                parent = json.loads(raw)
+                self.__cache.put(parent_id, parent, len(raw), generation)
+                return parent
             return None
 
-        return json.loads(file_path.read_text(encoding="utf-8"))
+        parent = self.__read_parent(parent_id, location)
+        if parent is not None:
+            self.__cache.put(parent_id, parent, location[2], generation)
+        return parent
+
+    # ------------------------------------------------------------
+    # 批量读取
+    # ------------------------------------------------------------
+    def load_many(self, parent_ids: List[str]) -> Dict[str, Optional[Dict]]:
+        """
+        [批量读取] 一次取回多个父文档，返回 {parent_id: 内容或 None}。
+        先查缓存；未命中的按 (段号, 偏移) 排序后顺序读取，最多刷新一次索引。
+        """
+        unique_ids = list(dict.fromkeys(parent_ids))
+        results: Dict[str, Optional[Dict]] = {}
+        misses = []
+        generation = self.__cache.generation
+        for parent_id in unique_ids:
+            cached = self.__cache.get(parent_id)
+            if cached is not None:
+                results[parent_id] = cached
+            else:
+                misses.append(parent_id)
+
+        if any(parent_id not in self.__index for parent_id in misses):
+            self.__refresh_index()
+
+        index = self.__index
+        located = sorted((index[parent_id], parent_id) for parent_id in misses if parent_id in index)
+        for location, parent_id in located:
+            parent = self.__read_parent(parent_id, location)
+            if parent is not None:
+                self.__cache.put(parent_id, parent, location[2], generation)
+                results[parent_id] = parent
+
+        for parent_id in misses:
+            if parent_id not in results:
+                # 不在索引里的走单条读取 (含旧格式兼容)
+                results[parent_id] = self.load(parent_id)
+
+        # 按调用方给出的顺序返回
+        return {parent_id: results[parent_id] for parent_id in unique_ids}
 
     # ------------------------------------------------------------
     # 公开接口：获取内容
     # ------------------------------------------------------------
-    def load_content(self, parent_id: str) -> Dict:
+    def load_content(self, parent_id: str) -> Optional[Dict]:
         """
         load 方法的别名，方便外部调用。
         """
-        return self.load(parent_id)
\ No newline at end of file
+        return self.load(parent_id)
+
+    # ------------------------------------------------------------
+    # 迁移旧格式
+    # ------------------------------------------------------------
+    def migrate_legacy_files(self) -> int:
+        """
+        [一次性迁移] 把旧版本的 {parent_id}.json 文件打包进段文件，并删除原文件。
+        返回迁移的文档数量。
+        """
+        legacy_files = sorted(self.__store_path.glob("*.json"))
+        records = []
+        for file_path in legacy_files:
+            data = json.loads(file_path.read_text(encoding="utf-8"))
+            records.append((file_path.stem, self.__encode(data.get("page_content", ""), data.get("metadata", {}))))
+
+        self.__append(records)
+        for file_path in legacy_files:
+            file_path.unlink()
+        return len(records)
+
+    # ------------------------------------------------------------
+    # 清空存储
+    # ------------------------------------------------------------
+    def clear_store(self) -> None:
+        """
+        删除所有段文件和索引 (DocumentManager.clear_all 调用)。
+        """
+        with self.__lock:
+            self.__cache.clear()
+            self.__reset_index()
+            self.__index_ino = None
+            if self.__store_path.exists():
+                shutil.rmtree(self.__store_path)
+            self.__store_path.mkdir(parents=True, exist_ok=True)
+
+    # ------------------------------------------------------------
+    # 缓存与存储指标
+    # ------------------------------------------------------------
+    def cache_stats(self) -> Dict:
+        """
+        返回父文档缓存的命中 / 未命中 / 淘汰次数和命中字节数，用于调参。
+        """
+        return self.__cache.stats()
+
+    def storage_stats(self) -> Dict:
+        """
+        返回段文件里的数据字节数、仍然有效的字节数和可被压缩回收的死字节数。
+        """
+        with self.__lock:
+            return {
+                "parents": len(self.__index),
+                "data_bytes": self.__data_bytes,
+                "live_bytes": self.__live_bytes,
+                "dead_bytes": self.__data_bytes - self.__live_bytes,
+            }
+
+    def __len__(self) -> int:
+        return len(self.__index)
+
+    def __bool__(self) -> bool:
+        # 有 __len__ 时空存储默认为假值，容易被 `x or ParentStoreManager()` 之类的写法误判成"没有传入"
+        return True
+
+    def __contains__(self, parent_id: str) -> bool:
+        return parent_id in self.__index
@@ -0,0 +1,133 @@
+# project/db/qdrant_client_factory.py
+
+# ============================================================
+# 导入部分
+# ============================================================
+
+# [Python标准库] time / functools
+# 用法：重试之间按指数退避等待；wraps 保留被包装方法的名字和文档。
+import time
+from functools import wraps
+
+# [第三方库] httpx
+# 来源：qdrant-client 的 REST 传输层
+# 用法：httpx.Limits 控制 REST 连接池大小；TransportError 是可重试的网络错误。
+import httpx
+
+# [第三方库] grpc
+# 来源：grpcio (qdrant-client 的依赖)
+# 用法：识别可重试的 gRPC 状态码 (服务暂时不可用、超时、限流)。
+import grpc
+
+# [第三方库] qdrant_client
+from qdrant_client import QdrantClient
+from qdrant_client.http.exceptions import ResponseHandlingException, UnexpectedResponse
+
+# [本项目] config
+# 用法：读取连接模式、地址、gRPC、连接池、超时、重试配置。
+import config
+
+
+# ============================================================
+# 工厂函数: 按配置创建 Qdrant 客户端
+# ============================================================
+def create_qdrant_client():
+    """
+    [函数功能] 根据 config.QDRANT_MODE 返回客户端：
+    - "local":  嵌入式本地文件模式 (原来的行为)。会给数据目录加文件锁，同一时间只能有一个进程使用。
+    - "remote": 连接 Qdrant 服务，多个 Gradio / API 进程可以共用同一个索引。
+    """
+    if config.QDRANT_MODE == "local":
+        return QdrantClient(path=config.QDRANT_DB_PATH)
+    if config.QDRANT_MODE != "remote":
+        raise ValueError(f"Unsupported Qdrant mode: {config.QDRANT_MODE}")
+
+    client = RetryingQdrantClient(
+        url=config.QDRANT_URL,
+        api_key=config.QDRANT_API_KEY,
+        prefer_grpc=config.QDRANT_PREFER_GRPC,
+        grpc_port=config.QDRANT_GRPC_PORT,
+        timeout=config.QDRANT_TIMEOUT,
+        # REST 连接池：每个进程最多这么多并发连接 (gRPC 在一条 HTTP/2 连接上多路复用，不需要连接池)
+        limits=httpx.Limits(
+            max_connections=config.QDRANT_POOL_SIZE,
+            max_keepalive_connections=config.QDRANT_POOL_SIZE
+        ),
+        max_retries=config.QDRANT_MAX_RETRIES,
+        retry_backoff=config.QDRANT_RETRY_BACKOFF,
+    )
+
+    # 启动时就确认服务可达，而不是等到第一次检索才报错
+    try:
+        client.get_collections()
+    except Exception as e:
+        raise ConnectionError(f"❌ Cannot reach Qdrant at {config.QDRANT_URL}: {e}") from e
+    print(f"✓ Connected to Qdrant at {config.QDRANT_URL} ({'gRPC' if config.QDRANT_PREFER_GRPC else 'REST'})")
+    return client
+
+
+# ============================================================
+# 工具函数: 判断错误是否值得重试
+# ============================================================
+_RETRYABLE_GRPC_CODES = {
+    grpc.StatusCode.UNAVAILABLE,
+    grpc.StatusCode.DEADLINE_EXCEEDED,
+    grpc.StatusCode.RESOURCE_EXHAUSTED,
+}
+
+
+def is_transient_error(error: Exception) -> bool:
+    """网络抖动、服务重启、超时、限流 (429 / 5xx) 视为暂时性错误；参数错误等 4xx 不重试。"""
+    if isinstance(error, (httpx.TransportError, ResponseHandlingException)):
+        return True
+    if isinstance(error, UnexpectedResponse):
+        return error.status_code == 429 or error.status_code >= 500
+    if isinstance(error, grpc.RpcError):
+        return error.code() in _RETRYABLE_GRPC_CODES
+    return False
+
+
+# ============================================================
+# 类定义: RetryingQdrantClient (带重试的远程客户端)
+# ============================================================
+# 只重试幂等的操作：查询、读取、按 ID 写入 / 删除。
+# create_collection 不在其中 —— 第一次请求可能其实已经成功，重试会得到"集合已存在"。
+_RETRIED_METHODS = (
+    "query_points", "scroll", "retrieve", "count",
+    "upsert", "delete",
+    "get_collection", "get_collections", "collection_exists", "delete_collection",
+)
+
+
+def _with_retries(method):
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        attempt = 0
+        while True:
+            try:
+                return method(self, *args, **kwargs)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_transient_error(e):
+                    raise
+                delay = self.retry_backoff * (2 ** attempt)
+                attempt += 1
+                print(f"⚠️ Qdrant {method.__name__} failed ({e}); retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+    return wrapper
+
+
+class RetryingQdrantClient(QdrantClient):
+    """
+    [类功能] QdrantClient 的子类：幂等操作遇到暂时性错误时按指数退避重试。
+    仍然是 QdrantClient，LangChain 的 QdrantVectorStore 等组件可以直接使用。
+    """
+
+    def __init__(self, *args, max_retries=config.QDRANT_MAX_RETRIES, retry_backoff=config.QDRANT_RETRY_BACKOFF,
+                 **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+
+for _name in _RETRIED_METHODS:
+    setattr(RetryingQdrantClient, _name, _with_retries(getattr(QdrantClient, _name)))
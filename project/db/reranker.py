@@ -0,0 +1,114 @@
+# project/db/reranker.py
+
+# ============================================================
+# 导入部分
+# ============================================================
+
+# [Python标准库] hashlib / threading / time
+# 用法：
+# - hashlib: (查询, 子块正文) 组合成定长的缓存键。
+# - threading: 并行子图会同时调用重排序，模型懒加载时加锁。
+# - time: 控制每次重排序的耗时预算。
+import hashlib
+import threading
+import time
+
+# [Python标准库] typing
+from typing import List, Tuple
+
+# [第三方库] langchain_core.documents.Document
+# 用法：重排序的输入 / 输出都是检索返回的 Document。
+from langchain_core.documents import Document
+
+# [本项目] config
+# 用法：读取交叉编码器模型名、批大小、缓存大小、耗时预算。
+import config
+
+# [本项目] db.embedding_cache
+# 用法：复用查询向量缓存的 LRU 实现来缓存 (查询, 子块) 的打分；normalize_query 规范化查询。
+from db.embedding_cache import EmbeddingCache, normalize_query
+
+
+# ============================================================
+# 类定义: CrossEncoderReranker (交叉编码器重排序)
+# ============================================================
+class CrossEncoderReranker:
+    """
+    [类功能] 用一个小型 CPU 交叉编码器给 (查询, 子块) 打分并重新排序。
+
+    - 懒加载：第一次重排序时才加载模型，不拖慢启动。
+    - 批量：未缓存的组合按 batch_size 一批送进模型。
+    - 缓存：按 (规范化查询, 子块正文) 缓存分数，Agent 重试相同查询时不再重新打分。
+    - 耗时预算：超过 latency_budget 秒后停止打分，没来得及打分的候选保持原来的检索顺序排在后面。
+    """
+
+    def __init__(self, model_name=config.RERANK_MODEL, batch_size=config.RERANK_BATCH_SIZE,
+                 max_entries=config.RERANK_CACHE_MAX_ENTRIES, latency_budget=config.RERANK_LATENCY_BUDGET):
+        self.__model_name = model_name
+        self.__batch_size = batch_size
+        self.__latency_budget = latency_budget
+        self.__model = None
+        self.__model_lock = threading.Lock()
+        self.__cache = EmbeddingCache(f"rerank:{model_name}", max_entries)
+        self.budget_exceeded = 0
+
+    # ------------------------------------------------------------
+    # 公开方法：重排序
+    # ------------------------------------------------------------
+    def rerank(self, query: str, documents: List[Document], top_k: int) -> List[Tuple[Document, float]]:
+        """
+        返回按交叉编码器分数从高到低排列的前 top_k 个 (文档, 分数)。
+        没来得及打分的文档分数为 None。
+        """
+        if not documents:
+            return []
+
+        query = normalize_query(query)
+        keys = [self.__key(query, doc.page_content) for doc in documents]
+        scores = [self.__cache.get(key) for key in keys]
+
+        # 按检索顺序打分：预算用完时，排名靠前的候选已经打过分了
+        missing = [i for i, score in enumerate(scores) if score is None]
+        start = time.monotonic()
+        for batch_start in range(0, len(missing), self.__batch_size):
+            if batch_start and time.monotonic() - start > self.__latency_budget:
+                self.budget_exceeded += 1
+                print(f"⏱️ Rerank budget exceeded, {len(missing) - batch_start} candidates left unscored")
+                break
+            batch = missing[batch_start:batch_start + self.__batch_size]
+            predicted = self.__get_model().predict([(query, documents[i].page_content) for i in batch])
+            for i, score in zip(batch, predicted):
+                scores[i] = float(score)
+                self.__cache.put(keys[i], scores[i])
+
+        scored = sorted(
+            ((doc, score) for doc, score in zip(documents, scores) if score is not None),
+            key=lambda pair: pair[1], reverse=True
+        )
+        unscored = [(doc, None) for doc, score in zip(documents, scores) if score is None]
+        return (scored + unscored)[:top_k]
+
+    # ------------------------------------------------------------
+    # 指标
+    # ------------------------------------------------------------
+    def stats(self):
+        return {**self.__cache.stats(), "budget_exceeded": self.budget_exceeded}
+
+    # ------------------------------------------------------------
+    # 内部方法
+    # ------------------------------------------------------------
+    @staticmethod
+    def __key(query: str, text: str) -> str:
+        return hashlib.sha256(f"{query}\x00{text}".encode("utf-8")).hexdigest()
+
+    def __get_model(self):
+        if self.__model is None:
+            with self.__model_lock:
+                if self.__model is None:
+                    # [第三方库] sentence_transformers.CrossEncoder
+                    # 来源：sentence-transformers (已是稠密模型的依赖)
+                    # 用法：输入 (查询, 文本) 对，输出相关性分数；这里固定跑在 CPU 上。
+                    from sentence_transformers import CrossEncoder
+                    print(f"Loading reranker: {self.__model_name}...")
+                    self.__model = CrossEncoder(self.__model_name, device="cpu")
+        return self.__model
@@ -9,6 +9,11 @@
 # 用法：读取全局配置（如数据库路径、模型名称、稀疏向量字段名）。
 import config
 
+# [Python标准库] hashlib / uuid
+# 用法：增量入库时按子块正文的 SHA-256 复用旧向量；新写入的点用 uuid 作为 ID (与 LangChain 一致)。
+import hashlib
+import uuid
+
 # [第三方库] langchain_huggingface
 # 来源：LangChain 的 HuggingFace 集成
 # 用法：HuggingFaceEmbeddings 用于加载强大的开源模型（如 bge-m3, all-mpnet-base-v2）。
@@ -29,6 +34,26 @@ from langchain_qdrant import QdrantVectorStore, FastEmbedSparse, RetrievalMode
 from qdrant_client import QdrantClient
 from qdrant_client.http import models as qmodels
 
+# [本项目] db.embedding_cache
+# 用法：给稠密 / 稀疏模型套一层查询向量缓存，Agent 重试相同 (或几乎相同) 的查询时不再重新编码。
+from db.embedding_cache import CachedDenseEmbeddings, CachedSparseEmbeddings
+
+# [本项目] db.hybrid_search
+# 用法：按查询选择检索模式 (稠密 / 稀疏 / 混合) 和融合方式的检索器。
+from db.hybrid_search import HybridSearcher
+
+# [本项目] db.collection_layout
+# 用法：按 config 把量化 / 磁盘存储 / HNSW 选项翻译成 Qdrant 的建表参数和查询参数。
+from db.collection_layout import collection_params, search_params
+
+# [本项目] db.qdrant_client_factory
+# 用法：按配置创建本地文件客户端，或带连接池 / gRPC / 重试的远程客户端。
+from db.qdrant_client_factory import create_qdrant_client
+
+# [本项目] db.lazy_embeddings
+# 用法：模型推迟到第一次使用 (或后台预热) 时才加载；不加载模型也能从元数据读出稠密向量维度。
+from db.lazy_embeddings import LazyEmbeddings, sentence_transformer_dimension
+
 
 # ============================================================
 # 类定义: VectorDbManager (支持混合检索)
@@ -36,52 +61,101 @@ from qdrant_client.http import models as qmodels
 class VectorDbManager:
     # [类型提示] 定义私有成员变量的类型，方便 IDE 提示
     __client: QdrantClient
-    __dense_embeddings: HuggingFaceEmbeddings
-    __sparse_embeddings: FastEmbedSparse
+    __dense_embeddings: CachedDenseEmbeddings
+    __sparse_embeddings: CachedSparseEmbeddings
 
     def __init__(self):
         """
-        初始化：连接数据库，并同时加载两套模型（稠密+稀疏）。
+        初始化：连接数据库，并准备两套模型（稠密+稀疏）。
+        模型本身不在这里加载：第一次编码时才加载，或者由 warm_up() 在后台提前加载。
         """
-        # 1. 连接 Qdrant 数据库 (本地文件模式)
-        self.__client = QdrantClient(path=config.QDRANT_DB_PATH)
+        # 1. 连接 Qdrant 数据库 (本地文件模式，或 config.QDRANT_MODE = "remote" 时连接 Qdrant 服务)
+        self.__client = create_qdrant_client()
+        self.__dense_dimension = None
 
-        # 2. 加载稠密向量模型 (语义理解)
+        # 2. 稠密向量模型 (语义理解)
         # model_name 在 config.py 中配置 (如 "sentence-transformers/all-mpnet-base-v2")
-        self.__dense_embeddings = HuggingFaceEmbeddings(model_name=config.DENSE_MODEL)
+        # 外面再包一层查询缓存 (内存 LRU + 可选的磁盘缓存)；缓存命中时根本不需要模型
+        self.__dense_model = LazyEmbeddings("dense", lambda: HuggingFaceEmbeddings(model_name=config.DENSE_MODEL))
+        self.__dense_embeddings = CachedDenseEmbeddings(
+            self.__dense_model,
+            model_name=config.DENSE_MODEL,
+            max_entries=config.EMBEDDING_CACHE_MAX_ENTRIES,
+            db_path=config.EMBEDDING_CACHE_PATH,
+            max_disk_entries=config.EMBEDDING_CACHE_MAX_DISK_ENTRIES
+        )
 
-        # 3. 加载稀疏向量模型 (关键词匹配)
+        # 3. 稀疏向量模型 (关键词匹配)
         # 这里的模型通常是 "Qdrant/bm25"，非常轻量，用于弥补语义搜索不够精确的缺点
-        self.__sparse_embeddings = FastEmbedSparse(model_name=config.SPARSE_MODEL)
+        self.__sparse_model = LazyEmbeddings("sparse", lambda: FastEmbedSparse(model_name=config.SPARSE_MODEL))
+        self.__sparse_embeddings = CachedSparseEmbeddings(
+            self.__sparse_model,
+            model_name=config.SPARSE_MODEL,
+            max_entries=config.EMBEDDING_CACHE_MAX_ENTRIES,
+            db_path=config.EMBEDDING_CACHE_PATH,
+            max_disk_entries=config.EMBEDDING_CACHE_MAX_DISK_ENTRIES
+        )
+
+    # ------------------------------------------------------------
+    # 模型加载 (懒加载 / 后台预热)
+    # ------------------------------------------------------------
+    def warm_up(self, background=True):
+        """
+        加载两套模型。background=True 时在后台线程加载并立即返回，应用可以先把界面起来；
+        否则在当前线程加载完再返回。
+        """
+        for model in (self.__sparse_model, self.__dense_model):
+            if background:
+                model.warm_up()
+            else:
+                model.load()
+
+    def models_ready(self):
+        """两套模型是否都已加载 (就绪信号)。"""
+        return self.__dense_model.ready.is_set() and self.__sparse_model.ready.is_set()
+
+    def wait_until_ready(self, timeout=None):
+        """阻塞等待两套模型加载完成，返回是否在 timeout 内就绪。"""
+        return self.__dense_model.ready.wait(timeout) and self.__sparse_model.ready.wait(timeout)
+
+    def model_status(self):
+        """每个模型是否就绪、加载耗时 (秒)、后台加载的错误信息。"""
+        return {"dense": self.__dense_model.status(), "sparse": self.__sparse_model.status()}
+
+    def dense_dimension(self):
+        """
+        稠密向量维度，按代价从低到高依次尝试：
+        config.DENSE_DIMENSION -> 模型仓库的配置文件 -> 已加载的模型 -> 加载模型并编码一次。
+        """
+        if self.__dense_dimension is None:
+            dimension = config.DENSE_DIMENSION or sentence_transformer_dimension(config.DENSE_MODEL)
+            if dimension is None:
+                model = self.__dense_model.model
+                client = getattr(model, "_client", None) or getattr(model, "client", None)
+                get_dimension = getattr(client, "get_sentence_embedding_dimension", None)
+                dimension = get_dimension() if get_dimension else None
+            self.__dense_dimension = dimension or len(self.__dense_embeddings.embed_query("test"))
+        return self.__dense_dimension
 
     # ------------------------------------------------------------
     # 创建集合 (Create Table)
     # ------------------------------------------------------------
-    def create_collection(self, collection_name):
+    def create_collection(self, collection_name, layout=None):
         """
         创建一个支持混合检索的 Qdrant 集合。
+        layout: 可选的存储布局 (量化、磁盘存储、HNSW)，未指定的选项使用 config.py 里的值。
         """
         # 检查是否已存在
         if not self.__client.collection_exists(collection_name):
             print(f"Creating collection: {collection_name}...")
 
             # [核心逻辑] 创建集合配置
+            # 配置 1: 稠密向量 (Dense)，size 取模型输出维度 (比如 768，通常从元数据读取，不必加载模型)，使用余弦相似度
+            # 配置 2: 稀疏向量 (Sparse)，这就是混合检索的关键！为 BM25 关键词索引预留位置。
+            # 配置 3: 可选的量化 / 磁盘存储 / HNSW 参数 (见 db/collection_layout.py)
             self.__client.create_collection(
                 collection_name=collection_name,
-
-                # 配置 1: 稠密向量 (Dense)
-                # size: 自动获取模型输出维度 (比如 768)
-                # distance: 使用余弦相似度 (Cosine)
-                vectors_config=qmodels.VectorParams(
-                    size=len(self.__dense_embeddings.embed_query("test")),
-                    distance=qmodels.Distance.COSINE
-                ),
-
-                # 配置 2: 稀疏向量 (Sparse)
-                # 这就是混合检索的关键！为 BM25 关键词索引预留位置。
-                sparse_vectors_config={
-                    config.SPARSE_VECTOR_NAME: qmodels.SparseVectorParams()
-                },
+                **collection_params(self.dense_dimension(), layout)
             )
             print(f"✓ Collection created: {collection_name}")
         else:
@@ -128,4 +202,105 @@ class VectorDbManager:
         except Exception as e:
             print(f"Unable to get collection {collection_name}: {e}")
             # 如果出错，这里可能需要 raise e 或者返回 None，避免程序继续带病运行
-            raise e
\ No newline at end of file
+            raise e
+
+    # ------------------------------------------------------------
+    # 获取按查询选择模式的检索器
+    # ------------------------------------------------------------
+    def get_searcher(self, collection_name) -> HybridSearcher:
+        """
+        返回一个 HybridSearcher：接口与 get_collection 的 similarity_search 相同，
+        但每次查询可以选择 dense / sparse / hybrid 模式和融合方式，并统计每种模式的延迟。
+        """
+        return HybridSearcher(self.__client, collection_name, self.__dense_embeddings, self.__sparse_embeddings,
+                              dense_search_params=search_params())
+
+    # ------------------------------------------------------------
+    # 增量入库：规划一个文档的替换
+    # ------------------------------------------------------------
+    def plan_document_replacement(self, collection_name, source, child_chunks):
+        """
+        [增量入库] 准备用新的子块替换某个源文档 (metadata.source == source) 的全部旧向量。
+
+        返回 (旧点 ID 列表, 与 child_chunks 一一对应的向量列表)。
+        正文没有变化的子块直接拿到旧的稠密 + 稀疏向量，需要重新编码的位置为 None。
+        """
+        source_filter = qmodels.Filter(must=[
+            qmodels.FieldCondition(key="metadata.source", match=qmodels.MatchValue(value=source))
+        ])
+        old_ids, reusable = [], {}
+        offset = None
+        while True:
+            records, offset = self.__client.scroll(
+                collection_name=collection_name,
+                scroll_filter=source_filter,
+                limit=256,
+                offset=offset,
+                with_payload=["page_content"],
+                with_vectors=True
+            )
+            for record in records:
+                old_ids.append(record.id)
+                text = (record.payload or {}).get("page_content", "")
+                reusable[hashlib.sha256(text.encode("utf-8")).hexdigest()] = record.vector
+            if offset is None:
+                break
+
+        vectors = [reusable.get(hashlib.sha256(c.page_content.encode("utf-8")).hexdigest()) for c in child_chunks]
+        return old_ids, vectors
+
+    # ------------------------------------------------------------
+    # 查询向量 (走缓存)
+    # ------------------------------------------------------------
+    def embed_query(self, text):
+        """计算单个查询的稠密向量，语义答案缓存用它比较问题之间的相似度。"""
+        return self.__dense_embeddings.embed_query(text)
+
+    # ------------------------------------------------------------
+    # 入库：编码 / 写入 / 删除
+    # ------------------------------------------------------------
+    def embed_dense(self, texts):
+        """批量计算稠密向量 (入库用，不走查询缓存)。"""
+        return self.__dense_embeddings.embed_documents(texts)
+
+    def embed_sparse(self, texts):
+        """批量计算稀疏向量，转换成 Qdrant 的 SparseVector。"""
+        return [
+            qmodels.SparseVector(indices=sp.indices, values=sp.values)
+            for sp in self.__sparse_embeddings.embed_documents(texts)
+        ]
+
+    def upsert_chunks(self, collection_name, chunks, vectors):
+        """
+        写入子块。vectors 的每一项形如 {"": 稠密向量, SPARSE_VECTOR_NAME: 稀疏向量}，
+        payload 结构与 QdrantVectorStore 保持一致，写入后可以直接被 similarity_search 检索到。
+        """
+        points = [
+            qmodels.PointStruct(
+                id=uuid.uuid4().hex,
+                vector=vector,
+                payload={"page_content": chunk.page_content, "metadata": chunk.metadata}
+            )
+            for chunk, vector in zip(chunks, vectors)
+        ]
+        if points:
+            self.__client.upsert(collection_name=collection_name, points=points)
+
+    def delete_points(self, collection_name, point_ids):
+        if point_ids:
+            self.__client.delete(
+                collection_name=collection_name,
+                points_selector=qmodels.PointIdsList(points=point_ids)
+            )
+
+    # ------------------------------------------------------------
+    # 查询向量缓存指标
+    # ------------------------------------------------------------
+    def embedding_cache_stats(self):
+        """
+        返回稠密 / 稀疏两套查询向量缓存的命中情况。
+        """
+        return {
+            "dense": self.__dense_embeddings.cache.stats(),
+            "sparse": self.__sparse_embeddings.cache.stats(),
+        }
@@ -7,6 +7,18 @@ import os
 import glob
 from pathlib import Path
 
+# [Python标准库] concurrent.futures / multiprocessing / contextlib
+# 用法：多进程并行切分多个文档。Markdown 切分是纯 CPU 的 Python 代码，受 GIL 限制，多线程没有用。
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from contextlib import contextmanager
+import multiprocessing
+import threading
+
+# [Python标准库] collections.OrderedDict / typing
+# 用法：tokens 模式下 "文本片段 -> token 数" 的 LRU 缓存。
+from collections import OrderedDict
+from typing import List
+
 # [本项目] 配置文件
 # 用来获取切片大小、重叠大小等参数
 import config
@@ -18,6 +30,63 @@ import config
 # - RecursiveCharacterTextSplitter: 最通用的切片器，按字符数递归切分，尽量不切断句子。
 from langchain_text_splitters import MarkdownHeaderTextSplitter, RecursiveCharacterTextSplitter
 
+# [本项目] db.lazy_embeddings
+# 用法：tokens 模式下从模型元数据读取编码窗口 (max_seq_length)，不需要加载模型本身。
+from db.lazy_embeddings import sentence_transformer_max_seq_length
+
+
+# ============================================================
+# 类定义: TokenLengthCounter (带缓存的 token 长度函数)
+# ============================================================
+class TokenLengthCounter:
+    """
+    [类功能] 用稠密模型自己的分词器 (Rust 实现的 fast tokenizer) 计算文本的 token 数，作为切分器的 length_function。
+
+    递归切分器会对同一个片段反复求长度 (先判断要不要继续切，合并时再算一次)，所以结果按文本缓存；
+    count_many() 一次批量编码多个未缓存的片段，切分一个父块前先用它把段落 / 行的长度预先算好。
+    后台入库任务的多个 worker 线程共用同一个切分器，所以分词和缓存都加锁 (fast tokenizer 不支持并发调用)。
+    """
+
+    def __init__(self, model_name=config.DENSE_MODEL, max_entries=config.TOKEN_LENGTH_CACHE_MAX_ENTRIES):
+        # [第三方库] transformers.AutoTokenizer
+        # 来源：transformers (sentence-transformers 的依赖)；只在 tokens 模式下才导入和加载
+        from transformers import AutoTokenizer
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.__max_entries = max_entries
+        self.__cache = OrderedDict()
+        self.__lock = threading.RLock()
+
+    def __call__(self, text: str) -> int:
+        with self.__lock:
+            count = self.__cache.get(text)
+            if count is None:
+                count = len(self.tokenizer(text, add_special_tokens=False, verbose=False)["input_ids"])
+                self.__remember(text, count)
+            else:
+                self.__cache.move_to_end(text)
+            return count
+
+    def count_many(self, texts: List[str]) -> List[int]:
+        with self.__lock:
+            missing = list({t for t in texts if t not in self.__cache})
+            if missing:
+                encoded = self.tokenizer(missing, add_special_tokens=False, verbose=False)["input_ids"]
+                for text, ids in zip(missing, encoded):
+                    self.__remember(text, len(ids))
+            return [self(t) for t in texts]
+
+    def offsets(self, text: str):
+        """每个 token 在原文中的 (起始, 结束) 字符位置。"""
+        with self.__lock:
+            return self.tokenizer(text, add_special_tokens=False, return_offsets_mapping=True,
+                                  verbose=False)["offset_mapping"]
+
+    def __remember(self, text, count):
+        self.__cache[text] = count
+        if len(self.__cache) > self.__max_entries:
+            self.__cache.popitem(last=False)
+
 
 # ============================================================
 # 类定义: DocumentChuncker
@@ -26,7 +95,7 @@ class DocumentChuncker:
 
     def __init__(self):
         """
-        [初始化] 准备好两把"刀"：一把切大块，一把切小块。
+        [初始化] 准备好几把"刀"：一把切大块，一把切小块，一把拆过大的父块。
         """
         # [第一把刀] 父文档切分器 (按标题切)
         # 它可以把 Markdown 文档按章节结构拆开，比如把 "## 1. Introduction" 下的内容切成一块。
@@ -35,33 +104,117 @@ class DocumentChuncker:
             strip_headers=False  # 保留标题文本在正文中
         )
 
-        # [第二把刀] 子文档切分器 (按字数切)
+        # [第二把刀] 子文档切分器 (按字数切，或者按 token 数切)
         # 用来把巨大的父块切成适合向量检索的小切片 (比如 500 字)。
-        self.__child_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=config.CHILD_CHUNK_SIZE,  # 500
-            chunk_overlap=config.CHILD_CHUNK_OVERLAP  # 100 (重叠一点，防止切断关键词)
-        )
+        # tokens 模式要加载分词器 (可能还要从 Hub 下载)，推迟到第一次切子块时才创建，不拖慢应用启动
+        self.__token_counter = None
+        self.__child_splitter = None
+        self.__child_splitter_lock = threading.Lock()
+        if config.CHILD_SPLIT_MODE == "chars":
+            self.__child_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=config.CHILD_CHUNK_SIZE,  # 500
+                chunk_overlap=config.CHILD_CHUNK_OVERLAP  # 100 (重叠一点，防止切断关键词)
+            )
+        elif config.CHILD_SPLIT_MODE != "tokens":
+            raise ValueError(f"Unsupported child split mode: {config.CHILD_SPLIT_MODE}")
 
         # [配置] 读取父块的大小限制
         self.__min_parent_size = config.MIN_PARENT_SIZE  # 2000 (太小就合并)
         self.__max_parent_size = config.MAX_PARENT_SIZE  # 10000 (太大就强拆)
 
+        # [第三把刀] 过大父块的切分器 (按 max_size 切)
+        self.__large_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=self.__max_parent_size,
+            chunk_overlap=config.CHILD_CHUNK_OVERLAP
+        )
+
     # ------------------------------------------------------------
     # 公开方法：批量处理整个文件夹
     # ------------------------------------------------------------
-    def create_chunks(self, path_dir=config.MARKDOWN_DIR):
+    def create_chunks(self, path_dir=config.MARKDOWN_DIR, workers=None):
+        """
+        切分文件夹下所有 .md 文件，返回 (全部父块, 全部子块)。
+        结果按文件名排序拼接，与并行与否无关；文档很多时用 iter_chunks 逐个处理，内存更省。
+        """
+        results = dict(self.__iter_chunk_results(path_dir, workers))
         all_parent_chunks, all_child_chunks = [], []
-
-        # [Python标准库] glob 遍历文件夹下所有 .md 文件
-        for doc_path_str in sorted(glob.glob(os.path.join(path_dir, "*.md"))):
-            doc_path = Path(doc_path_str)
-            # 调用处理单个文件的函数
-            parent_chunks, child_chunks = self.create_chunks_single(doc_path)
+        for i in sorted(results):
+            parent_chunks, child_chunks = results[i]
             all_parent_chunks.extend(parent_chunks)
             all_child_chunks.extend(child_chunks)
 
         return all_parent_chunks, all_child_chunks
 
+    def iter_chunks(self, path_dir=config.MARKDOWN_DIR, workers=None):
+        """
+        [生成器] 逐个文档产出 (parent_chunks, child_chunks)，哪个文档先切完就先产出哪个。
+        workers > 1 时用进程池并行切分 (默认读取 config.CHUNKING_WORKERS)。
+        父块 ID 只取决于文档名和块在文档内的顺序 ("<文档名>_parent_<i>")，与并行度和完成顺序无关。
+        """
+        for _, (parent_chunks, child_chunks) in self.__iter_chunk_results(path_dir, workers):
+            yield parent_chunks, child_chunks
+
+    def __iter_chunk_results(self, path_dir, workers):
+        # [Python标准库] glob 遍历文件夹下所有 .md 文件
+        doc_paths = [Path(p) for p in sorted(glob.glob(os.path.join(path_dir, "*.md")))]
+        workers = min(config.CHUNKING_WORKERS if workers is None else workers, len(doc_paths))
+
+        if workers <= 1:
+            for i, doc_path in enumerate(doc_paths):
+                # 调用处理单个文件的函数
+                yield i, self.create_chunks_single(doc_path)
+            return
+
+        # 同时在途的文档最多 2 × workers 个：消费方处理得慢时，切好的结果不会在内存里越堆越多
+        with self.chunk_submitter(workers) as submit:
+            pending = iter(enumerate(doc_paths))
+            in_flight = {}
+
+            def submit_next():
+                for i, doc_path in pending:
+                    in_flight[submit(doc_path)] = i
+                    return
+
+            for _ in range(2 * workers):
+                submit_next()
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    i = in_flight.pop(future)
+                    submit_next()
+                    yield i, future.result()
+
+    @contextmanager
+    def chunk_submitter(self, workers=None):
+        """
+        [上下文管理器] 产出 submit(md_path) -> Future，Future 的结果是 (parent_chunks, child_chunks)。
+        给流式入库用：文件是陆续转换出来的，来一个提交一个，由调用方控制同时在途的数量。
+        workers > 1 时在进程池里切分，否则在调用线程里直接切分 (返回已完成的 Future)。
+        """
+        workers = config.CHUNKING_WORKERS if workers is None else workers
+        if workers <= 1:
+            def submit_inline(md_path):
+                future = Future()
+                try:
+                    future.set_result(self.create_chunks_single(md_path))
+                except Exception as e:
+                    future.set_exception(e)
+                return future
+
+            yield submit_inline
+            return
+
+        # [关键] 使用 spawn 而不是 fork：主进程里可能已经加载了 torch / tokenizers 的线程池，fork 之后容易死锁
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=_init_chunk_worker)
+        try:
+            yield lambda md_path: pool.submit(_chunk_in_worker, str(md_path))
+        except BaseException:
+            # 调用方提前结束：还没开始的文档不用再切
+            pool.shutdown(wait=True, cancel_futures=True)
+            raise
+        pool.shutdown(wait=True)
+
     # ------------------------------------------------------------
     # 公开方法：处理单个文件 (核心逻辑)
     # ------------------------------------------------------------
@@ -95,41 +248,56 @@ class DocumentChuncker:
         """
         [算法逻辑] 如果某个章节只有几句话 (小于 min_size)，把它合并到前一个章节里。
         防止上下文碎片化。
+
+        先只看长度规划好分组，再对每组做一次 join：
+        反复 += 拼接字符串在几千个小标题的文档上是平方级的。
         """
         if not chunks:
             return []
 
-        merged, current = [], None
-
+        # 1. 规划：按长度累加，达到 min_size 就结束当前分组
+        # 拼好后的长度 = 各块长度之和 + 每个 "\n\n" 分隔符 2 个字符
+        groups, current, current_len = [], [], 0
         for chunk in chunks:
-            if current is None:
-                current = chunk
-            else:
-                # [核心逻辑] 累加内容
-                current.page_content += "\n\n" + chunk.page_content
-                # [核心逻辑] 合并元数据 (保留标题层级路径)
-                # 例如: "Introduction" -> "Background"
-                for k, v in chunk.metadata.items():
-                    if k in current.metadata:
-                        current.metadata[k] = f"{current.metadata[k]} -> {v}"
-                    else:
-                        current.metadata[k] = v
-
-            # 只有当积累到足够大时，才把它作为一个独立的 Parent
-            if len(current.page_content) >= self.__min_parent_size:
-                merged.append(current)
-                current = None
-
-        # 处理循环结束后的残留块
+            current_len += len(chunk.page_content) + (2 if current else 0)
+            current.append(chunk)
+            if current_len >= self.__min_parent_size:
+                groups.append(current)
+                current, current_len = [], 0
+
+        # 处理循环结束后的残留块：接到最后一组的正文末尾 (不合并元数据)；没有分组时自成一组
+        tail = []
         if current:
-            if merged:
-                merged[-1].page_content += "\n\n" + current.page_content
-                # ... (元数据合并逻辑同上)
+            if groups:
+                tail = current
             else:
-                merged.append(current)
+                groups.append(current)
 
+        # 2. 生成：每组的第一个块作为 Parent，正文一次 join，元数据合并一次
+        merged = [self.__join_group(group) for group in groups]
+        if tail:
+            merged[-1].page_content = "\n\n".join([merged[-1].page_content] + [c.page_content for c in tail])
         return merged
 
+    @staticmethod
+    def __join_group(group):
+        head = group[0]
+        if len(group) == 1:
+            return head
+
+        # [核心逻辑] 合并元数据 (保留标题层级路径)
+        # 例如: "Introduction" -> "Background"；同一个键出现多次时按顺序用 " -> " 连接
+        values = {}
+        for chunk in group:
+            for k, v in chunk.metadata.items():
+                values.setdefault(k, []).append(v)
+        head.metadata.update({
+            k: vs[0] if len(vs) == 1 else " -> ".join(f"{v}" for v in vs)
+            for k, vs in values.items()
+        })
+        head.page_content = "\n\n".join(c.page_content for c in group)
+        return head
+
     # ------------------------------------------------------------
     # 私有方法：拆分过大的父块
     # ------------------------------------------------------------
@@ -144,13 +312,8 @@ class DocumentChuncker:
             if len(chunk.page_content) <= self.__max_parent_size:
                 split_chunks.append(chunk)
             else:
-                # 临时创建一个大块切分器
-                splitter = RecursiveCharacterTextSplitter(
-                    chunk_size=self.__max_parent_size,
-                    chunk_overlap=config.CHILD_CHUNK_OVERLAP
-                )
                 # [第三方库] split_documents
-                sub_chunks = splitter.split_documents([chunk])
+                sub_chunks = self.__large_splitter.split_documents([chunk])
                 split_chunks.extend(sub_chunks)
 
         return split_chunks
@@ -161,26 +324,88 @@ class DocumentChuncker:
     def __clean_small_chunks(self, chunks):
         """
         [算法逻辑] 拆分后可能又产生了小碎片，最后再合并一次，确保万无一失。
-        逻辑与 __merge_small_parents 类似。
+        如果不满 min_size，就拼到前一块去；前面还没有块时，拼到后一块的开头。
+        (只合并正文，不合并元数据；整篇文档都不满 min_size 时不产生父块。)
+
+        与 __merge_small_parents 一样，先规划每个保留块由哪些片段组成，最后各 join 一次。
         """
-        cleaned = []
-        # ... (逻辑同上，为了节省篇幅，核心思想就是：如果不满 min_size，就拼到下一块或上一块去)
+        cleaned = []  # [(保留的块, 组成它正文的片段列表)]
+        pending, pending_len = [], 0  # 等着拼到后一块开头的小碎片
 
-        # 简化的逻辑展示：
         for i, chunk in enumerate(chunks):
-            if len(chunk.page_content) < self.__min_parent_size:
+            length = len(chunk.page_content) + (pending_len + 2 if pending else 0)
+            if length < self.__min_parent_size:
                 if cleaned:
                     # 合并到前一块
-                    cleaned[-1].page_content += "\n\n" + chunk.page_content
-                    # (元数据合并...)
+                    cleaned[-1][1].append(chunk.page_content)
                 elif i < len(chunks) - 1:
                     # 或者合并到后一块
-                    chunks[i + 1].page_content = chunk.page_content + "\n\n" + chunks[i + 1].page_content
-                    # (元数据合并...)
+                    pending_len = length
+                    pending.append(chunk.page_content)
             else:
-                cleaned.append(chunk)
+                cleaned.append((chunk, pending + [chunk.page_content]))
+                pending, pending_len = [], 0
+
+        for chunk, parts in cleaned:
+            if len(parts) > 1:
+                chunk.page_content = "\n\n".join(parts)
+        return [chunk for chunk, _ in cleaned]
 
-        return cleaned
+    # ------------------------------------------------------------
+    # 私有方法：按 token 切分子块
+    # ------------------------------------------------------------
+    def __token_child_splitter(self):
+        """
+        [tokens 模式] 长度函数换成分词器的 token 数 (第一次调用时创建，之后复用；多个线程同时切分时只创建一次)。
+        子块上限取 CHILD_CHUNK_TOKENS 与模型窗口 (max_seq_length 减去 [CLS]/[SEP] 等特殊 token) 中较小的一个。
+        """
+        with self.__child_splitter_lock:
+            if self.__child_splitter is None:
+                token_counter = TokenLengthCounter()
+                tokenizer = token_counter.tokenizer
+                window = sentence_transformer_max_seq_length(config.DENSE_MODEL) or tokenizer.model_max_length
+                self.__max_child_tokens = min(config.CHILD_CHUNK_TOKENS,
+                                              window - tokenizer.num_special_tokens_to_add())
+                self.__token_counter = token_counter
+                self.__child_splitter = RecursiveCharacterTextSplitter(
+                    chunk_size=self.__max_child_tokens,
+                    chunk_overlap=min(config.CHILD_CHUNK_OVERLAP_TOKENS, self.__max_child_tokens // 2),
+                    length_function=token_counter
+                )
+            return self.__child_splitter
+
+    def __split_children(self, p_chunk):
+        child_splitter = self.__child_splitter or self.__token_child_splitter()
+        if self.__token_counter is None:
+            return child_splitter.split_documents([p_chunk])
+
+        # 先批量算好段落和行的长度，切分器随后的逐个查询大多直接命中缓存
+        paragraphs = p_chunk.page_content.split("\n\n")
+        self.__token_counter.count_many(paragraphs + [line for p in paragraphs for line in p.split("\n")])
+        children = child_splitter.split_documents([p_chunk])
+
+        # 切分器按片段长度之和估算合并后的长度，拼接处可能多出几个 token：逐个复核，超出窗口的按 token 硬切
+        lengths = self.__token_counter.count_many([c.page_content for c in children])
+        if all(n <= self.__max_child_tokens for n in lengths):
+            return children
+        checked = []
+        for child, n in zip(children, lengths):
+            checked.extend([child] if n <= self.__max_child_tokens else self.__split_by_tokens(child))
+        return checked
+
+    def __split_by_tokens(self, child):
+        # 按分词器给出的字符偏移，每 step 个 token 切一段；
+        # 从 token 中间切开的词重新分词时可能多出一两个 token，所以切完再复核，超出就缩小 step 重切
+        text = child.page_content
+        offsets = self.__token_counter.offsets(text)
+        step = self.__max_child_tokens
+        while True:
+            bounds = [0] + [offsets[i][0] for i in range(step, len(offsets), step)] + [len(text)]
+            pieces = [text[a:b] for a, b in zip(bounds, bounds[1:])]
+            if step == 1 or all(n <= self.__max_child_tokens for n in self.__token_counter.count_many(pieces)):
+                break
+            step -= max(1, step // 16)
+        return [type(child)(page_content=piece, metadata=dict(child.metadata)) for piece in pieces]
 
     # ------------------------------------------------------------
     # 私有方法：创建子块并关联 (关键步骤)
@@ -204,11 +429,26 @@ class DocumentChuncker:
 
             # 2. 切分子文档
             # [第三方库] split_documents
-            children = self.__child_splitter.split_documents([p_chunk])
+            children = self.__split_children(p_chunk)
 
             # 3. 建立关联 (这是最重要的一步！)
             # 这样检索到 Child 时，才能反向查找到 Parent
             for child in children:
                 child.metadata.update({"parent_id": parent_id})
 
-            all_child_chunks.extend(children)
\ No newline at end of file
+            all_child_chunks.extend(children)
+
+# ============================================================
+# 多进程切分: worker 进程
+# ============================================================
+_worker_chunker = None
+
+
+def _init_chunk_worker():
+    """[子进程入口] 每个 worker 进程只创建一次切分器。"""
+    global _worker_chunker
+    _worker_chunker = DocumentChuncker()
+
+
+def _chunk_in_worker(md_path):
+    return _worker_chunker.create_chunks_single(md_path)
@@ -0,0 +1,208 @@
+# project/rag_agent/checkpointer.py
+
+# ============================================================
+# 导入部分
+# ============================================================
+
+# [Python标准库] asyncio / sqlite3 / time
+# 用法：
+# - asyncio: SqliteSaver 只有同步实现，异步接口用 asyncio.to_thread 放到线程里执行。
+# - sqlite3: 对话记忆落盘到本地 SQLite 文件，重启不丢失。
+# - time: 记录每个线程最后一次活动的时间，用于 TTL 淘汰。
+import asyncio
+import sqlite3
+import time
+
+# [本项目] config
+# 用法：读取记忆后端、数据库路径、TTL、单线程大小上限等配置。
+import config
+
+# [第三方库] langchain_core.messages
+# 用法：压缩记忆时识别工具返回的消息 (ToolMessage) 和人类消息 (HumanMessage)。
+from langchain_core.messages import HumanMessage, ToolMessage
+
+# [第三方库] langgraph.checkpoint.memory.InMemorySaver
+# 用法：纯内存后端，只适合开发调试 (进程退出即丢失，且不会自动清理)。
+from langgraph.checkpoint.memory import InMemorySaver
+
+# [第三方库] langgraph.checkpoint.sqlite.SqliteSaver
+# 来源：langgraph-checkpoint-sqlite
+# 用法：官方的 SQLite 记忆后端，我们在它的基础上加上压缩、TTL 和"只保留最新"的清理逻辑。
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+
+# ============================================================
+# 工厂函数: 按配置创建记忆后端
+# ============================================================
+def create_checkpointer():
+    """
+    [函数功能] 根据 config.CHECKPOINTER_BACKEND 返回一个 checkpointer
+    - "memory": InMemorySaver (原来的行为)
+    - "sqlite": BoundedSqliteSaver (持久化 + 有界 + TTL 淘汰)
+    """
+    if config.CHECKPOINTER_BACKEND == "memory":
+        return InMemorySaver()
+    if config.CHECKPOINTER_BACKEND == "sqlite":
+        return BoundedSqliteSaver.from_path(config.CHECKPOINT_DB_PATH)
+    raise ValueError(f"Unsupported checkpointer backend: {config.CHECKPOINTER_BACKEND}")
+
+
+# ============================================================
+# 工具函数: 压缩消息历史
+# ============================================================
+def compact_messages(messages, keep_tool_messages, max_chars):
+    """
+    [压缩逻辑] 返回一份压缩后的新列表 (不修改原消息对象)
+    1. 只保留最近 keep_tool_messages 条工具输出的全文，更早的替换成一行占位符
+       (工具输出里是动辄上万字的父文档，是记忆膨胀的主要来源)。
+    2. 如果总字数仍超过 max_chars，从最早的消息开始丢弃，
+       并保证剩下的历史从一条 HumanMessage 开始 (避免留下没有对应工具调用的孤儿 ToolMessage)。
+    """
+    tool_positions = [i for i, msg in enumerate(messages) if isinstance(msg, ToolMessage)]
+    stale = set(tool_positions[:-keep_tool_messages] if keep_tool_messages else tool_positions)
+
+    compacted = []
+    for i, msg in enumerate(messages):
+        if i in stale and len(str(msg.content)) > 200:
+            msg = msg.model_copy(update={"content": f"[compacted tool output: {len(str(msg.content))} chars]"})
+        compacted.append(msg)
+
+    total = sum(len(str(msg.content)) for msg in compacted)
+    start = 0
+    while total > max_chars and start < len(compacted) - 1:
+        total -= len(str(compacted[start].content))
+        start += 1
+        # 跳到下一条人类消息，保证工具调用与工具结果成对出现
+        while start < len(compacted) - 1 and not isinstance(compacted[start], HumanMessage):
+            total -= len(str(compacted[start].content))
+            start += 1
+
+    return compacted[start:]
+
+
+# ============================================================
+# 类定义: BoundedSqliteSaver (有界的 SQLite 记忆)
+# ============================================================
+class BoundedSqliteSaver(SqliteSaver):
+    """
+    [类功能] 在官方 SqliteSaver 的基础上，保证长时间运行时记忆占用不会无限增长：
+
+    - 压缩：写入前把旧的工具输出替换成占位符，单个线程的消息总字数超过上限时丢弃最早的对话。
+    - 只保留最新：主图每写入一个新 checkpoint，就删除同一线程更早的 checkpoint，
+      以及已经跑完的子图 (process_question) 留下的 checkpoint —— 本项目不需要"时间回溯"。
+    - TTL：超过 CHECKPOINT_THREAD_TTL 秒没有活动的线程整个删除。
+    """
+
+    def __init__(self, conn, keep_tool_messages=config.CHECKPOINT_KEEP_TOOL_MESSAGES,
+                 max_thread_chars=config.CHECKPOINT_MAX_THREAD_CHARS, **kwargs):
+        super().__init__(conn, **kwargs)
+        self.__keep_tool_messages = keep_tool_messages
+        self.__max_thread_chars = max_thread_chars
+        self.__last_eviction = 0.0
+
+    @classmethod
+    def from_path(cls, db_path):
+        # check_same_thread=False: Gradio 的回调线程共用这个连接，SqliteSaver 内部有锁
+        return cls(sqlite3.connect(db_path, check_same_thread=False))
+
+    def setup(self) -> None:
+        if self.is_setup:
+            return
+        super().setup()
+        # 额外的一张表：记录每个线程最后一次活动的时间
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS thread_activity (thread_id TEXT PRIMARY KEY, last_seen REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    # ------------------------------------------------------------
+    # 写入 checkpoint (核心)
+    # ------------------------------------------------------------
+    def put(self, config, checkpoint, metadata, new_versions):
+        channel_values = checkpoint.get("channel_values", {})
+        if channel_values.get("messages"):
+            checkpoint = {
+                **checkpoint,
+                "channel_values": {
+                    **channel_values,
+                    "messages": compact_messages(
+                        channel_values["messages"],
+                        keep_tool_messages=self.__keep_tool_messages,
+                        max_chars=self.__max_thread_chars
+                    )
+                }
+            }
+
+        next_config = super().put(config, checkpoint, metadata, new_versions)
+
+        # 只在主图 (checkpoint_ns 为空) 写入时做清理：此时本轮并行的子图都已经结束
+        if not config["configurable"].get("checkpoint_ns"):
+            self.__prune_thread(config["configurable"]["thread_id"], next_config["configurable"]["checkpoint_id"])
+            self.__evict_idle_threads()
+
+        return next_config
+
+    # ------------------------------------------------------------
+    # 内部方法：删除同一线程的旧 checkpoint 和子图 checkpoint
+    # ------------------------------------------------------------
+    def __prune_thread(self, thread_id, latest_checkpoint_id):
+        with self.cursor() as cur:
+            for table in ("checkpoints", "writes"):
+                cur.execute(
+                    f"DELETE FROM {table} WHERE thread_id = ? AND (checkpoint_ns != '' OR checkpoint_id != ?)",
+                    (thread_id, latest_checkpoint_id)
+                )
+            cur.execute(
+                "INSERT OR REPLACE INTO thread_activity (thread_id, last_seen) VALUES (?, ?)",
+                (thread_id, time.time())
+            )
+
+    # ------------------------------------------------------------
+    # 内部方法：TTL 淘汰空闲线程
+    # ------------------------------------------------------------
+    def __evict_idle_threads(self):
+        now = time.time()
+        if now - self.__last_eviction < config.CHECKPOINT_EVICT_INTERVAL:
+            return
+        self.__last_eviction = now
+
+        cutoff = now - config.CHECKPOINT_THREAD_TTL
+        with self.cursor() as cur:
+            cur.execute("SELECT thread_id FROM thread_activity WHERE last_seen < ?", (cutoff,))
+            idle = [row[0] for row in cur.fetchall()]
+        for thread_id in idle:
+            self.delete_thread(thread_id)
+
+        if idle:
+            print(f"🧹 Evicted {len(idle)} idle conversation threads")
+
+    def delete_thread(self, thread_id) -> None:
+        super().delete_thread(thread_id)
+        with self.cursor() as cur:
+            cur.execute("DELETE FROM thread_activity WHERE thread_id = ?", (str(thread_id),))
+
+
+    # ------------------------------------------------------------
+    # 异步接口 (graph.ainvoke / graph.astream 会调用)
+    # ------------------------------------------------------------
+    # 官方 SqliteSaver 的 a* 方法直接抛异常 (要求改用 AsyncSqliteSaver)。
+    # 这里把同步实现放到线程里执行：SQLite 操作都是毫秒级，不值得再维护一套异步连接，
+    # 而且这样压缩、清理、TTL 逻辑在同步和异步路径上完全一致。
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
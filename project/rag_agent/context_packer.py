@@ -0,0 +1,202 @@
+# project/rag_agent/context_packer.py
+
+# ============================================================
+# 导入部分
+# ============================================================
+
+# [Python标准库] re / threading
+# 用法：
+# - re: 估算 token 时识别中日韩字符；按 "Parent ID: ..." 拆分工具输出。
+# - threading: 并行的子图共用同一个 ContextPacker，token 计数缓存需要加锁。
+import re
+import threading
+
+# [Python标准库] collections.OrderedDict
+# 用法：按消息 ID 缓存 token 数的有界表 (LRU)。
+from collections import OrderedDict
+
+# [第三方库] langchain_core.messages.ToolMessage
+# 用法：识别工具返回的消息 (检索结果 / 父文档全文)。
+from langchain_core.messages import ToolMessage
+
+# [本项目] config
+# 用法：读取 token 预算、保留全文的最近工具输出条数、旧工具输出的截断长度。
+import config
+
+
+# ============================================================
+# 工具函数: token 估算
+# ============================================================
+_CJK = re.compile(r"[぀-ヿ㐀-鿿가-힯豈-﫿]")
+# 每条消息的固定开销 (角色标记等)
+_MESSAGE_OVERHEAD = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    [估算] 不依赖具体的分词器：中日韩字符按 1 字 1 token，其余按 4 个字符 1 token。
+    对常见的 BPE 分词器来说略微偏高，用来做预算控制正好 (宁可少塞一点)。
+    """
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+# 工具输出按 "Parent ID: ..." 开头的块拆分 (格式见 tools.py)
+_BLOCK_SPLIT = re.compile(r"\n\n(?=Parent ID: )")
+_PARENT_ID = re.compile(r"^Parent ID: (.*)$", re.MULTILINE)
+
+# 返回父文档全文的工具
+_PARENT_TOOLS = ("retrieve_parent_chunks", "retrieve_many_parent_chunks")
+
+
+# ============================================================
+# 类定义: ContextPacker (按 token 预算打包 Agent 上下文)
+# ============================================================
+class ContextPacker:
+    """
+    [类功能] 在每次调用 Agent 的 LLM 之前，把 [系统提示词 + 子图消息历史] 压进 token 预算。
+    只改变发给 LLM 的副本，图状态里的消息保持原样。
+
+    按顺序做四件事：
+    1. 去重：同一个 parent_id 的父文档全文只保留最新一份；
+       父文档全文已经在上下文里时，检索结果里属于它的子块折叠成一行。
+    2. 截断旧输出：最近 keep_recent 条之前的工具输出截断到 stale_chars 个字符。
+       被别处折叠引用的那份父文档全文 (去重后唯一的一份) 不截断，否则全文和子块就都没了。
+    3. 仍超预算：从最早的工具输出开始 (先压缩其他输出，再压缩上面那些父文档全文)，逐条压缩成一行占位符。
+    4. 最后手段：截断最新的那条工具输出，直到刚好放进预算。
+    系统提示词、用户问题和 AI 的工具调用请求永远不动 (工具调用与工具结果必须成对出现)，但计入预算。
+    """
+
+    def __init__(self, token_budget=config.AGENT_CONTEXT_TOKEN_BUDGET,
+                 keep_recent=config.AGENT_CONTEXT_KEEP_RECENT_TOOL_MESSAGES,
+                 stale_chars=config.AGENT_CONTEXT_STALE_TOOL_CHARS, max_cached_messages=4096):
+        self.__token_budget = token_budget
+        self.__keep_recent = keep_recent
+        self.__stale_chars = stale_chars
+        self.__max_cached_messages = max_cached_messages
+        self.__lock = threading.Lock()
+        # 消息 ID -> (内容长度, token 数)；工具输出很长，避免每轮 ReAct 循环都重新估算
+        self.__token_counts: "OrderedDict[str, tuple]" = OrderedDict()
+
+    # ------------------------------------------------------------
+    # 公开方法：打包
+    # ------------------------------------------------------------
+    def pack(self, messages):
+        """
+        返回一份放得进 token 预算的新消息列表 (不修改原消息对象)。
+        messages 应该是真正发给 LLM 的完整列表 (包括开头的系统提示词)，这样预算才准确。
+        """
+        packed, canonical = self.__deduplicate(list(messages))
+
+        tool_positions = [i for i, msg in enumerate(packed) if isinstance(msg, ToolMessage)]
+        stale = tool_positions[:-self.__keep_recent] if self.__keep_recent else tool_positions
+        for i in stale:
+            if i not in canonical:
+                packed[i] = self.__truncate(packed[i], self.__stale_chars)
+
+        total = sum(self.count_tokens(msg) for msg in packed)
+        if total <= self.__token_budget:
+            return packed
+
+        if not tool_positions:
+            return packed
+
+        before = total
+        latest = tool_positions[-1]
+        # 先压缩普通的旧输出，再压缩被折叠引用的父文档全文，最新的一条放在最后
+        order = sorted(tool_positions[:-1], key=lambda i: i in canonical) + [latest]
+        for i in order:
+            if total <= self.__token_budget:
+                break
+            if i == latest:
+                # 最后手段：只截断最新的一条，尽量保留它的开头
+                overflow = total - self.__token_budget
+                keep_chars = max(0, len(str(packed[i].content)) - overflow * 4 - 200)
+                shrunk = self.__truncate(packed[i], keep_chars)
+            elif len(str(packed[i].content)) > 200:
+                shrunk = self.__replace(packed[i], f"[earlier tool output omitted: {len(str(packed[i].content))} chars]")
+            else:
+                continue
+            total += self.count_tokens(shrunk) - self.count_tokens(packed[i])
+            packed[i] = shrunk
+
+        print(f"📦 Packed agent context: {before} → {total} tokens (budget {self.__token_budget})")
+        return packed
+
+    def count_tokens(self, msg) -> int:
+        """单条消息的估算 token 数 (正文 + 工具调用参数)，按消息 ID 缓存。"""
+        content = str(msg.content)
+        key = getattr(msg, "id", None)
+        if key:
+            with self.__lock:
+                cached = self.__token_counts.get(key)
+                if cached is not None and cached[0] == len(content):
+                    self.__token_counts.move_to_end(key)
+                    return cached[1]
+
+        tokens = _MESSAGE_OVERHEAD + estimate_tokens(content)
+        if getattr(msg, "tool_calls", None):
+            tokens += estimate_tokens(str(msg.tool_calls))
+
+        if key:
+            with self.__lock:
+                self.__token_counts[key] = (len(content), tokens)
+                while len(self.__token_counts) > self.__max_cached_messages:
+                    self.__token_counts.popitem(last=False)
+        return tokens
+
+    # ------------------------------------------------------------
+    # 内部方法：按 parent_id 去重
+    # ------------------------------------------------------------
+    def __deduplicate(self, messages):
+        """返回 (去重后的消息列表, 被别处折叠引用的父文档全文所在的消息位置集合)。"""
+        # 每个 parent_id 最新一份全文所在的消息位置
+        latest_full = {}
+        for i, msg in enumerate(messages):
+            if isinstance(msg, ToolMessage) and msg.name in _PARENT_TOOLS:
+                for block in _BLOCK_SPLIT.split(str(msg.content)):
+                    parent_id = self.__parent_id(block)
+                    if parent_id and "NO_PARENT_DOCUMENT" not in block:
+                        latest_full[parent_id] = i
+
+        canonical = set()
+        if not latest_full:
+            return messages, canonical
+
+        for i, msg in enumerate(messages):
+            if not isinstance(msg, ToolMessage):
+                continue
+            blocks = _BLOCK_SPLIT.split(str(msg.content))
+            kept = []
+            for block in blocks:
+                parent_id = self.__parent_id(block)
+                if parent_id in latest_full and latest_full[parent_id] != i:
+                    canonical.add(latest_full[parent_id])
+                    if msg.name in _PARENT_TOOLS:
+                        kept.append(f"Parent ID: {parent_id}\n[same parent retrieved again later]")
+                    else:
+                        kept.append(f"Parent ID: {parent_id}\n[full parent retrieved]")
+                else:
+                    kept.append(block)
+            if kept != blocks:
+                messages[i] = self.__replace(msg, "\n\n".join(kept))
+        return messages, canonical
+
+    @staticmethod
+    def __parent_id(block):
+        match = _PARENT_ID.search(block)
+        return match.group(1).strip() if match else None
+
+    # ------------------------------------------------------------
+    # 内部方法：生成压缩后的副本
+    # ------------------------------------------------------------
+    def __truncate(self, msg, max_chars):
+        content = str(msg.content)
+        if len(content) <= max_chars:
+            return msg
+        return self.__replace(msg, f"{content[:max_chars]}\n[... truncated {len(content) - max_chars} chars]")
+
+    @staticmethod
+    def __replace(msg, content):
+        # 换一个 ID，避免复用原消息的 token 计数缓存
+        return msg.model_copy(update={"content": content, "id": None})
@@ -14,6 +14,10 @@ from typing import Literal, List
 # 用法：用于 Map-Reduce 模式，把任务分发给多个子图并发执行
 from langgraph.types import Send
 
+# [第三方库] langgraph.graph.END
+# 用法：语义缓存命中时直接结束本轮
+from langgraph.graph import END
+
 # [本项目] .graph_state
 # 作用：引入 State 类用于类型检查
 from .graph_state import State
@@ -39,23 +43,47 @@ def route_after_rewrite(state: State) -> Literal["human_input"] | List[Send]:
         return "human_input"
 
     else:
-        # [核心逻辑] 并行分发 (Map Step)
-        # 情况 B: 问题清晰 -> 返回 Send 对象列表
-        # LangGraph 会根据这个列表，启动 N 个并行的 "process_question" 子图
-
-        # 假设 state["rewrittenQuestions"] 是 ["问题1", "问题2"]
-        # 这里就会生成两个 Send 对象
-        return [
-            # [第三方库] Send(node_name, state)
-            # node: 目标节点名 ("process_question")
-            # arg: 传给该子图的初始状态
-            Send(
-                "process_question",
-                {
-                    "question": query,  # 分配给这个 Agent 的具体问题
-                    "question_index": idx,  # 问题的编号 (方便最后排序汇总)
-                    "messages": []  # 初始化该子图的消息历史为空
-                }
-            )
-            for idx, query in enumerate(state["rewrittenQuestions"])
-        ]
\ No newline at end of file
+        # 情况 B: 问题清晰 -> 并行分发
+        return dispatch_questions(state)
+
+
+def route_to_answer_cache(state: State) -> Literal["human_input", "answer_cache"]:
+    """
+    [函数功能] 启用语义答案缓存时代替 route_after_rewrite：
+    问题清晰时先去 "answer_cache" 节点查缓存，而不是直接分发。
+    """
+    if not state.get("questionIsClear", False):
+        return "human_input"
+    return "answer_cache"
+
+
+def route_after_answer_cache(state: State) -> Literal["__end__"] | List[Send]:
+    """
+    [函数功能] 缓存命中 -> 结束本轮 (答案已经写入 messages)；未命中 -> 照常并行分发
+    """
+    if state.get("cacheHit"):
+        return END
+    return dispatch_questions(state)
+
+
+def dispatch_questions(state: State) -> List[Send]:
+    """
+    [核心逻辑] 并行分发 (Map Step)
+    返回 Send 对象列表，LangGraph 会根据这个列表，启动 N 个并行的 "process_question" 子图
+    """
+    # 假设 state["rewrittenQuestions"] 是 ["问题1", "问题2"]
+    # 这里就会生成两个 Send 对象
+    return [
+        # [第三方库] Send(node_name, state)
+        # node: 目标节点名 ("process_question")
+        # arg: 传给该子图的初始状态
+        Send(
+            "process_question",
+            {
+                "question": query,  # 分配给这个 Agent 的具体问题
+                "question_index": idx,  # 问题的编号 (方便最后排序汇总)
+                "messages": []  # 初始化该子图的消息历史为空
+            }
+        )
+        for idx, query in enumerate(state["rewrittenQuestions"])
+    ]
\ No newline at end of file
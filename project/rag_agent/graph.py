@@ -12,11 +12,14 @@
 # - END: 图的终点（常量）。
 from langgraph.graph import START, END, StateGraph
 
-# [第三方库] langgraph.checkpoint.memory
-# 来源：LangGraph 框架
-# 用法：InMemorySaver 用于把对话历史暂存在内存里。
+# [本项目] .checkpointer
+# 用法：create_checkpointer 按配置返回记忆后端 (默认是持久化、有界、带 TTL 淘汰的 SQLite)。
 # 作用：没有它，AI 聊完上一句就忘了下一句。
-from langgraph.checkpoint.memory import InMemorySaver
+from .checkpointer import create_checkpointer
+
+# [本项目] .context_packer
+# 用法：ContextPacker 把 Agent 每轮的消息历史压进 token 预算 (去重父文档、截断旧的工具输出)。
+from .context_packer import ContextPacker
 
 # [第三方库] langgraph.prebuilt
 # 来源：LangGraph 预置组件
@@ -31,6 +34,12 @@ from langgraph.prebuilt import ToolNode, tools_condition
 # 所以我们用 partial 把 llm 提前"绑"在函数上。
 from functools import partial
 
+# [第三方库] langchain_core.runnables.RunnableLambda
+# 用法：RunnableLambda(同步函数, afunc=异步函数) 把一对函数包装成一个节点。
+# 场景：graph.invoke 调用同步版本，graph.ainvoke / graph.astream 调用异步版本，
+# 同一个图两种方式都能跑。
+from langchain_core.runnables import RunnableLambda
+
 # [本项目] 导入我们自己写的模块
 from .graph_state import State, AgentState  # 数据结构
 from .nodes import *  # 具体的干活节点
@@ -40,9 +49,11 @@ from .edges import *  # 路由逻辑
 # ============================================================
 # 主函数：创建智能体图
 # ============================================================
-def create_agent_graph(llm, tools_list):
+def create_agent_graph(llm, tools_list, answer_cache=None):
     """
     [函数功能] 组装所有的积木，返回一个可执行的 Graph 对象
+    answer_cache: 可选的语义答案缓存 (db.answer_cache.SemanticAnswerCache)，
+    传入时在 analyze_rewrite 之后插入 "查缓存" 节点，在 aggregate 之后插入 "写缓存" 节点。
     """
 
     # [第三方库] llm.bind_tools(tools_list)
@@ -54,8 +65,11 @@ def create_agent_graph(llm, tools_list):
     # 用法：创建一个节点，它真的会去执行上面的 Tool Call，并返回结果。
     tool_node = ToolNode(tools_list)
 
-    # [第三方库] 初始化记忆检查点
-    checkpointer = InMemorySaver()
+    # [本项目] 所有并行子图共用一个打包器 (内部有按消息 ID 的 token 计数缓存)
+    context_packer = ContextPacker()
+
+    # [本项目] 初始化记忆检查点
+    checkpointer = create_checkpointer()
 
     print("Compiling agent graph...")
 
@@ -70,8 +84,11 @@ def create_agent_graph(llm, tools_list):
 
     # [第三方库] add_node(name, function)
     # 用法：往图里添加节点。
-    # 技巧：这里用 partial 把 llm_with_tools 传给了 agent_node 函数
-    agent_builder.add_node("agent", partial(agent_node, llm_with_tools=llm_with_tools))
+    # 技巧：这里用 partial 把 llm_with_tools 传给了 agent_node 函数 (同步 / 异步两个版本)
+    agent_builder.add_node("agent", RunnableLambda(
+        partial(agent_node, llm_with_tools=llm_with_tools, context_packer=context_packer),
+        afunc=partial(aagent_node, llm_with_tools=llm_with_tools, context_packer=context_packer)
+    ))
     agent_builder.add_node("tools", tool_node)
     agent_builder.add_node("extract_answer", extract_final_answer)
 
@@ -112,7 +129,10 @@ def create_agent_graph(llm, tools_list):
     graph_builder = StateGraph(State)
 
     # 添加节点 (引用 nodes.py 里的函数)
-    graph_builder.add_node("summarize", partial(analyze_chat_and_summarize, llm=llm))
+    graph_builder.add_node("summarize", RunnableLambda(
+        partial(analyze_chat_and_summarize, llm=llm),
+        afunc=partial(aanalyze_chat_and_summarize, llm=llm)
+    ))
     graph_builder.add_node("analyze_rewrite", partial(analyze_and_rewrite_query, llm=llm))
     graph_builder.add_node("human_input", human_input_node)
 
@@ -120,23 +140,44 @@ def create_agent_graph(llm, tools_list):
     # 这就是"图中有图" (Nested Graph)。
     graph_builder.add_node("process_question", agent_subgraph)
 
-    graph_builder.add_node("aggregate", partial(aggregate_responses, llm=llm))
+    graph_builder.add_node("aggregate", RunnableLambda(
+        partial(aggregate_responses, llm=llm),
+        afunc=partial(aaggregate_responses, llm=llm)
+    ))
 
     # 定义流程边
     graph_builder.add_edge(START, "summarize")
     graph_builder.add_edge("summarize", "analyze_rewrite")
 
-    # [本项目] route_after_rewrite
-    # 来源：project/rag_agent/edges.py
-    # 用法：这是我们自己写的路由逻辑，决定是"人工介入"还是"并行处理"。
-    graph_builder.add_conditional_edges("analyze_rewrite", route_after_rewrite)
+    if answer_cache is None:
+        # [本项目] route_after_rewrite
+        # 来源：project/rag_agent/edges.py
+        # 用法：这是我们自己写的路由逻辑，决定是"人工介入"还是"并行处理"。
+        graph_builder.add_conditional_edges("analyze_rewrite", route_after_rewrite)
+    else:
+        # 语义答案缓存：analyze_rewrite -> answer_cache -> (命中) END / (未命中) 并行处理
+        graph_builder.add_node("answer_cache", RunnableLambda(
+            partial(lookup_cached_answer, answer_cache=answer_cache),
+            afunc=partial(alookup_cached_answer, answer_cache=answer_cache)
+        ))
+        graph_builder.add_conditional_edges("analyze_rewrite", route_to_answer_cache)
+        graph_builder.add_conditional_edges("answer_cache", route_after_answer_cache)
 
     # 闭环：人工介入后 -> 回到重写节点
     graph_builder.add_edge("human_input", "analyze_rewrite")
 
     # 并行处理完 -> 汇总
     graph_builder.add_edge(["process_question"], "aggregate")
-    graph_builder.add_edge("aggregate", END)
+    if answer_cache is None:
+        graph_builder.add_edge("aggregate", END)
+    else:
+        # 汇总完 -> 写入缓存 -> 结束
+        graph_builder.add_node("store_answer", RunnableLambda(
+            partial(store_answer, answer_cache=answer_cache),
+            afunc=partial(astore_answer, answer_cache=answer_cache)
+        ))
+        graph_builder.add_edge("aggregate", "store_answer")
+        graph_builder.add_edge("store_answer", END)
 
     # [第三方库] compile(checkpointer=..., interrupt_before=...)
     # 用法：
@@ -36,15 +36,25 @@ class State(MessagesState):
     # 标记用户的问题是否清晰（True/False）
     questionIsClear: bool = False
 
-    # 存对话的总结（字符串）
+    # 存对话的总结（字符串）—— 跨轮次保存的"滚动摘要"，每次只合并新增的对话
     conversation_summary: str = ""
 
+    # 滚动摘要已经覆盖到的最后一条消息的 ID (增量总结从它之后开始)
+    summarizedMessageId: str = ""
+
+    # 当前问题是否需要结合上文才能理解 (语义答案缓存只复用不依赖上文的答案)
+    questionNeedsContext: bool = False
+
     # 用户最初始的问题（字符串）
     originalQuery: str = ""
 
     # AI 重写后的问题列表（可能把一个复杂问题拆成了好几个）
     rewrittenQuestions: List[str] = []
 
+    # 语义答案缓存：本轮是否命中 (命中则跳过检索和汇总)，以及本轮开始时的语料版本
+    cacheHit: bool = False
+    corpusVersion: str = ""
+
     # [LangGraph核心概念] Annotated + Reducer
     # 这里的 agent_answers 存放所有智能体查到的答案。
     # 关键在于 Annotated[List[dict], accumulate_or_reset]：
@@ -4,6 +4,13 @@
 # 导入部分
 # ============================================================
 
+# [Python标准库] asyncio / re
+# 用法：
+# - asyncio: 异步版本的缓存节点用 asyncio.to_thread 把查询编码 (可能还要等模型加载) 放到线程里，不阻塞事件循环。
+# - re: 识别"依赖上文"的追问 (代词、指示词、省略主语的短问题)。
+import asyncio
+import re
+
 # [第三方库] langchain_core.messages
 # 来源：LangChain 框架核心库
 # 用法：这些是标准的"消息类"，用来在 Python 代码和大模型之间传递信息。
@@ -23,6 +30,10 @@ from .graph_state import State, AgentState
 # 用法：导入函数来获取长长的提示词字符串，避免把这里代码弄乱。
 from .prompts import *
 
+# [本项目] config
+# 用法：读取对话摘要时单条消息的字数上限 SUMMARY_MESSAGE_MAX_CHARS。
+import config
+
 
 # [修改说明] 已注释掉 QueryAnalysis，因为我们现在采用直通模式，不需要结构化输出检查
 # from .schemas import QueryAnalysis
@@ -31,32 +42,96 @@ from .prompts import *
 # ============================================================
 # 节点 1: analyze_chat_and_summarize (对话总结)
 # ============================================================
-def analyze_chat_and_summarize(state: State, llm):
+# 出现这些词说明问题需要结合上文才能理解 (中英文)
+# "that" 常作关系代词 ("vectors that are quantized")，只有出现在句首时才算指代上文
+_CONTEXT_MARKERS = re.compile(
+    r"^\s*that\b|"
+    r"\b(it|its|this|these|those|they|them|their|he|she|him|her|above|previous|"
+    r"earlier|former|latter|how about|what about)\b|"
+    r"它|他们|她们|它们|这个|那个|这些|那些|这里|那里|上面|上述|前面|刚才|之前|其中|同样|还有|继续|那么|那呢|呢[？?]?$",
+    re.IGNORECASE
+)
+
+
+def _is_self_contained(question: str) -> bool:
+    """
+    [辅助函数] 粗略判断一个问题是否"独立完整"(不需要上文就能理解)。
+    很短的问题 (例如 "为什么？") 或带有代词 / 指示词的问题视为依赖上文。
+    判断偏保守：宁可多总结一次，也不要漏掉上下文。
+    """
+    question = question.strip()
+    if len(question) < 8:
+        return False
+    return not _CONTEXT_MARKERS.search(question)
+
+
+def _build_summary_input(state: State):
     """
-    [节点功能] 总结历史对话
+    [辅助函数] 增量总结：只把"上次总结之后新增的对话"合并进已有摘要。
+    返回 (不依赖 LLM 的状态更新, 发给 LLM 的消息列表或 None)；
+    后者为 None 表示本轮不需要调用 LLM。同步节点和异步节点 (a 开头的版本) 共用这段逻辑。
     """
     # [本项目] state 是一个字典，访问 "messages" 键获取历史记录列表
-    if len(state["messages"]) < 4:
-        return {"conversation_summary": ""}
+    messages = state["messages"]
+
+    # 每一轮开始都清空上一轮子图留下的答案 (无论这一轮是否调用 LLM)。
+    # "__reset__": True 是我们在 graph_state.py 里定义的特殊逻辑。
+    # 当前问题是否依赖上文：语义答案缓存只复用不依赖上文的问题的答案。
+    needs_context = len(messages) > 1 and not _is_self_contained(str(messages[-1].content))
+    update = {"agent_answers": [{"__reset__": True}], "questionNeedsContext": needs_context}
+
+    # 对话太短，或者当前问题不需要上文：跳过这一轮的总结
+    # (新增的对话不会丢，下次需要上文时一起合并)
+    if len(messages) < 4 or not needs_context:
+        return update, None
+
+    # [Python逻辑] 找到上次总结到的位置，只取之后的消息 (不含当前这条提问)
+    # 消息 ID 由 LangGraph 的 add_messages 自动分配；如果标记的消息已被记忆压缩丢弃，就从头开始
+    history = messages[:-1]
+    marker = state.get("summarizedMessageId")
+    ids = [msg.id for msg in history]
+    delta = history[ids.index(marker) + 1:] if marker in ids else history
 
     # [Python标准库] 列表推导式
     # [第三方库] isinstance(obj, Class)
     # 用法：检查 msg 是否属于 HumanMessage 或 AIMessage 类型。
     # 目的：我们只想总结"人机对话"，不想总结"工具调用结果"（ToolMessage），以免干扰 AI。
     relevant_msgs = [
-        msg for msg in state["messages"][:-1]
+        msg for msg in delta
         if isinstance(msg, (HumanMessage, AIMessage))
            and not getattr(msg, "tool_calls", None)  # [第三方库] 检查消息是否包含工具调用请求
     ]
 
     if not relevant_msgs:
-        return {"conversation_summary": ""}
+        return update, None
 
-    # [Python逻辑] 简单的字符串拼接，把对象列表变成一段可读的文本
-    conversation = "Conversation history:\n"
-    for msg in relevant_msgs[-6:]:
+    # [Python逻辑] 简单的字符串拼接：已有摘要 + 上次总结之后的全部新增对话
+    # (跳过总结的那些轮次也在里面；过长的单条消息只保留开头，控制总结调用的输入大小)
+    max_chars = config.SUMMARY_MESSAGE_MAX_CHARS
+    conversation = f"Existing summary:\n{state.get('conversation_summary') or '(none)'}\n\nNew conversation turns:\n"
+    for msg in relevant_msgs:
         role = "User" if isinstance(msg, HumanMessage) else "Assistant"
-        conversation += f"{role}: {msg.content}\n"
+        content = str(msg.content)
+        if len(content) > max_chars:
+            content = content[:max_chars] + " ..."
+        conversation += f"{role}: {content}\n"
+
+    # 总结成功后，标记推进到当前提问之前的最后一条消息 (它之前的新增对话都已经发给了 LLM)
+    update["summarizedMessageId"] = history[-1].id
+
+    # [本项目] 获取提示词字符串
+    prompt_content = get_conversation_summary_prompt()
+
+    return update, [SystemMessage(content=prompt_content)] + [HumanMessage(content=conversation)]
+
+
+def analyze_chat_and_summarize(state: State, llm):
+    """
+    [节点功能] 增量维护对话摘要 (大多数轮次不需要调用 LLM)
+    """
+    update, summary_input = _build_summary_input(state)
+    if summary_input is None:
+        return update
 
     # [第三方库] llm.with_config(temperature=...)
     # 来源：LangChain Runnable 协议
@@ -64,23 +139,16 @@ def analyze_chat_and_summarize(state: State, llm):
     # 目的：这里临时把 temperature 设为 0.2，让 AI 在总结时稍微灵活一点，而不是死板地复述。
     llm_configured = llm.with_config(temperature=0.2)
 
-    # [本项目] 获取提示词字符串
-    prompt_content = get_conversation_summary_prompt()
-
     # [第三方库] llm.invoke(input)
     # 来源：LangChain 核心方法
     # 用法：这是调用大模型最常用的方法！
     # 参数：input 是一个列表，包含 [系统指令, 用户输入]。
     # 返回：一个 AIMessage 对象，content 属性里就是 AI 生成的文本。
-    summary_response = llm_configured.invoke(
-        [SystemMessage(content=prompt_content)] +
-        [HumanMessage(content=conversation)]
-    )
+    summary_response = llm_configured.invoke(summary_input)
 
     # [本项目] 返回字典
-    # LangGraph 会自动把这个字典合并到全局 State 中。
-    # "__reset__": True 是我们在 graph_state.py 里定义的特殊逻辑，用来清空之前的答案。
-    return {"conversation_summary": summary_response.content, "agent_answers": [{"__reset__": True}]}
+    # LangGraph 会自动把这个字典合并到全局 State 中 (conversation_summary 会一直保存在记忆里，供下一轮增量更新)。
+    return {**update, "conversation_summary": summary_response.content}
 
 
 # ============================================================
@@ -127,9 +195,11 @@ def human_input_node(state: State):
 # ============================================================
 # 节点 4: agent_node (执行搜索 Agent)
 # ============================================================
-def agent_node(state: AgentState, llm_with_tools):
+def _build_agent_input(state: AgentState, context_packer=None):
     """
-    [节点功能] ReAct 风格的搜索节点
+    [辅助函数] 构造 ReAct 节点的 LLM 输入
+    返回 (需要新写入历史的消息, 发给 LLM 的消息列表)。
+    context_packer: 可选的 ContextPacker，把后续轮次的历史压进 token 预算 (只影响发给 LLM 的副本)。
     """
     # [本项目] 获取提示词
     sys_msg = SystemMessage(content=get_rag_agent_prompt())
@@ -138,22 +208,32 @@ def agent_node(state: AgentState, llm_with_tools):
     # 检查当前子图（Agent Subgraph）里有没有历史消息。
     if not state.get("messages"):
         # --- 情况 A: 第一次运行 ---
-        # 把要解决的问题 (state["question"]) 包装成 HumanMessage
+        # 把要解决的问题 (state["question"]) 包装成 HumanMessage，它也要存入历史
         human_msg = HumanMessage(content=state["question"])
-
-        # [第三方库] llm_with_tools.invoke(...)
-        # 这里的 llm_with_tools 是一个"绑定了工具"的模型对象。
-        # 用法：和普通的 llm.invoke 一样，但模型现在知道它有权调用 search_child_chunks 等函数。
-        # 结果：如果模型决定查资料，response.tool_calls 属性里会有内容。
-        response = llm_with_tools.invoke([sys_msg] + [human_msg])
-
-        # 返回更新：把用户的提问和 AI 的回答（或工具调用请求）都存入历史
-        return {"messages": [human_msg, response]}
+        return [human_msg], [sys_msg] + [human_msg]
 
     # --- 情况 B: 后续运行 (工具已经执行完了) ---
     # 这时 state["messages"] 里已经有了：[用户问, AI想查, 工具返回的结果]
     # 我们再次调用 LLM，让它看到工具返回的结果，继续思考。
-    return {"messages": [llm_with_tools.invoke([sys_msg] + state["messages"])]}
+    # 每一轮都会重发之前所有的检索结果，历史越长越贵，所以先按 token 预算打包 (系统提示词也计入预算，但不会被改动)。
+    llm_input = [sys_msg] + state["messages"]
+    return [], context_packer.pack(llm_input) if context_packer else llm_input
+
+
+def agent_node(state: AgentState, llm_with_tools, context_packer=None):
+    """
+    [节点功能] ReAct 风格的搜索节点
+    """
+    new_messages, llm_input = _build_agent_input(state, context_packer)
+
+    # [第三方库] llm_with_tools.invoke(...)
+    # 这里的 llm_with_tools 是一个"绑定了工具"的模型对象。
+    # 用法：和普通的 llm.invoke 一样，但模型现在知道它有权调用 search_child_chunks 等函数。
+    # 结果：如果模型决定查资料，response.tool_calls 属性里会有内容。
+    response = llm_with_tools.invoke(llm_input)
+
+    # 返回更新：把（第一次运行时的）用户提问和 AI 的回答（或工具调用请求）都存入历史
+    return {"messages": new_messages + [response]}
 
 
 # ============================================================
@@ -195,12 +275,12 @@ def extract_final_answer(state: AgentState):
 # ============================================================
 # 节点 6: aggregate_responses (聚合回答)
 # ============================================================
-def aggregate_responses(state: State, llm):
+def _build_aggregation_input(state: State):
     """
-    [节点功能] 将多个搜索结果汇总成一段话
+    [辅助函数] 构造汇总节点的 LLM 输入；没有任何答案时返回 None。
     """
     if not state.get("agent_answers"):
-        return {"messages": [AIMessage(content="No answers were generated.")]}
+        return None
 
     # [Python标准库] sorted(...)
     # 用法：按索引对答案排序，确保回答顺序和问题顺序一致
@@ -218,11 +298,103 @@ def aggregate_responses(state: State, llm):
     user_message = HumanMessage(
         content=f"""Original user question: {state["originalQuery"]}\nRetrieved answers:{formatted_answers}""")
 
+    return [SystemMessage(content=sys_prompt)] + [user_message]
+
+
+def aggregate_responses(state: State, llm):
+    """
+    [节点功能] 将多个搜索结果汇总成一段话
+    """
+    aggregation_input = _build_aggregation_input(state)
+    if aggregation_input is None:
+        return {"messages": [AIMessage(content="No answers were generated.")]}
+
     # [第三方库] llm.invoke(...)
     # 用法：让 LLM 阅读所有搜索到的片段，写一篇漂亮的总结。
-    synthesis_response = llm.invoke(
-        [SystemMessage(content=sys_prompt)] +
-        [user_message]
-    )
+    synthesis_response = llm.invoke(aggregation_input)
+
+    # 直接返回 LLM 的消息 (带 id)：流式输出时 LangGraph 用 id 识别出它就是刚刚逐 token 推送过的那条，不会再推一遍
+    return {"messages": [synthesis_response]}
+
+
+# ============================================================
+# 节点 7: lookup_cached_answer (语义答案缓存 - 查找)
+# ============================================================
+def _cache_query(state: State):
+    """
+    [辅助函数] 缓存键 = 重写后的问题 (多个子问题按行拼接)。
+    问题依赖上文时返回 None (例如 "那第二个呢？")，这种答案不能跨会话复用。
+    """
+    if state.get("questionNeedsContext") or not state.get("rewrittenQuestions"):
+        return None
+    return "\n".join(state["rewrittenQuestions"])
+
+
+def lookup_cached_answer(state: State, answer_cache):
+    """
+    [节点功能] 查找语义相近的旧问题；命中时直接把旧答案作为本轮回复，跳过检索和汇总
+    """
+    # 记下本轮开始时的语料版本，store_answer 用它判断答案生成期间语料有没有变化
+    version = answer_cache.corpus_version()
+    query = _cache_query(state)
+    answer = answer_cache.lookup(query) if query else None
+    if answer is None:
+        return {"cacheHit": False, "corpusVersion": version}
+    return {"cacheHit": True, "corpusVersion": version, "messages": [AIMessage(content=answer)]}
+
+
+# ============================================================
+# 节点 8: store_answer (语义答案缓存 - 写入)
+# ============================================================
+def store_answer(state: State, answer_cache):
+    """
+    [节点功能] 把本轮汇总出的答案写入缓存 (只缓存所有子问题都回答成功的答案)
+    """
+    query = _cache_query(state)
+    answers = [ans for ans in state.get("agent_answers", []) if "answer" in ans]
+    if not query or not answers or any(ans["answer"] == "Unable to generate an answer." for ans in answers):
+        return {}
+
+    answer_cache.store(query, state["messages"][-1].content, version=state.get("corpusVersion") or None)
+    return {}
+
+
+# ============================================================
+# 异步版本 (async)
+# ============================================================
+# 与上面的同步节点逻辑完全相同，只是把 llm.invoke 换成 await llm.ainvoke。
+# 用 graph.ainvoke / graph.astream 运行时，LangGraph 会调用这些版本：
+# LLM 的网络等待不再占用线程，并行分发的多个 process_question 子图可以真正同时等待各自的 LLM 响应。
+# 没有异步版本的节点会直接在事件循环上运行，所以会做 CPU 计算的缓存节点也要有异步版本。
+
+async def aanalyze_chat_and_summarize(state: State, llm):
+    update, summary_input = _build_summary_input(state)
+    if summary_input is None:
+        return update
+
+    summary_response = await llm.with_config(temperature=0.2).ainvoke(summary_input)
+    return {**update, "conversation_summary": summary_response.content}
+
+
+async def aagent_node(state: AgentState, llm_with_tools, context_packer=None):
+    new_messages, llm_input = _build_agent_input(state, context_packer)
+    response = await llm_with_tools.ainvoke(llm_input)
+    return {"messages": new_messages + [response]}
+
+
+async def aaggregate_responses(state: State, llm):
+    aggregation_input = _build_aggregation_input(state)
+    if aggregation_input is None:
+        return {"messages": [AIMessage(content="No answers were generated.")]}
+
+    synthesis_response = await llm.ainvoke(aggregation_input)
+    return {"messages": [synthesis_response]}
+
+
+async def alookup_cached_answer(state: State, answer_cache):
+    # 查询编码 (以及模型还在预热时的等待) 放到线程里，其他会话的请求照常处理
+    return await asyncio.to_thread(lookup_cached_answer, state, answer_cache)
+
 
-    return {"messages": [AIMessage(content=synthesis_response.content)]}
\ No newline at end of file
+async def astore_answer(state: State, answer_cache):
+    return await asyncio.to_thread(store_answer, state, answer_cache)
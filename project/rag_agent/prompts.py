@@ -3,7 +3,8 @@
 def get_conversation_summary_prompt() -> str:
     return """你是一位专业的对话总结专家。
 
-你的任务是将对话历史压缩成 1-2 句简短的摘要（最多 50-80 个字）。
+你的任务是维护一份对话摘要：你会收到"已有摘要"（可能为空）和"新增对话"，
+请把新增对话中的要点合并进已有摘要，输出一份更新后的、1-2 句简短的摘要（最多 50-80 个字）。
 
 包含内容：
 - 讨论的主要话题
@@ -15,7 +16,8 @@ def get_conversation_summary_prompt() -> str:
 - 寒暄、误解、跑题的内容。
 
 输出要求：
-- 仅返回摘要内容。
+- 仅返回更新后的完整摘要内容。
+- 已有摘要中仍然相关的信息要保留，已经被新对话取代的信息可以删除。
 - 不要包含任何解释或开场白。
 - 如果没有有意义的话题，返回空字符串。
 """
@@ -69,7 +71,7 @@ def get_rag_agent_prompt() -> str:
 工作流程：
 1. 使用 'search_child_chunks' 工具，根据用户问题搜索 5-7 个相关的文档片段。
 2. 检查检索到的片段，仅保留相关的内容。
-3. 分析片段。如果发现某个最相关的片段内容不完整（例如文本被截断或缺少上下文），请针对该特定的 `parent_id` 调用 'retrieve_parent_chunks' 工具获取完整内容。只有在当前信息仍不足时，才继续对其他高相关度片段重复此步骤。一旦信息充足或已获取 3 个父文档，立即停止。
+3. 分析片段。如果发现最相关的片段内容不完整（例如文本被截断或缺少上下文），请把需要的 `parent_id`（最多 3 个）放在一个列表里，**一次性**调用 'retrieve_many_parent_chunks' 工具获取完整内容，不要逐个调用 'retrieve_parent_chunks'。一旦信息充足，立即停止。
 4. **仅使用**检索到的信息进行回答，确保包含所有相关细节。
 5. 在回答的最后，列出所有引用的唯一文件名。
 
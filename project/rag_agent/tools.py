@@ -20,6 +20,10 @@ from langchain_core.tools import tool
 # 用法：导入父文档管理器，用于根据 ID 读取存硬盘上的大段文本。
 from db.parent_store_manager import ParentStoreManager
 
+# [本项目] config
+# 用法：读取重排序的过采样倍数 RERANK_OVERFETCH。
+import config
+
 
 # ============================================================
 # 类定义: ToolFactory (工具工厂)
@@ -30,21 +34,27 @@ class ToolFactory:
     为什么要写成类？因为我们需要注入 collection (向量库连接) 和 parent_store_manager (文件存储连接)。
     """
 
-    def __init__(self, collection):
-        # [本项目] collection 是从 VectorDbManager 传进来的 Qdrant 集合对象
+    def __init__(self, collection, parent_store_manager=None, reranker=None):
+        # [本项目] collection 是从 VectorDbManager 传进来的检索器 (HybridSearcher，也兼容 QdrantVectorStore)
         self.collection = collection
-        # [本项目] 实例化父文档管理器
-        self.parent_store_manager = ParentStoreManager()
+        # [本项目] 父文档管理器
+        # 优先复用 RAGSystem 里的同一个实例，这样入库时新写入的父文档可以立刻被检索到
+        # 注意要用 is None 判断：空的存储 (刚安装、或 clear_store 之后) 也是一个有效实例
+        self.parent_store_manager = parent_store_manager if parent_store_manager is not None else ParentStoreManager()
+        # [本项目] 可选的交叉编码器重排序 (db/reranker.py)，为 None 时直接使用混合检索的排序
+        self.reranker = reranker
 
     # ------------------------------------------------------------
     # 内部函数：搜索子文档 (Search Child Chunks)
     # ------------------------------------------------------------
-    def _search_child_chunks(self, query: str, limit: int) -> str:
+    def _search_child_chunks(self, query: str, limit: int, retrieval_mode: str = "auto") -> str:
         """Search for the top K most relevant child chunks.
 
         Args:
             query: Search query string
             limit: Maximum number of results to return
+            retrieval_mode: "auto" (default), "sparse" for exact identifiers such as part numbers or error codes,
+                "dense" for purely semantic questions, or "hybrid"
         """
         try:
             # [第三方库] collection.similarity_search(...)
@@ -54,12 +64,19 @@ class ToolFactory:
             # - query: 用户的问题（会自动转成向量）。
             # - k: 返回几条结果。
             # - score_threshold: 相似度阈值（0.7），太不相关的不要。
-            results = self.collection.similarity_search(query, k=limit, score_threshold=0.7)
+            # 启用重排序时先多取一些候选 (过采样)，再交给交叉编码器挑出最相关的 limit 个
+            fetch_k = limit * config.RERANK_OVERFETCH if self.reranker else limit
+            # - mode: 检索模式，"auto" 时由路由器决定 (编号类短查询走 sparse 快速通道)
+            search_kwargs = {} if retrieval_mode == "auto" else {"mode": retrieval_mode}
+            results = self.collection.similarity_search(query, k=fetch_k, score_threshold=0.7, **search_kwargs)
 
             # [逻辑] 如果没查到
             if not results:
                 return "NO_RELEVANT_CHUNKS"
 
+            if self.reranker:
+                results = [doc for doc, _ in self.reranker.rerank(query, results, top_k=limit)]
+
             # [Python逻辑] 格式化输出
             # 把查到的 Document 对象列表转换成一个清晰的字符串，方便 LLM 阅读。
             return "\n\n".join([
@@ -84,7 +101,7 @@ class ToolFactory:
         try:
             # [本项目] self.parent_store_manager.load_content(...)
             # 来源：project/db/parent_store_manager.py
-            # 用法：去硬盘上读取那个 JSON 文件，获取完整的大段内容。
+            # 用法：按索引从 mmap 的段文件里读出完整的大段内容。
             parent = self.parent_store_manager.load_content(parent_id)
 
             # [逻辑] 如果文件找不到
@@ -92,15 +109,52 @@ class ToolFactory:
                 return "NO_PARENT_DOCUMENT"
 
             # [Python逻辑] 格式化输出
-            return (
-                f"Parent ID: {parent.get('parent_id', 'n/a')}\n"
-                f"File Name: {parent.get('metadata', {}).get('source', 'unknown')}\n"
-                f"Content: {parent.get('content', '').strip()}"
-            )
+            return self._format_parent(parent_id, parent)
 
         except Exception as e:
             return f"PARENT_RETRIEVAL_ERROR: {str(e)}"
 
+    # ------------------------------------------------------------
+    # 内部函数：批量获取父文档 (Retrieve Many Parent Chunks)
+    # ------------------------------------------------------------
+    def _retrieve_many_parent_chunks(self, parent_ids: List[str]) -> str:
+        """Retrieve several full parent chunks in one call.
+
+        Args:
+            parent_ids: List of parent chunk IDs to retrieve (duplicates are ignored)
+        """
+        try:
+            # [逻辑] 去重但保持顺序，LLM 经常会把同一个 ID 列两遍
+            unique_ids = list(dict.fromkeys(pid.strip() for pid in parent_ids if pid and pid.strip()))
+            if not unique_ids:
+                return "NO_PARENT_DOCUMENT"
+
+            # [本项目] self.parent_store_manager.load_many(...)
+            # 用法：一次批量读取 (先查缓存，未命中的按段内偏移顺序读)，省去多轮工具调用。
+            parents = self.parent_store_manager.load_many(unique_ids)
+
+            return "\n\n".join([
+                self._format_parent(pid, parents[pid]) if parents.get(pid)
+                else f"Parent ID: {pid}\nNO_PARENT_DOCUMENT"
+                for pid in unique_ids
+            ])
+
+        except Exception as e:
+            return f"PARENT_RETRIEVAL_ERROR: {str(e)}"
+
+    # ------------------------------------------------------------
+    # 内部函数：格式化单个父文档
+    # ------------------------------------------------------------
+    @staticmethod
+    def _format_parent(parent_id: str, parent: dict) -> str:
+        # 父文档存储里的结构是 {"page_content": ..., "metadata": {...}}
+        metadata = parent.get('metadata', {})
+        return (
+            f"Parent ID: {metadata.get('parent_id', parent_id)}\n"
+            f"File Name: {metadata.get('source', 'unknown')}\n"
+            f"Content: {parent.get('page_content', '').strip()}"
+        )
+
     # ------------------------------------------------------------
     # 公开方法：创建工具列表
     # ------------------------------------------------------------
@@ -120,5 +174,12 @@ class ToolFactory:
         retrieve_tool = tool("retrieve_parent_chunks")(self._retrieve_parent_chunks)
         retrieve_tool.description = "Retrieve full parent chunks by their IDs."
 
+        # 批量版本：一次工具调用取回多个父文档，减少 ReAct 循环里的 LLM 往返次数
+        retrieve_many_tool = tool("retrieve_many_parent_chunks")(self._retrieve_many_parent_chunks)
+        retrieve_many_tool.description = (
+            "Retrieve several full parent chunks in one call. "
+            "Prefer this over calling retrieve_parent_chunks repeatedly."
+        )
+
         # 返回列表，这个列表会被传递给 graph.py 里的 llm.bind_tools()
-        return [search_tool, retrieve_tool]
\ No newline at end of file
+        return [search_tool, retrieve_tool, retrieve_many_tool]
\ No newline at end of file
@@ -0,0 +1,131 @@
+# project/tests/test_parent_store_manager.py
+# 运行 (在 project/ 目录下)：python -m unittest tests.test_parent_store_manager
+
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from db.parent_store_manager import ParentStoreManager
+
+
+class _Doc:
+    def __init__(self, page_content, metadata):
+        self.page_content = page_content
+        self.metadata = metadata
+
+
+def _open(path, **kwargs):
+    kwargs.setdefault("cache_max_entries", 0)
+    return ParentStoreManager(store_path=path, **kwargs)
+
+
+class ParentStoreManagerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.__tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.__tmp.name) / "store"
+
+    def tearDown(self):
+        self.__tmp.cleanup()
+
+    def test_round_trip_after_reopen(self):
+        store = _open(self.path, segment_max_bytes=64)
+        store.save_many([(f"p{i}", _Doc(f"内容 {i} " * 5, {"source": "a.pdf", "i": i})) for i in range(20)])
+        store.save("p3", "replaced", {"source": "a.pdf"})
+        store.delete_many(["p5"])
+
+        reopened = _open(self.path, segment_max_bytes=64)
+        self.assertEqual(len(reopened), 19)
+        self.assertEqual(reopened.load("p0"), {"page_content": "内容 0 " * 5, "metadata": {"source": "a.pdf", "i": 0}})
+        self.assertEqual(reopened.load("p3")["page_content"], "replaced")
+        self.assertIsNone(reopened.load("p5"))
+        self.assertEqual(list(reopened.load_many(["p19", "p5", "p1"])), ["p19", "p5", "p1"])
+        self.assertGreater(len(list(self.path.glob("segment_*.dat"))), 1)
+
+    def test_truncated_index_tail_is_recovered(self):
+        store = _open(self.path)
+        store.save_many([(f"p{i}", _Doc(f"text {i}", {})) for i in range(3)])
+        index_path = self.path / "index.bin"
+        complete = index_path.stat().st_size
+        store.save("p3", "last", {})
+
+        # 模拟写最后一条索引记录时崩溃：只留下半条
+        os.truncate(index_path, complete + 7)
+
+        recovered = _open(self.path)
+        self.assertEqual(len(recovered), 3)
+        self.assertIsNone(recovered.load("p3"))
+        self.assertEqual(recovered.load("p2")["page_content"], "text 2")
+
+        # 之后的写入不能接在半条记录后面
+        recovered.save("p4", "after crash", {})
+        reopened = _open(self.path)
+        self.assertEqual(sorted(reopened.load_many([f"p{i}" for i in range(5)]).items())[-1],
+                         ("p4", {"page_content": "after crash", "metadata": {}}))
+        self.assertEqual(len(reopened), 4)
+
+    def test_index_entry_without_segment_data_is_ignored(self):
+        store = _open(self.path)
+        store.save("p0", "kept", {})
+        store.save("p1", "lost", {})
+        segment = next(self.path.glob("segment_*.dat"))
+        # 模拟段文件数据没有完整落盘
+        os.truncate(segment, segment.stat().st_size - 2)
+
+        recovered = _open(self.path)
+        self.assertEqual(recovered.load("p0")["page_content"], "kept")
+        self.assertIsNone(recovered.load("p1"))
+
+    def test_compaction_reclaims_overwritten_records(self):
+        store = _open(self.path, compact_min_bytes=1000, compact_dead_ratio=0.5)
+        for round_ in range(10):
+            store.save_many([(f"p{i}", _Doc(f"round {round_} " + "x" * 100, {})) for i in range(10)])
+        store.delete_many(["p9"])
+
+        stats = store.storage_stats()
+        self.assertLess(stats["dead_bytes"], 1000 + stats["live_bytes"])
+        self.assertLess(sum(p.stat().st_size for p in self.path.glob("segment_*.dat")), 5 * stats["live_bytes"])
+
+        reopened = _open(self.path)
+        self.assertEqual(len(reopened), 9)
+        self.assertTrue(reopened.load("p0")["page_content"].startswith("round 9 "))
+        self.assertIsNone(reopened.load("p9"))
+
+        # 压缩后继续追加 / 读取
+        reopened.save("p10", "new", {})
+        self.assertEqual(_open(self.path).load("p10")["page_content"], "new")
+
+    def test_second_instance_sees_compaction(self):
+        writer = _open(self.path, compact_min_bytes=1 << 40)
+        reader = _open(self.path)
+        writer.save_many([(f"p{i}", _Doc(f"v1 {i}", {})) for i in range(5)])
+        self.assertEqual(reader.load("p1")["page_content"], "v1 1")
+
+        writer.save_many([(f"p{i}", _Doc(f"v2 {i}", {})) for i in range(5)])
+        writer.compact()
+        writer.save("p5", "after compaction", {})
+        self.assertEqual(len(list(self.path.glob("segment_*.dat"))), 1)
+        # 索引文件被替换 (inode 变了)：reader 查不到新 ID 时从头重新读入，旧段上的位置一并换掉
+        self.assertEqual(reader.load("p5")["page_content"], "after compaction")
+        self.assertEqual(reader.load("p2")["page_content"], "v2 2")
+
+    def test_overwrite_during_read_does_not_cache_stale_parent(self):
+        store = ParentStoreManager(store_path=self.path)
+        store.save("p0", "old", {})
+        read = store._ParentStoreManager__read
+
+        def read_then_overwrite(*location):
+            data = read(*location)
+            # 查到旧位置之后、写缓存之前，重新入库覆盖了同一个 ID
+            store._ParentStoreManager__read = read
+            store.save("p0", "new", {})
+            return data
+
+        store._ParentStoreManager__read = read_then_overwrite
+        store.load("p0")
+        self.assertEqual(store.load("p0")["page_content"], "new")
+
+
+if __name__ == "__main__":
+    unittest.main()
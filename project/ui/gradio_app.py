@@ -1,6 +1,8 @@
 import gradio as gr
+import config
 from core.chat_interface import ChatInterface
 from core.document_manager import DocumentManager
+from core.ingestion_jobs import IngestionJobQueue
 from core.rag_system import RAGSystem
 
 def create_gradio_ui():
@@ -8,6 +10,8 @@ def create_gradio_ui():
     rag_system.initialize()
     
     doc_manager = DocumentManager(rag_system)
+    # Uploads are ingested by background workers; handlers only enqueue and poll, so a page refresh loses nothing
+    job_queue = IngestionJobQueue(doc_manager)
     chat_interface = ChatInterface(rag_system)
     
     def format_file_list():
@@ -16,34 +20,78 @@ def create_gradio_ui():
             return "📭 No documents available in the knowledge base"
         return "\n".join([f"{f}" for f in files])
     
-    def upload_handler(files, progress=gr.Progress()):
+    def format_duration(seconds):
+        minutes, seconds = divmod(int(seconds), 60)
+        return f"{minutes}m {seconds:02d}s" if minutes else f"{seconds}s"
+    
+    def format_jobs():
+        jobs = job_queue.list_jobs()
+        if not jobs:
+            return "No ingestion jobs yet"
+        icons = {"queued": "🕒", "running": "⏳", "done": "✅", "failed": "❌", "cancelled": "🚫"}
+        lines = []
+        for job in jobs:
+            line = (
+                f"{icons[job['state']]} {job['id']}  {job['state']}  "
+                f"{job['total'] - job['pending'] - job['running']}/{job['total']} files "
+                f"(added {job['added']}, skipped {job['skipped']}, failed {job['failed']}, cancelled {job['cancelled']})"
+            )
+            if job["current"]:
+                line += f" · processing {', '.join(job['current'])}"
+            if job["eta"] is not None:
+                line += f" · ETA {format_duration(job['eta'])}"
+            elif job["state"] not in ("queued", "running"):
+                line += f" · took {format_duration(job['elapsed'])}"
+            lines.append(line)
+            lines.extend(f"    ⚠️ {name}: {error}" for name, error in job["errors"].items())
+        return "\n".join(lines)
+    
+    def upload_handler(files):
         if not files:
-            return None, format_file_list()
+            return None, format_file_list(), format_jobs()
             
-        added, skipped = doc_manager.add_documents(
-            files, 
-            progress_callback=lambda p, desc: progress(p, desc=desc)
-        )
+        job_id = job_queue.enqueue(files)
         
-        gr.Info(f"✅ Added: {added} | Skipped: {skipped}")
-        return None, format_file_list()
+        gr.Info(f"📥 Queued {len(files)} files (job {job_id})")
+        return None, format_file_list(), format_jobs()
+    
+    def refresh_handler():
+        return format_file_list(), format_jobs()
+    
+    def cancel_jobs_handler():
+        cancelled = job_queue.cancel_all()
+        gr.Info(f"🚫 Cancelled {cancelled} pending files")
+        return format_jobs()
+    
+    def retry_jobs_handler():
+        retried = job_queue.retry()
+        gr.Info(f"🔁 Re-queued {retried} failed or cancelled files")
+        return format_jobs()
     
     def clear_handler():
+        # Stop queued ingestion and let in-flight files finish, so nothing is written into the cleared index
+        job_queue.cancel_all(wait=True, timeout=config.INGEST_JOB_CLEAR_TIMEOUT)
+        if job_queue.active():
+            gr.Warning(f"⏳ {job_queue.active()} files are still being ingested; try clearing again when they finish")
+            return format_file_list(), format_jobs()
         doc_manager.clear_all()
         gr.Info(f"🗑️ Removed all documents")
-        return format_file_list()
+        return format_file_list(), format_jobs()
     
-    def chat_handler(msg, hist):
-        return chat_interface.chat(msg, hist)
+    async def chat_handler(msg, hist, request: gr.Request):
+        # session_hash is unique per browser tab, so concurrent users get separate conversation threads.
+        # Async handler: sub-question agents wait on the LLM concurrently on Gradio's event loop instead of a worker thread each
+        async for text in chat_interface.achat_stream(msg, hist, session_id=request.session_hash):
+            yield text
     
-    def clear_chat_handler():
-        chat_interface.clear_session()
+    def clear_chat_handler(request: gr.Request):
+        chat_interface.clear_session(session_id=request.session_hash)
     
     with gr.Blocks(title="Agentic RAG") as demo:
         
         with gr.Tab("Documents", elem_id="doc-management-tab"):
             gr.Markdown("## Add New Documents")
-            gr.Markdown("Upload PDF or Markdown files. Duplicates will be automatically skipped.")
+            gr.Markdown("Upload PDF or Markdown files. Unchanged files are skipped; updated files are re-indexed.")
             
             files_input = gr.File(
                 label="Drop PDF or Markdown files here",
@@ -55,6 +103,19 @@ def create_gradio_ui():
             
             add_btn = gr.Button("Add Documents", variant="primary", size="md")
             
+            gr.Markdown("## Ingestion Jobs")
+            jobs_box = gr.Textbox(
+                value=format_jobs(),
+                interactive=False,
+                lines=4,
+                max_lines=12,
+                show_label=False
+            )
+            
+            with gr.Row():
+                cancel_jobs_btn = gr.Button("Cancel Pending", size="md")
+                retry_jobs_btn = gr.Button("Retry Failed", size="md")
+            
             gr.Markdown("## Current Documents in the Knowledge Base")
             file_list = gr.Textbox(
                 value=format_file_list(),
@@ -72,11 +133,16 @@ def create_gradio_ui():
             add_btn.click(
                 upload_handler, 
                 [files_input], 
-                [files_input, file_list], 
+                [files_input, file_list, jobs_box], 
                 show_progress="corner"
             )
-            refresh_btn.click(format_file_list, None, file_list)
-            clear_btn.click(clear_handler, None, file_list)
+            refresh_btn.click(refresh_handler, None, [file_list, jobs_box])
+            clear_btn.click(clear_handler, None, [file_list, jobs_box])
+            cancel_jobs_btn.click(cancel_jobs_handler, None, jobs_box)
+            retry_jobs_btn.click(retry_jobs_handler, None, jobs_box)
+            
+            # Poll job progress while the page is open
+            gr.Timer(2).tick(refresh_handler, None, [file_list, jobs_box], show_progress="hidden")
         
         with gr.Tab("Chat"):
             chatbot = gr.Chatbot(
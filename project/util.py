@@ -29,6 +29,14 @@ from pathlib import Path
 # 用法：用于文件查找，比如找到文件夹下所有的 "*.pdf"。
 import glob
 
+# [Python标准库] multiprocessing / time
+# 用法：多进程并行转换。pymupdf4llm 是单线程的纯 CPU 任务，只有多进程才能吃满多核。
+# - multiprocessing.connection.wait: 同时等待多个 worker 的结果管道和进程退出信号。
+# - time.monotonic: 计算单个文件的超时。
+import multiprocessing
+from multiprocessing.connection import wait
+import time
+
 # [配置] 禁用 Tokenizers 并行
 # 当你在多进程环境中使用 HuggingFace 的 tokenizers 库时，如果不关掉这个，经常会报死锁警告。
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
@@ -37,59 +45,188 @@ os.environ["TOKENIZERS_PARALLELISM"] = "false"
 # ============================================================
 # 函数: 单个 PDF 转 Markdown
 # ============================================================
-def pdf_to_markdown(pdf_path, output_dir):
+def pdf_to_markdown(pdf_path, output_dir, page_window: int = None):
     """
     将单个 PDF 文件转换为 Markdown 文件并保存。
+
+    按页窗口流式转换：每次只转换 page_window 页并立即写盘，
+    内存峰值与窗口大小成正比，而不是与整本文档成正比。
+    page_window 默认读取 config.PDF_STREAM_PAGE_WINDOW；为 0 时一次转换整本文档。
     """
-    # [第三方库] 打开 PDF 文件
-    doc = pymupdf.open(pdf_path)
-
-    # [第三方库] 核心转换逻辑
-    # pymupdf4llm.to_markdown 会分析页面布局，尽量保留表格结构和标题层级。
-    # - ignore_images=True: 我们只关注文本内容，忽略图片（为了节省 Token）。
-    # - write_images=False: 不把图片提取存盘。
-    md = pymupdf4llm.to_markdown(
-        doc,
-        header=False,
-        footer=False,
-        page_separators=True,  # 保留分页符，方便以后回溯页码
-        ignore_images=True,
-        write_images=False,
-        image_path=None
-    )
+    page_window = config.PDF_STREAM_PAGE_WINDOW if page_window is None else page_window
+
+    # [第三方库] 打开 PDF 文件 (with 语句保证转换结束后释放文档)
+    with pymupdf.open(pdf_path) as doc:
+        page_count = doc.page_count
+        page_window = page_window or page_count or 1
+
+        # [Python逻辑] 构造输出路径
+        # 例如: output_dir/report.pdf -> output_dir/report.md
+        output_path = (Path(output_dir) / Path(doc.name).stem).with_suffix(".md")
+        # 先写临时文件，全部成功后再改名；中途失败不会留下半截的 .md (否则下次会被当成"已存在"而跳过)
+        partial_path = output_path.with_suffix(".md.part")
+
+        # [Python逻辑] 编码清洗 (单次完成)
+        # PDF 中偶尔会出现孤立的 UTF-16 代理字符，无法编码成 UTF-8。
+        # errors='ignore' 在写入时直接丢弃这些字符，效果等同于原来的 surrogatepass 编码 + ignore 解码，
+        # 但不再额外生成两份完整文本的拷贝。newline="" 保证换行符原样写出。
+        try:
+            with open(partial_path, "w", encoding="utf-8", errors="ignore", newline="") as out:
+                for start in range(0, page_count, page_window):
+                    # [第三方库] 核心转换逻辑
+                    # pymupdf4llm.to_markdown 会分析页面布局，尽量保留表格结构和标题层级。
+                    # - pages: 只转换当前窗口内的页 (0 开始的页码)。
+                    # - ignore_images=True: 我们只关注文本内容，忽略图片（为了节省 Token）。
+                    # - write_images=False: 不把图片提取存盘。
+                    out.write(pymupdf4llm.to_markdown(
+                        doc,
+                        pages=list(range(start, min(start + page_window, page_count))),
+                        header=False,
+                        footer=False,
+                        page_separators=True,  # 保留分页符，方便以后回溯页码
+                        ignore_images=True,
+                        write_images=False,
+                        image_path=None
+                    ))
+            partial_path.replace(output_path)
+        finally:
+            partial_path.unlink(missing_ok=True)
+
+
+# ============================================================
+# 多进程转换: worker 进程
+# ============================================================
+def _conversion_worker(conn, output_dir):
+    """
+    [子进程入口] 常驻的转换进程：从管道接收 PDF 路径，转换后把结果发回去。
+    单个文件出错只回报错误信息，不会让整个进程退出。
+    """
+    while True:
+        pdf_path = conn.recv()
+        if pdf_path is None:
+            break
+        try:
+            pdf_to_markdown(pdf_path, output_dir)
+            conn.send((pdf_path, None))
+        except Exception as e:
+            conn.send((pdf_path, f"{type(e).__name__}: {e}"))
 
-    # [Python逻辑] 编码清洗
-    # 这一步是为了防止 PDF 中包含一些生僻的 Unicode 字符导致写入文件时报错。
-    # 'surrogatepass' 允许处理代理对字符，'ignore' 忽略无法解码的垃圾字符。
-    md_cleaned = md.encode('utf-8', errors='surrogatepass').decode('utf-8', errors='ignore')
 
-    # [Python逻辑] 构造输出路径
-    # 例如: output_dir/report.pdf -> output_dir/report
-    output_path = Path(output_dir) / Path(doc.name).stem
+def _start_worker(ctx, output_dir):
+    parent_conn, child_conn = ctx.Pipe()
+    proc = ctx.Process(target=_conversion_worker, args=(child_conn, str(output_dir)), daemon=True)
+    proc.start()
+    child_conn.close()
+    return {"proc": proc, "conn": parent_conn, "task": None, "started": 0.0}
 
-    # [Python逻辑] 写入文件
-    # .with_suffix(".md") 确保后缀是 .md
-    Path(output_path).with_suffix(".md").write_bytes(md_cleaned.encode('utf-8'))
+
+def _stop_worker(worker, kill=False):
+    if kill:
+        worker["proc"].terminate()
+    else:
+        try:
+            worker["conn"].send(None)
+        except (BrokenPipeError, OSError):
+            pass
+    worker["proc"].join(timeout=5)
+    worker["conn"].close()
+
+
+# ============================================================
+# 多进程转换: 调度器
+# ============================================================
+def _convert_in_pool(pdf_paths, output_dir, workers, timeout, on_done):
+    """
+    [调度逻辑] 把 PDF 分发给 N 个常驻 worker 进程。
+    - 超时: 超过 timeout 秒的文件直接杀掉它所在的进程，再补一个新的 worker。
+    - 崩溃: worker 进程意外退出 (比如 MuPDF 段错误) 时，只记这一个文件失败。
+    on_done(pdf_path, error) 在每个文件结束时回调，error 为 None 表示成功。
+    """
+    # [关键] 使用 spawn 而不是 fork：主进程里已经加载了 torch / tokenizers 的线程池，fork 之后容易死锁
+    ctx = multiprocessing.get_context("spawn")
+    pending = list(pdf_paths)
+    pool = [_start_worker(ctx, output_dir) for _ in range(min(workers, len(pending)))]
+
+    try:
+        while pending or any(w["task"] for w in pool):
+            # 1. 给空闲的 worker 派活
+            for w in pool:
+                if w["task"] is None and pending:
+                    w["task"] = pending.pop(0)
+                    w["started"] = time.monotonic()
+                    w["conn"].send(str(w["task"]))
+
+            busy = [w for w in pool if w["task"]]
+            deadline = min(w["started"] + timeout for w in busy) if timeout else None
+            wait_for = [w["conn"] for w in busy] + [w["proc"].sentinel for w in busy]
+            wait(wait_for, timeout=max(0.0, deadline - time.monotonic()) if deadline else None)
+
+            # 2. 收结果 / 处理崩溃和超时
+            for idx, w in enumerate(pool):
+                if w["task"] is None:
+                    continue
+                task = w["task"]
+                result = None
+                if w["conn"].poll():
+                    try:
+                        result = w["conn"].recv()
+                    except EOFError:
+                        # 管道被关闭 = 进程已经死了，交给下面的崩溃分支处理
+                        w["proc"].join(timeout=5)
+
+                if result is not None:
+                    w["task"] = None
+                    on_done(task, result[1])
+                elif not w["proc"].is_alive():
+                    on_done(task, f"worker crashed (exit code {w['proc'].exitcode})")
+                    _stop_worker(w, kill=True)
+                    pool[idx] = _start_worker(ctx, output_dir)
+                elif timeout and time.monotonic() - w["started"] > timeout:
+                    on_done(task, f"timed out after {timeout}s")
+                    _stop_worker(w, kill=True)
+                    pool[idx] = _start_worker(ctx, output_dir)
+    finally:
+        for w in pool:
+            _stop_worker(w, kill=w["task"] is not None)
 
 
 # ============================================================
 # 函数: 批量转换
 # ============================================================
-def pdfs_to_markdowns(path_pattern, overwrite: bool = False):
+def pdfs_to_markdowns(path_pattern, overwrite: bool = False, workers: int = None, timeout: float = None,
+                      progress_callback=None, result_callback=None, isolate: bool = False):
     """
     扫描指定路径下的所有 PDF 并批量转换。
 
     Args:
-        path_pattern: 文件匹配模式，例如 "data/*.pdf"
+        path_pattern: 文件匹配模式，例如 "data/*.pdf"；也可以直接传入 PDF 路径列表
         overwrite: 是否覆盖已存在的 Markdown 文件 (默认 False，跳过已存在的以节省时间)
+        workers: 并行转换的进程数 (默认读取 config.PDF_CONVERSION_WORKERS)；为 1 时在当前进程内顺序转换
+        timeout: 单个文件的超时秒数 (默认读取 config.PDF_CONVERSION_TIMEOUT)，仅多进程模式生效
+        isolate: 为 True 时即使只有一个文件 / workers 为 1 也在子进程里转换，保留超时和崩溃隔离
+                 (常驻服务里入库用：MuPDF 段错误不会带崩主进程，也不会在多个线程里并发调用 PyMuPDF)
+        progress_callback: 可选，每个文件结束时调用 progress_callback(完成数, 总数, 文件名)
+        result_callback: 可选，每个文件结束时调用 result_callback(PDF 路径, 错误信息)，成功时错误信息为 None
+                         (流式入库用它把转换好的文件立即交给下一级)
+
+    Returns:
+        转换结果汇总: {"converted": [...], "skipped": [...], "failed": {文件名: 错误信息}, "elapsed": 秒}
     """
+    workers = config.PDF_CONVERSION_WORKERS if workers is None else workers
+    timeout = config.PDF_CONVERSION_TIMEOUT if timeout is None else timeout
+    start = time.monotonic()
+
     # [本项目] 从配置读取输出目录，并确保目录存在
     output_dir = Path(config.MARKDOWN_DIR)
     output_dir.mkdir(parents=True, exist_ok=True)
 
     # [Python标准库] glob.glob 遍历匹配的文件
     # map(Path, ...) 把文件名字符串转成 Path 对象
-    for pdf_path in map(Path, glob.glob(path_pattern)):
+    pdf_paths = glob.glob(path_pattern) if isinstance(path_pattern, (str, Path)) else path_pattern
+    summary = {"converted": [], "skipped": [], "failed": {}, "elapsed": 0.0}
+    todo = []
+
+    for pdf_path in map(Path, pdf_paths):
 
         # 预测目标文件路径
         md_path = (output_dir / pdf_path.stem).with_suffix(".md")
@@ -97,7 +234,61 @@ def pdfs_to_markdowns(path_pattern, overwrite: bool = False):
         # [逻辑] 增量更新检查
         # 如果文件已存在且不强制覆盖 (overwrite=False)，直接跳过
         if overwrite or not md_path.exists():
-            print(f"🔄 Converting: {pdf_path.name} -> {md_path.name} ...")
-            pdf_to_markdown(pdf_path, output_dir)
+            todo.append(pdf_path)
+        else:
+            print(f"⏩ Skipping (already exists): {md_path.name}")
+            summary["skipped"].append(pdf_path.name)
+
+    def on_done(pdf_path, error):
+        name = Path(pdf_path).name
+        if error is None:
+            summary["converted"].append(name)
+            print(f"✅ Converted: {name}")
         else:
-            print(f"⏩ Skipping (already exists): {md_path.name}")
\ No newline at end of file
+            summary["failed"][name] = error
+            print(f"❌ Failed: {name} ({error})")
+        if progress_callback:
+            progress_callback(len(summary["converted"]) + len(summary["failed"]), len(todo), name)
+        if result_callback:
+            result_callback(Path(pdf_path), error)
+
+    if todo and (isolate or (workers > 1 and len(todo) > 1)):
+        print(f"🔄 Converting {len(todo)} PDFs with {min(max(1, workers), len(todo))} worker processes ...")
+        _convert_in_pool(todo, output_dir, max(1, workers), timeout, on_done)
+    else:
+        for pdf_path in todo:
+            print(f"🔄 Converting: {pdf_path.name} ...")
+            # [逻辑] 失败隔离：一个损坏的 PDF 不会中断整批转换
+            # 成功回调放在 else 里：回调自己抛出的异常 (比如下游取消时的 StageCancelled) 不会被当成转换失败再回调一次
+            try:
+                pdf_to_markdown(pdf_path, output_dir)
+            except Exception as e:
+                on_done(pdf_path, f"{type(e).__name__}: {e}")
+            else:
+                on_done(pdf_path, None)
+
+    summary["elapsed"] = time.monotonic() - start
+    print(
+        f"📄 PDF conversion finished in {summary['elapsed']:.1f}s: "
+        f"{len(summary['converted'])} converted, {len(summary['skipped'])} skipped, {len(summary['failed'])} failed"
+    )
+    return summary
+
+
+# ============================================================
+# 命令行入口
+# ============================================================
+if __name__ == "__main__":
+    # [Python标准库] argparse
+    # 用法：python util.py "docs/*.pdf" --workers 16 --timeout 300
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert PDFs to Markdown.")
+    parser.add_argument("path_pattern", help='PDF glob pattern, e.g. "docs/*.pdf"')
+    parser.add_argument("--overwrite", action="store_true", help="re-convert PDFs whose Markdown already exists")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes")
+    parser.add_argument("--timeout", type=float, default=None, help="per-file timeout in seconds")
+    args = parser.parse_args()
+
+    result = pdfs_to_markdowns(args.path_pattern, overwrite=args.overwrite, workers=args.workers, timeout=args.timeout)
+    raise SystemExit(1 if result["failed"] else 0)